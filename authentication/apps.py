@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class AuthConfig(AppConfig):
-    name = 'auth'
+    name = 'authentication'
+
+    def ready(self):
+        from . import authentication
+        authentication.connect_signals()
@@ -0,0 +1,18 @@
+from django.contrib.auth import backends, get_user_model
+
+UserModel = get_user_model()
+
+
+class PrivilegesModelBackend(backends.ModelBackend):
+    """
+    The model backend, loading the user of a session together with their
+    privileges, which `get_role` then reads the role from.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related(
+                'privileges').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
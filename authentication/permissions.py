@@ -1,13 +1,11 @@
 from rest_framework import permissions
 
+from .roles import get_role
+
 class ManagerPermission(permissions.BasePermission):
     def is_manager(self, request):
-        user = getattr(request, 'user', None)
-        privileges = getattr(user, 'privileges', None)
-        hr_role = privileges.hr_role
-        if privileges and (privileges.is_global_admin or hr_role in ['m', 'a']):
-            return True
-        return False
+        role = get_role(request)
+        return role is not None and role.is_manager
             
         
 class IsOwner(permissions.BasePermission):
@@ -41,6 +39,25 @@ class IsManagerOrNotCreate(ManagerPermission):
             return True
         return view.action != 'create'
 
+class IsManager(ManagerPermission):
+    """
+    The request is authenticated as a manager.
+    """
+
+    def has_permission(self, request, view):
+        return self.is_manager(request)
+
+class IsAdmin(permissions.BasePermission):
+    """
+    The request is authenticated as a global admin or a superuser.
+    """
+
+    def has_permission(self, request, view):
+        if request.user and request.user.is_superuser:
+            return True
+        role = get_role(request)
+        return role is not None and role.is_global_admin
+
 class IsManagerOrReadOnly(ManagerPermission):
     """
     The request is authenticated as a staff user, or is a read-only request.
@@ -60,11 +77,8 @@ class IsNotDelete(permissions.BasePermission):
 
 class IsTerminal(permissions.BasePermission):
     def has_permission(self, request, view):
-        user = getattr(request, 'user', None)
-        privileges = getattr(user, 'privileges', None)
-        if privileges and privileges.hr_role == 't':
-            return True
-        return False
+        role = get_role(request)
+        return role is not None and role.is_terminal
 
 class ReadOnly(ManagerPermission):
     """
@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+
+from .models import Privileges
+
+MANAGER_ROLES = ('m', 'a')
+TERMINAL_ROLE = 't'
+
+
+class Role(object):
+    """
+    The privileges of a user, detached from the model instance so that it
+    can be kept on the request.
+    """
+
+    def __init__(self, hr_role, is_global_admin):
+        self.hr_role = hr_role
+        self.is_global_admin = is_global_admin
+
+    @property
+    def is_manager(self):
+        return self.is_global_admin or self.hr_role in MANAGER_ROLES
+
+    @property
+    def is_terminal(self):
+        return self.hr_role == TERMINAL_ROLE
+
+
+def load_role(user_id):
+    row = Privileges.objects.filter(user_id=user_id).values_list(
+        'hr_role', 'is_global_admin').first()
+    return Role(*row) if row is not None else None
+
+
+def user_role(user):
+    """
+    The `Role` of a user loaded with `select_related('privileges')`, or
+    None.
+    """
+    try:
+        privileges = user.privileges
+    except Privileges.DoesNotExist:
+        return None
+    return Role(privileges.hr_role, privileges.is_global_admin)
+
+
+def get_role(request):
+    """
+    The `Role` of the request's user, or None.
+
+    The role is read at most once per request and is shared by views and
+    permission classes. Session and bearer token users are loaded with
+    their privileges, which it is read from; other users cost a query.
+    Session users are loaded on every request, so that a changed role
+    applies on every worker from the next request on. Bearer token users
+    are cached with their token, for at most `HR_TOKEN_CACHE_SECONDS`.
+    """
+    if hasattr(request, '_hr_role'):
+        return request._hr_role
+    user = getattr(request, 'user', None)
+    user_id = getattr(user, 'id', None)
+    if user_id is None:
+        role = None
+    elif User.privileges.is_cached(user):
+        role = user_role(user)
+    else:
+        role = load_role(user_id)
+    request._hr_role = role
+    return role
@@ -1,3 +1,114 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oauth2_provider.models import AccessToken
+
+from .authentication import token_cache
+from .models import Privileges
+
+
+def make_user(username, role='e'):
+    user = User.objects.create(username=username)
+    if role is not None:
+        Privileges.objects.create(user=user, hr_role=role)
+    return user
+
+
+class RoleTests(TestCase):
+    """
+    The role is read once per request, and a changed role applies from the
+    next request on.
+    """
+
+    def setUp(self):
+        self.manager = make_user('manager', 'm')
+        self.employee = make_user('employee')
+        self.client.force_login(self.manager)
+
+    def role_queries(self, path):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [query for query in captured
+                if '"hr_role", "authentication_privileges"."is_global_admin"'
+                in query['sql']]
+
+    def test_one_role_query_per_request(self):
+        self.assertEqual(len(self.role_queries('/hr/employees/')), 1)
+        self.assertEqual(len(self.role_queries('/authentication/users/')), 1)
+
+    def test_list_query_count(self):
+        for index in range(5):
+            make_user('employee{}'.format(index))
+        # Session, user with its role, and the users.
+        with self.assertNumQueries(3):
+            response = self.client.get('/authentication/users/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_demotion_applies_next_request(self):
+        response = self.client.get('/authentication/users/')
+        self.assertEqual(len(response.json()['data']), 2)
+        # Without signals, as a write on another worker would be seen.
+        Privileges.objects.filter(user=self.manager).update(hr_role='e')
+        response = self.client.get('/authentication/users/')
+        self.assertEqual(len(response.json()['data']), 1)
+
+    def test_user_without_privileges(self):
+        user = make_user('nobody', role=None)
+        self.client.force_login(user)
+        response = self.client.get('/authentication/users/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 1)
+        response = self.client.patch(
+            '/authentication/users/{}/'.format(self.employee.id),
+            '{}', content_type='application/vnd.api+json')
+        self.assertIn(response.status_code, (403, 404))
+
+
+class TokenTests(TestCase):
+    """
+    Bearer tokens are cached briefly, and tokens that are revoked or belong
+    to inactive users are rejected.
+    """
+
+    def setUp(self):
+        token_cache().clear()
+        self.user = make_user('terminal', 't')
+        self.access_token = AccessToken.objects.create(
+            user=self.user, token='secret', scope='read write',
+            expires=timezone.now() + timedelta(hours=1))
+
+    def get(self, table='oauth2_provider_accesstoken'):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/authentication/users/',
+                                       HTTP_AUTHORIZATION='Bearer secret')
+        queries = [query for query in captured if table in query['sql']]
+        return response.status_code, len(queries)
+
+    def test_cached(self):
+        self.assertEqual(self.get(), (200, 1))
+        self.assertEqual(self.get(), (200, 0))
+
+    def test_role_cached(self):
+        # Loaded with the user on a miss, then cached with the token.
+        self.assertEqual(self.get('authentication_privileges'), (200, 1))
+        self.assertEqual(self.get('authentication_privileges'), (200, 0))
+
+    @override_settings(HR_TOKEN_CACHE_SECONDS=0)
+    def test_not_cached(self):
+        self.assertEqual(self.get(), (200, 1))
+        self.assertEqual(self.get(), (200, 1))
+
+    def test_revoked(self):
+        self.assertEqual(self.get()[0], 200)
+        self.access_token.delete()
+        self.assertEqual(self.get()[0], 403)
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get()[0], 403)
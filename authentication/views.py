@@ -10,14 +10,17 @@ from rest_framework_json_api import pagination
 
 from oauth2_provider.models import Application
 
+from hr.metrics import MetricsMixin
+
 from .filters import *
 from .models import *
 from .permissions import *
+from .roles import get_role
 from .serializers import *
 
 # Create your views here.
 
-class ApplicationViewSet(viewsets.ModelViewSet):
+class ApplicationViewSet(MetricsMixin, viewsets.ModelViewSet):
     resource_name = 'applications'
     serializer_class = ApplicationSerializer
     queryset = Application.objects.all()
@@ -25,18 +28,14 @@ class ApplicationViewSet(viewsets.ModelViewSet):
     filter_backends = (filters.DjangoFilterBackend,)
     filter_class = ApplicationFilter
     
-class DefaultViewSet(viewsets.ModelViewSet):
+class DefaultViewSet(MetricsMixin, viewsets.ModelViewSet):
     parser_classes = (JSONAPIParser, parsers.FormParser, 
                       parsers.MultiPartParser)
     renderer_classes = (JSONAPIRenderer, renderers.BrowsableAPIRenderer)
     
     def user_is_manager(self):
-        user = getattr(self.request, 'user', None)
-        privileges = getattr(user, 'privileges', None)
-        hr_role = privileges.hr_role
-        if privileges and (privileges.is_global_admin or hr_role in ['m', 'a']):
-            return True
-        return False
+        role = get_role(self.request)
+        return role is not None and role.is_manager
         
 class UserViewSet(DefaultViewSet):
     #resource_name = 'users'
@@ -62,13 +61,16 @@ class UserViewSet(DefaultViewSet):
         if request.user == instance:
             request_allowed = True
         else:
-            if request.user.privileges.hr_role == 'm':
+            role = get_role(request)
+            if role is None:
+                raise exceptions.PermissionDenied
+            if role.hr_role == 'm':
                 if instance.privileges.hr_role == 'e':
                     request_allowed = True
-            if request.user.privileges.hr_role == 'a':
+            if role.hr_role == 'a':
                 if instance.privileges.hr_role in ['e', 'm', 't']:
                     request_allowed = True
-            if request.user.privileges.is_global_admin:
+            if role.is_global_admin:
                 request_allowed = not instance.privileges.is_global_admin
         if request_allowed:
             return super().update(request, *args, **kwargs)
@@ -88,8 +90,9 @@ class PrivilegesViewSet(DefaultViewSet):
         data = request.data
         if request.method in ('PUT', 'PATCH'):
             instance = self.get_object()
-        user = getattr(self.request, 'user', None)
-        privileges = getattr(user, 'privileges', None)
+        privileges = get_role(request)
+        if privileges is None:
+            return False
         
         if 'is_global_admin' in data.keys(): 
             if instance is not None:
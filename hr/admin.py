@@ -1,7 +1,14 @@
+from datetime import timedelta
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin import actions as admin_actions
 from django.contrib.auth.models import User
+from django.db.models import Q
+from django.utils import timezone
 
 from .models import *
+from .overlaps import find_batch_overlaps, find_overlap
 
 # Register your models here.
 #admin.site.register(Employee)
@@ -9,23 +16,139 @@ from .models import *
 #admin.site.register(Message)
 
 
+class WorkPeriodForm(forms.ModelForm):
+    # Inline forms leave this to their formset, which checks them together.
+    check_overlaps = True
+
+    class Meta:
+        model = WorkPeriod
+        fields = '__all__'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        employee = cleaned_data.get('employee')
+        start_time = cleaned_data.get('start_time')
+        end_time = cleaned_data.get('end_time')
+        if employee is None or start_time is None:
+            return cleaned_data
+        if end_time is not None and end_time <= start_time:
+            raise forms.ValidationError(
+                'End Time can not be before Start Time')
+        if (self.check_overlaps and not cleaned_data.get('is_deleted') and
+                find_overlap(
+                    employee.id, start_time, end_time,
+                    exclude_id=self.instance.pk)):
+            raise forms.ValidationError(
+                'This work period overlaps with an existing one.')
+        return cleaned_data
+
+
+class WorkPeriodFormSet(forms.BaseInlineFormSet):
+    """
+    Checks the submitted work periods against the database and each other
+    in one batch, so that periods can be moved past one another.
+    """
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        form.check_overlaps = False
+
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+        forms_and_periods = []
+        for form in self.forms:
+            data = getattr(form, 'cleaned_data', {})
+            if (not data or data.get('DELETE') or data.get('is_deleted') or
+                    data.get('start_time') is None):
+                continue
+            forms_and_periods.append(
+                (form, (data['start_time'], data.get('end_time'))))
+        # The stored copies of the formset's rows are replaced by the
+        # submitted ones.
+        errors = find_batch_overlaps(
+            self.instance.pk,
+            [period for _, period in forms_and_periods],
+            exclude_ids=[form.instance.pk for form in self.forms
+                         if form.instance.pk is not None])
+        for index, message in sorted(errors.items()):
+            forms_and_periods[index][0].add_error(None, message)
+
    
 class WorkPeriodInline(admin.StackedInline):
+    """
+    The employee's recent work periods; older ones are on the work period
+    admin.
+    """
     model = WorkPeriod
+    form = WorkPeriodForm
+    formset = WorkPeriodFormSet
     ordering = ('-start_time',)
     extra = 0
+    recent_days = 31
+
+    def get_queryset(self, request):
+        since = timezone.now() - timedelta(days=self.recent_days)
+        return super().get_queryset(request).filter(
+            Q(start_time__gte=since) | Q(end_time__isnull=True))
 
 
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'primary_phone')
     inlines = (WorkPeriodInline,)
+
+    def save_formset(self, request, form, formset, change):
+        super().save_formset(request, form, formset, change)
+        if formset.model is WorkPeriod:
+            ClockStatus.objects.refresh(form.instance.id)
     
 
 @admin.register(WorkPeriod)
 class WorkPeriodAdmin(admin.ModelAdmin):
-    list_display = ('employee', 'start_time', 'end_time')
+    list_display = ('employee', 'start_time', 'end_time', 'is_deleted')
+    list_filter = ('is_deleted',)
     ordering = ('-start_time',)
+    form = WorkPeriodForm
+
+    def get_queryset(self, request):
+        # Show deleted work periods too, so they can be restored.
+        queryset = WorkPeriod.all_objects.select_related('employee')
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    actions = ('delete_selected',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        ClockStatus.objects.refresh(obj.employee_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        ClockStatus.objects.refresh(obj.employee_id)
+
+    # The bulk delete action calls this from Django 2.1 on, and
+    # `delete_selected` below before that.
+    def delete_queryset(self, request, queryset):
+        employee_ids = set(queryset.values_list('employee_id', flat=True))
+        queryset.delete()
+        for employee_id in employee_ids:
+            ClockStatus.objects.refresh(employee_id)
+
+    def delete_selected(self, request, queryset):
+        # Replaces the site-wide action of the same name, which deletes
+        # with `queryset.delete()` and returns None once it is confirmed.
+        employee_ids = set(queryset.values_list('employee_id', flat=True))
+        response = admin_actions.delete_selected(self, request, queryset)
+        if response is None:
+            for employee_id in employee_ids:
+                ClockStatus.objects.refresh(employee_id)
+        return response
+    delete_selected.short_description = (
+        admin_actions.delete_selected.short_description)
 
 @admin.register(DayOff)
 class DayOffAdmin(admin.ModelAdmin):
@@ -38,5 +161,37 @@ class DaysOffRequestAdmin(admin.ModelAdmin):
                     'is_paid')
     ordering = ('-requested_at',)
 
+@admin.register(ClockStatus)
+class ClockStatusAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'work_period', 'last_start_time',
+                    'last_end_time')
+    readonly_fields = ('employee', 'work_period', 'last_start_time',
+                       'last_end_time')
+
+class HolidayInline(admin.TabularInline):
+    model = Holiday
+    extra = 0
+
+@admin.register(WorkCalendar)
+class WorkCalendarAdmin(admin.ModelAdmin):
+    list_display = ('name', 'working_weekdays', 'is_default')
+    inlines = [HolidayInline]
+
+@admin.register(Holiday)
+class HolidayAdmin(admin.ModelAdmin):
+    list_display = ('name', 'date', 'calendar')
+    ordering = ('-date',)
+
+@admin.register(AccrualPolicy)
+class AccrualPolicyAdmin(admin.ModelAdmin):
+    list_display = ('name', 'day_off_type', 'hours', 'period', 'max_balance',
+                    'is_active')
+
+@admin.register(TimeOffBalance)
+class TimeOffBalanceAdmin(admin.ModelAdmin):
+    list_display = ('employee', 'day_off_type', 'accrued', 'used',
+                    'updated_at')
+    readonly_fields = ('employee', 'day_off_type', 'accrued', 'used')
+
 
 admin.site.register(UserSettings)
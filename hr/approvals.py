@@ -0,0 +1,85 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import balances, calendars, events, rollups
+from .models import DayOff, DaysOffRequest
+
+PENDING = 'Pending'
+APPROVED = 'Approved'
+DENIED = 'Denied'
+
+
+def set_status(request_ids, status, user, hours=None):
+    """
+    Approve or deny many days off requests in one transaction.
+
+    Approving expands each request into one `DayOff` per working date of
+    the employee's calendar, skipping weekends and holidays, written with
+    `bulk_create`; denying removes the days off of the request. Returns one
+    result per requested id.
+    """
+    if hours is None:
+        hours = getattr(settings, 'HR_WORKDAY_HOURS', 8)
+    results = {}
+    with transaction.atomic(), rollups.batch():
+        requests = DaysOffRequest.objects.select_for_update().select_related(
+            'employee').in_bulk(request_ids)
+        changed = []
+        for request_id in request_ids:
+            days_off_request = requests.get(request_id)
+            if days_off_request is None:
+                results[request_id] = {
+                    'id': request_id, 'status': 'error',
+                    'error': 'No days off request with this id'}
+            elif days_off_request.status == status:
+                results[request_id] = {'id': request_id,
+                                       'status': 'unchanged'}
+            elif days_off_request not in changed:
+                changed.append(days_off_request)
+
+        changed_ids = [days_off_request.id for days_off_request in changed]
+        DayOff.objects.filter(days_off_request_id__in=changed_ids).delete()
+
+        days_off = []
+        if status == APPROVED:
+            index = calendars.get_index()
+            for days_off_request in changed:
+                for date in index.expand_range(
+                        days_off_request.start_date, days_off_request.end_date,
+                        days_off_request.employee.calendar_id):
+                    days_off.append(DayOff(
+                        employee_id=days_off_request.employee_id,
+                        days_off_request=days_off_request,
+                        date=date,
+                        hours=hours,
+                        day_off_type=days_off_request.request_type,
+                        is_paid=days_off_request.is_paid,
+                        entered_by=user,
+                        updated_by=user))
+            # bulk_create sends no post_save, so schedule the rollups and
+            # post the balance usage here, for the saved rows with their ids.
+            DayOff.objects.bulk_create(days_off)
+            days_off = list(DayOff.objects.filter(
+                days_off_request_id__in=changed_ids))
+            balances.days_off_created(days_off)
+            for day_off in days_off:
+                rollups.schedule(day_off.employee_id, [day_off.date])
+
+        DaysOffRequest.objects.filter(id__in=changed_ids).update(
+            status=status, updated_by=user, updated_at=timezone.now())
+
+        counts = {}
+        for day_off in days_off:
+            request_id = day_off.days_off_request_id
+            counts[request_id] = counts.get(request_id, 0) + 1
+        for days_off_request in changed:
+            transaction.on_commit(partial(
+                events.publish, events.DAYS_OFF_REQUEST_STATUS_CHANGED,
+                days_off_request))
+            results[days_off_request.id] = {
+                'id': days_off_request.id, 'status': status,
+                'days_off': counts.get(days_off_request.id, 0)}
+    return [results[request_id] for request_id in request_ids]
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class HrConfig(AppConfig):
+    name = 'hr'
+
+    def ready(self):
+        from . import signals
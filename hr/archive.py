@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import history, rollups
+from .models import ArchivedWorkPeriod, WorkPeriod
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def move_to_archive(queryset, chunk_size=DEFAULT_CHUNK_SIZE, keep=True):
+    """
+    Move the work periods of `queryset` (built on `WorkPeriod.all_objects`)
+    out of the `WorkPeriod` table, a chunk per transaction. They are copied
+    to `ArchivedWorkPeriod` first unless `keep` is false. Returns the
+    number of work periods moved.
+
+    Rollups are left alone: deleted work periods are not counted, and
+    archived ones are still read through `history`.
+    """
+    count = 0
+    while True:
+        with transaction.atomic(), rollups.batch(refresh=False):
+            rows = list(queryset.order_by('id').values_list(
+                *history.FIELDS)[:chunk_size])
+            if not rows:
+                break
+            if keep:
+                # Readers must look in the archive before live rows leave
+                # the hot table.
+                live = [row[2] for row in rows if not row[6]]
+                if live:
+                    history.extend_boundary(max(live))
+                ArchivedWorkPeriod.objects.bulk_create(
+                    ArchivedWorkPeriod(**dict(zip(history.FIELDS, row)))
+                    for row in rows)
+            WorkPeriod.all_objects.filter(
+                id__in=[row[0] for row in rows]).delete()
+        count += len(rows)
+    return count
+
+
+def archive_deleted(before, chunk_size=DEFAULT_CHUNK_SIZE, keep=True):
+    """
+    Move the soft-deleted work periods that started before `before`.
+    """
+    return move_to_archive(
+        WorkPeriod.all_objects.filter(is_deleted=True, start_time__lt=before),
+        chunk_size, keep)
+
+
+def archive_closed(before=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Move the closed work periods that started before `before` (default:
+    `HR_ARCHIVE_HORIZON_DAYS` ago) to the archive. Open ones stay.
+    """
+    if before is None:
+        before = timezone.now() - timedelta(days=history.horizon_days())
+    return move_to_archive(
+        WorkPeriod.all_objects.filter(end_time__isnull=False,
+                                      start_time__lt=before),
+        chunk_size)
@@ -0,0 +1,250 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import (AccrualPolicy, DayOff, Employee, TimeOffBalance,
+                     TimeOffEntry)
+from .reports import PAY_PERIOD, period_start
+
+ACCRUAL = 'accrual'
+USAGE = 'usage'
+ADJUSTMENT = 'adjustment'
+
+MONTH = 'month'
+
+
+def balance_types():
+    """
+    Day off types that are drawn from a balance (`HR_BALANCE_TYPES`).
+    """
+    return tuple(getattr(settings, 'HR_BALANCE_TYPES', ('vn', 'pl')))
+
+
+def uses_balance(day_off_type, is_paid):
+    return is_paid and day_off_type in balance_types()
+
+
+def accrual_period_start(day, period):
+    if period == MONTH:
+        return day.replace(day=1)
+    return period_start(day, PAY_PERIOD)
+
+
+def _update_totals(totals):
+    """
+    Add `{(employee_id, day_off_type): [accrued, used]}` to the balances,
+    creating the missing ones.
+    """
+    for (employee_id, day_off_type), (accrued, used) in totals.items():
+        if not accrued and not used:
+            continue
+        balances = TimeOffBalance.objects.filter(employee_id=employee_id,
+                                                 day_off_type=day_off_type)
+        if balances.update(accrued=F('accrued') + accrued,
+                           used=F('used') + used,
+                           updated_at=timezone.now()):
+            continue
+        try:
+            with transaction.atomic():
+                TimeOffBalance.objects.create(
+                    employee_id=employee_id, day_off_type=day_off_type,
+                    accrued=accrued, used=used)
+        except IntegrityError:
+            # Created by a concurrent writer since the update above.
+            balances.update(accrued=F('accrued') + accrued,
+                            used=F('used') + used, updated_at=timezone.now())
+
+
+def post(entries):
+    """
+    Write ledger entries with one `bulk_create` and add them to the
+    balances in the same transaction.
+    """
+    if not entries:
+        return []
+    totals = {}
+    for entry in entries:
+        total = totals.setdefault((entry.employee_id, entry.day_off_type),
+                                  [Decimal(0), Decimal(0)])
+        if entry.kind == USAGE:
+            total[1] -= Decimal(entry.hours)
+        else:
+            total[0] += Decimal(entry.hours)
+    with transaction.atomic():
+        TimeOffEntry.objects.bulk_create(entries, batch_size=500)
+        _update_totals(totals)
+    return entries
+
+
+def usage_entry(employee_id, day_off_type, hours, day, day_off=None,
+                reverse=False):
+    hours = Decimal(hours)
+    return TimeOffEntry(employee_id=employee_id, day_off_type=day_off_type,
+                        kind=USAGE, hours=hours if reverse else -hours,
+                        date=day, day_off=day_off)
+
+
+def day_off_changed(day_off, deleted=False):
+    """
+    Post the change in usage of one saved or deleted day off: the usage it
+    was loaded with is given back and the new usage is taken.
+    """
+    entries = []
+    loaded = getattr(day_off, '_loaded_values', {})
+    if 'hours' in loaded:
+        if uses_balance(loaded['day_off_type'], loaded['is_paid']):
+            entries.append(usage_entry(
+                loaded['employee_id'], loaded['day_off_type'],
+                loaded['hours'], loaded['date'], reverse=True))
+    elif deleted and uses_balance(day_off.day_off_type, day_off.is_paid):
+        entries.append(usage_entry(day_off.employee_id, day_off.day_off_type,
+                                   day_off.hours, day_off.date, reverse=True))
+    if not deleted and uses_balance(day_off.day_off_type, day_off.is_paid):
+        entries.append(usage_entry(day_off.employee_id, day_off.day_off_type,
+                                   day_off.hours, day_off.date, day_off))
+
+    if len(entries) == 2:
+        given_back, taken = entries
+        if (given_back.employee_id == taken.employee_id and
+                given_back.day_off_type == taken.day_off_type and
+                given_back.hours == -taken.hours):
+            return []
+    return post(entries)
+
+
+def days_off_created(days_off):
+    """
+    Post the usage of days off written with `bulk_create`, which sends no
+    `post_save`. They must be read back first: not every database returns
+    the ids of bulk inserted rows, and the entries link to them.
+    """
+    return post([usage_entry(day_off.employee_id, day_off.day_off_type,
+                             day_off.hours, day_off.date, day_off)
+                 for day_off in days_off
+                 if uses_balance(day_off.day_off_type, day_off.is_paid)])
+
+
+def accrue(day):
+    """
+    Run every active accrual policy for the period containing `day`.
+    Employees who already accrued for the period are skipped, so running
+    it again is harmless. Returns the posted entries.
+    """
+    entries = []
+    employee_ids = list(Employee.objects.filter(
+        is_active=True).values_list('id', flat=True))
+    for policy in AccrualPolicy.objects.filter(is_active=True):
+        start = accrual_period_start(day, policy.period)
+        accrued = set(TimeOffEntry.objects.filter(
+            policy=policy, date=start).values_list('employee_id', flat=True))
+        balances = {}
+        if policy.max_balance is not None:
+            balances = dict(
+                (employee_id, accrued_hours - used)
+                for employee_id, accrued_hours, used in
+                TimeOffBalance.objects.filter(
+                    day_off_type=policy.day_off_type
+                ).values_list('employee_id', 'accrued', 'used'))
+        for employee_id in employee_ids:
+            if employee_id in accrued:
+                continue
+            hours = policy.hours
+            if policy.max_balance is not None:
+                room = policy.max_balance - balances.get(employee_id, 0)
+                hours = min(hours, max(room, 0))
+            if hours <= 0:
+                continue
+            entries.append(TimeOffEntry(
+                employee_id=employee_id, day_off_type=policy.day_off_type,
+                kind=ACCRUAL, hours=hours, date=start, policy=policy))
+    return post(entries)
+
+
+def balances_of(employee):
+    """
+    The balance of every balance type for one employee, from the running
+    totals.
+    """
+    rows = dict((balance.day_off_type, balance) for balance in
+                TimeOffBalance.objects.filter(employee=employee))
+    result = []
+    for day_off_type in balance_types():
+        balance = rows.get(day_off_type,
+                           TimeOffBalance(day_off_type=day_off_type))
+        result.append({
+            'day_off_type': day_off_type,
+            'accrued': balance.accrued,
+            'used': balance.used,
+            'balance': balance.balance,
+            'updated_at': balance.updated_at,
+        })
+    return result
+
+
+def check(fix=False):
+    """
+    Recompute every balance from scratch and return the ones that drifted,
+    as dicts with the stored and expected totals.
+
+    Accruals come from the ledger, usage from the days off themselves. With
+    `fix`, the ledger gets a correcting usage entry and the running totals
+    are rewritten.
+    """
+    expected = {}
+    for employee_id, day_off_type, hours in TimeOffEntry.objects.exclude(
+            kind=USAGE).values('employee_id', 'day_off_type').annotate(
+            total=Sum('hours')).order_by().values_list(
+            'employee_id', 'day_off_type', 'total'):
+        expected[(employee_id, day_off_type)] = [hours, Decimal(0)]
+    for employee_id, day_off_type, hours in DayOff.objects.filter(
+            is_paid=True, day_off_type__in=balance_types()).values(
+            'employee_id', 'day_off_type').annotate(
+            total=Sum('hours')).order_by().values_list(
+            'employee_id', 'day_off_type', 'total'):
+        expected.setdefault((employee_id, day_off_type),
+                            [Decimal(0), Decimal(0)])[1] = Decimal(hours)
+    posted_usage = dict(
+        ((employee_id, day_off_type), -hours)
+        for employee_id, day_off_type, hours in TimeOffEntry.objects.filter(
+            kind=USAGE).values('employee_id', 'day_off_type').annotate(
+            total=Sum('hours')).order_by().values_list(
+            'employee_id', 'day_off_type', 'total'))
+    stored = dict(
+        ((employee_id, day_off_type), (accrued, used))
+        for employee_id, day_off_type, accrued, used in
+        TimeOffBalance.objects.values_list('employee_id', 'day_off_type',
+                                           'accrued', 'used'))
+
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        accrued, used = expected.get(key, (Decimal(0), Decimal(0)))
+        stored_accrued, stored_used = stored.get(key, (Decimal(0),
+                                                       Decimal(0)))
+        if (accrued, used) == (stored_accrued, stored_used) and \
+                posted_usage.get(key, 0) == used:
+            continue
+        employee_id, day_off_type = key
+        drift.append({
+            'employee': employee_id,
+            'day_off_type': day_off_type,
+            'accrued': stored_accrued,
+            'expected_accrued': accrued,
+            'used': stored_used,
+            'expected_used': used,
+        })
+        if fix:
+            with transaction.atomic():
+                correction = used - posted_usage.get(key, 0)
+                if correction:
+                    TimeOffEntry.objects.create(
+                        employee_id=employee_id, day_off_type=day_off_type,
+                        kind=USAGE, hours=-correction,
+                        date=timezone.localdate(),
+                        note='Balance check correction')
+                TimeOffBalance.objects.update_or_create(
+                    employee_id=employee_id, day_off_type=day_off_type,
+                    defaults={'accrued': accrued, 'used': used})
+    return drift
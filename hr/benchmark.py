@@ -0,0 +1,439 @@
+import json
+import math
+import platform
+import re
+import resource
+import threading
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from urllib.parse import quote
+
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from oauth2_provider.models import AccessToken
+
+from authentication.authentication import cache_key, token_cache
+
+from . import events, history
+from .archive import archive_closed
+from .models import Employee, WorkPeriod
+from .pagination import NEXT, KeysetPagination
+from .synthetic import ADMIN, EMPLOYEE, MANAGER, TERMINAL, usernames
+
+# The page size of the pagination scenarios.
+PAGE_SIZE = 50
+
+# (name, role, method, path, JSON body). Paths are formatted with the ids
+# and dates of `context()`. Write scenarios are rolled back after each
+# request so that every run sees the same data.
+SCENARIOS = (
+    ('employees.list', MANAGER, 'get', '/hr/employees/', None),
+    ('employees.detail', MANAGER, 'get', '/hr/employees/{employee}/', None),
+    ('employees.search', MANAGER, 'get', '/hr/employees/search/?q={name}',
+     None),
+    ('employees.search.prefix', MANAGER, 'get',
+     '/hr/employees/search/?q={name_prefix}', None),
+    ('employees.search.terms', MANAGER, 'get',
+     '/hr/employees/search/?q={full_name}', None),
+    ('employees.search.phone', MANAGER, 'get',
+     '/hr/employees/search/?q={phone}', None),
+    ('employees.search.payroll-id', MANAGER, 'get',
+     '/hr/employees/search/?q={payroll_id}', None),
+    ('employees.search.no-match', MANAGER, 'get',
+     '/hr/employees/search/?q=qqxqq', None),
+    ('employees.balances', EMPLOYEE, 'get',
+     '/hr/employees/{employee}/balances/', None),
+    ('work-periods.list', MANAGER, 'get',
+     '/hr/work-periods/?employee={employee}', None),
+    ('work-periods.page.first', MANAGER, 'get',
+     '/hr/work-periods/?page_size={page_size}', None),
+    ('work-periods.page.newest', MANAGER, 'get',
+     '/hr/work-periods/?page_size={page_size}&sort=-start-time', None),
+    ('work-periods.page.deep-cursor', MANAGER, 'get',
+     '/hr/work-periods/?page_size={page_size}&cursor={deep_cursor}', None),
+    ('work-periods.page.deep-number', MANAGER, 'get',
+     '/hr/work-periods/?page_size={page_size}&page={deep_page}', None),
+    ('work-periods.detail', MANAGER, 'get',
+     '/hr/work-periods/{work_period}/', None),
+    ('work-periods.mine', EMPLOYEE, 'get', '/hr/work-periods/mine/', None),
+    ('work-periods.latest', TERMINAL, 'get', '/hr/work-periods/latest/',
+     None),
+    ('work-periods.history', MANAGER, 'get',
+     '/hr/work-periods/history/?employee={employee}&start={year_ago}'
+     '&end={today}', None),
+    ('work-periods.history.archive', MANAGER, 'get',
+     '/hr/work-periods/history/?employee={employee}&start={archive_start}'
+     '&end={today}', None),
+    ('work-periods.sync', TERMINAL, 'post', '/hr/work-periods/sync/',
+     {'events': [
+         {'key': 'benchmark-in-{iteration}', 'employee': '{employee}',
+          'type': 'in', 'time': '{clock_in}'},
+         {'key': 'benchmark-out-{iteration}', 'employee': '{employee}',
+          'type': 'out', 'time': '{clock_out}'}]}),
+    ('days-off.list', MANAGER, 'get', '/hr/days-off/', None),
+    ('days-off-requests.list', MANAGER, 'get', '/hr/days-off-requests/',
+     None),
+    ('clock-status.list', TERMINAL, 'get', '/hr/clock-status/', None),
+    ('reports.hours.day', MANAGER, 'get',
+     '/hr/reports/hours/?period=day&min_start_date={month_ago}', None),
+    ('reports.hours.week', MANAGER, 'get',
+     '/hr/reports/hours/?period=week&min_start_date={year_ago}', None),
+    ('reports.hours.pay-period', MANAGER, 'get',
+     '/hr/reports/hours/?period=pay-period&min_start_date={year_ago}', None),
+    ('reports.hours.employee', MANAGER, 'get',
+     '/hr/reports/hours/?period=week&employee={employee}'
+     '&min_start_date={year_ago}', None),
+    ('reports.hours.summary', EMPLOYEE, 'get', '/hr/reports/hours/summary/',
+     None),
+    ('roster.snapshot', TERMINAL, 'get', '/hr/roster/', None),
+    ('roster.delta', TERMINAL, 'get', '/hr/roster/?since=0', None),
+    ('exports.payroll', MANAGER, 'get',
+     '/hr/exports/payroll/?pay_period={month_ago}', None),
+    ('calendars.list', MANAGER, 'get', '/hr/calendars/', None),
+    ('holidays.list', MANAGER, 'get', '/hr/holidays/?year={year}', None),
+    ('events.list', TERMINAL, 'get', '/hr/events/?timeout=0', None),
+    ('user-settings.list', EMPLOYEE, 'get', '/hr/user-settings/', None),
+    ('users.list', ADMIN, 'get', '/authentication/users/', None),
+    ('users.detail', EMPLOYEE, 'get', '/authentication/users/{user}/', None),
+    ('privileges.list', ADMIN, 'get', '/authentication/privileges/', None),
+    ('applications.list', ADMIN, 'get', '/authentication/applications/',
+     None),
+    ('metrics', ADMIN, 'get', '/metrics', None),
+)
+
+# (name, role, path) of requests repeated with the ETag of a first
+# response in If-None-Match, which are answered with 304 Not Modified while
+# nothing changes.
+CONDITIONAL_SCENARIOS = (
+    ('employees.list.not-modified', MANAGER, '/hr/employees/'),
+    ('employees.detail.not-modified', MANAGER, '/hr/employees/{employee}/'),
+    ('days-off.list.not-modified', MANAGER, '/hr/days-off/'),
+    ('user-settings.list.not-modified', EMPLOYEE, '/hr/user-settings/'),
+)
+
+# (name, HR_TOKEN_CACHE_SECONDS, path) of requests a terminal authenticates
+# with an OAuth2 bearer token instead of a session, with and without the
+# token cache.
+TOKEN_SCENARIOS = (
+    ('auth.token.cached', 5, '/hr/clock-status/'),
+    ('auth.token.uncached', 0, '/hr/clock-status/'),
+)
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def context(prefix):
+    """
+    Users per role and the ids and dates the scenarios' paths refer to,
+    taken from the data `hr.synthetic.Generator` wrote with `prefix`.
+    """
+    users = {}
+    for role in (ADMIN, MANAGER, TERMINAL, EMPLOYEE):
+        username = usernames(prefix, role).first()
+        if username is None:
+            raise BenchmarkError(
+                "No generated users with prefix '{}'. Run generate_hr_data "
+                "first.".format(prefix))
+        users[role] = User.objects.get(username=username)
+    employee = Employee.objects.get(user=users[EMPLOYEE])
+    work_period = WorkPeriod.objects.filter(employee=employee).order_by(
+        '-start_time').first()
+    if work_period is None:
+        raise BenchmarkError('The generated employee has no work periods.')
+    # A page nine tenths of the way through all work periods.
+    deep_page = WorkPeriod.objects.count() * 9 // 10 // PAGE_SIZE
+    deep_offset = deep_page * PAGE_SIZE
+    pagination = KeysetPagination()
+    pagination.fields = [('start_time', False), ('id', False)]
+    deep_cursor = pagination.encode_cursor(
+        NEXT, WorkPeriod.objects.order_by('start_time', 'id')[deep_offset])
+    today = timezone.localdate()
+    now = timezone.localtime().replace(second=0, microsecond=0)
+    values = {
+        'employee': employee.id,
+        'work_period': work_period.id,
+        'user': users[EMPLOYEE].id,
+        'name': employee.last_name,
+        'name_prefix': employee.last_name[:2],
+        'full_name': quote('{} {}'.format(employee.first_name,
+                                          employee.last_name)),
+        # The last seven digits, without the area code.
+        'phone': re.sub(r'\D', '', employee.primary_phone or '')[-7:],
+        'payroll_id': employee.payroll_id,
+        'page_size': PAGE_SIZE,
+        'deep_cursor': deep_cursor,
+        'deep_page': deep_page + 1,
+        'today': today,
+        'month_ago': today - timedelta(days=30),
+        'year_ago': today - timedelta(days=365),
+        # A year further back than the archive horizon.
+        'archive_start': today - timedelta(days=history.horizon_days() + 365),
+        'year': today.year,
+        'clock_in': (now - timedelta(minutes=2)).isoformat(),
+        'clock_out': (now - timedelta(minutes=1)).isoformat(),
+    }
+    return users, values
+
+
+def bearer_token(prefix, user):
+    """
+    An unexpired OAuth2 access token of `user`, created on first use.
+    """
+    access_token, _ = AccessToken.objects.update_or_create(
+        token='{}-benchmark-token'.format(prefix),
+        defaults={'user': user, 'scope': 'read write',
+                  'expires': timezone.now() + timedelta(days=1)})
+    return access_token.token
+
+
+def fill(value, values):
+    if isinstance(value, str):
+        return value.format(**values)
+    if isinstance(value, dict):
+        return dict((key, fill(item, values)) for key, item in value.items())
+    if isinstance(value, list):
+        return [fill(item, values) for item in value]
+    return value
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of `values`.
+    """
+    ordered = sorted(values)
+    index = max(int(math.ceil(fraction * len(ordered))) - 1, 0)
+    return ordered[index]
+
+
+def request(client, method, path, body, headers=None):
+    """
+    Send one request and read all of its response. Returns the response
+    and the size of its body in bytes.
+    """
+    headers = headers or {}
+    if body is None:
+        response = getattr(client, method)(path, **headers)
+    else:
+        response = getattr(client, method)(
+            path, json.dumps(body), content_type='application/json',
+            **headers)
+    if response.streaming:
+        size = sum(len(chunk) for chunk in response.streaming_content)
+    else:
+        size = len(response.content)
+    return response, size
+
+
+def run_scenario(client, scenario, values, iterations, warmup, headers=None):
+    name, _, method, path, body = scenario
+    timings = []
+    queries = []
+    sizes = []
+    status_code = None
+    started = time.perf_counter()
+    for iteration in range(-warmup, iterations):
+        request_values = dict(values, iteration=iteration)
+        request_path = fill(path, request_values)
+        request_body = fill(body, request_values)
+        with ExitStack() as stack:
+            # Every database, so that reads sent to a replica are counted.
+            # The logs are emptied first: they hold at most 9000 queries,
+            # and the request clears them when it starts.
+            captured = []
+            for alias in connections:
+                connections[alias].queries_log.clear()
+                captured.append(stack.enter_context(CaptureQueriesContext(
+                    connections[alias])))
+            begin = time.perf_counter()
+            if method == 'get':
+                response, size = request(client, method, request_path,
+                                         request_body, headers)
+            else:
+                with transaction.atomic():
+                    response, size = request(client, method, request_path,
+                                             request_body, headers)
+                    transaction.set_rollback(True)
+            elapsed = time.perf_counter() - begin
+        if iteration < 0:
+            started = time.perf_counter()
+            continue
+        timings.append(elapsed)
+        queries.append(sum(len(context) for context in captured))
+        sizes.append(size)
+        status_code = response.status_code
+    total = time.perf_counter() - started
+    return {
+        'name': name,
+        'status': status_code,
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 3),
+        'queries': percentile(queries, 0.5),
+        'max_queries': max(queries),
+        'bytes': percentile(sizes, 0.5),
+        'requests_per_second': round(iterations / total, 2) if total else None,
+    }
+
+
+def measure(clients, token, values, iterations, warmup, selected):
+    results = []
+    for scenario in SCENARIOS:
+        if selected(scenario[0]):
+            results.append(run_scenario(clients[scenario[1]], scenario,
+                                        values, iterations, warmup))
+
+    for name, role, path in CONDITIONAL_SCENARIOS:
+        if not selected(name):
+            continue
+        response, _ = request(clients[role], 'get', fill(path, values), None)
+        headers = {'HTTP_IF_NONE_MATCH': response.get('ETag', '')}
+        results.append(run_scenario(
+            clients[role], (name, role, 'get', path, None), values,
+            iterations, warmup, headers))
+
+    token_client = Client(SERVER_NAME='localhost',
+                          HTTP_AUTHORIZATION='Bearer ' + token)
+    for name, seconds, path in TOKEN_SCENARIOS:
+        if not selected(name):
+            continue
+        token_cache().delete(cache_key(token))
+        with override_settings(HR_TOKEN_CACHE_SECONDS=seconds):
+            results.append(run_scenario(
+                token_client, (name, TERMINAL, 'get', path, None), values,
+                iterations, warmup))
+    return results
+
+
+def run(prefix='bench', iterations=20, warmup=2, only=None, archive=False):
+    """
+    Run the scenarios, or those whose name starts with one of `only`,
+    through the Django test client, as the generated user of each
+    scenario's role. Returns the results with the environment they were
+    measured in.
+
+    With `archive`, the scenarios are run again after the closed work
+    periods past `HR_ARCHIVE_HORIZON_DAYS` are archived, with their names
+    prefixed by `archived.`. The archiving is rolled back afterwards.
+    """
+    users, values = context(prefix)
+    clients = {}
+    for role, user in users.items():
+        clients[role] = Client(SERVER_NAME='localhost')
+        clients[role].force_login(user)
+    token = bearer_token(prefix, users[TERMINAL])
+
+    def selected(name):
+        return not only or any(name.startswith(prefix) for prefix in only)
+
+    results = measure(clients, token, values, iterations, warmup,
+                      selected)
+    archived = None
+    if archive:
+        try:
+            with transaction.atomic():
+                archived = archive_closed()
+                _, values = context(prefix)
+                for result in measure(clients, token, values,
+                                      iterations, warmup, selected):
+                    result['name'] = 'archived.' + result['name']
+                    results.append(result)
+                transaction.set_rollback(True)
+        finally:
+            history.forget_boundary()
+    return {
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'employees': Employee.objects.count(),
+        'work_periods': WorkPeriod.all_objects.count(),
+        'archived_work_periods': archived,
+        'results': results,
+    }
+
+
+def rss_bytes():
+    """
+    Resident memory of this process, or its peak where the current value
+    can not be read.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def idle_subscribers(count, hold=5.0):
+    """
+    Hold `count` long-poll subscribers on one `LocalBackend` for `hold`
+    seconds, then publish one event. Each subscriber is a thread blocked
+    in `wait()`, as a request to `/hr/events/` is in a threaded worker.
+
+    Returns the memory they take, the CPU used while they are idle and how
+    long they take to wake up.
+    """
+    backend = events.LocalBackend()
+    after = backend.latest_id()
+    woke = []
+    lock = threading.Lock()
+
+    def subscribe():
+        if backend.wait(after, hold + 60):
+            with lock:
+                woke.append(time.perf_counter())
+
+    memory = rss_bytes()
+    threads = [threading.Thread(target=subscribe, daemon=True)
+               for _ in range(count)]
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter() - begin
+    cpu = time.process_time()
+    time.sleep(hold)
+    idle_cpu = time.process_time() - cpu
+    memory = rss_bytes() - memory
+
+    published = time.perf_counter()
+    backend.publish(None, {'type': events.CLOCK_IN})
+    for thread in threads:
+        thread.join()
+    latencies = [moment - published for moment in woke] or [0]
+    return {
+        'subscribers': count,
+        'woken': len(woke),
+        'start_ms': round(started * 1000, 3),
+        'rss_kb_per_subscriber': round(memory / 1024 / count, 1),
+        'idle_cpu_ms': round(idle_cpu * 1000, 3),
+        'wake_p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'wake_p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'wake_max_ms': round(max(latencies) * 1000, 3),
+    }
+
+
+def compare(report, baseline, threshold=0.2):
+    """
+    Scenarios slower at p95 than `baseline` by more than `threshold`, or
+    running more queries, as `(name, field, baseline, current)` tuples.
+    """
+    previous = dict((result['name'], result)
+                    for result in baseline.get('results', ()))
+    regressions = []
+    for result in report['results']:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append((result['name'], 'p95_ms', before['p95_ms'],
+                                result['p95_ms']))
+        if result['queries'] > before['queries']:
+            regressions.append((result['name'], 'queries', before['queries'],
+                                result['queries']))
+    return regressions
@@ -0,0 +1,202 @@
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, router, transaction
+from django.db.models import Count, Max
+
+from . import balances, rollups
+from .models import DayOff, Employee, Holiday, WorkCalendar
+
+WORKING = 'working'
+WEEKEND = 'weekend'
+HOLIDAY = 'holiday'
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class CalendarIndex(object):
+    """
+    Precomputed day kinds for every calendar.
+
+    Each calendar keeps its working weekdays and the sorted holidays that
+    fall on one of them, so that counting working days between two dates
+    is a few arithmetic steps and two bisects, whatever the range.
+    """
+
+    def __init__(self, calendars, holidays, default_id=None):
+        default_weekdays = getattr(settings, 'HR_WEEKEND_DAYS', (5, 6))
+        self.weekdays = {None: frozenset(day for day in range(7)
+                                         if day not in default_weekdays)}
+        for calendar_id, weekdays in calendars.items():
+            self.weekdays[calendar_id] = frozenset(int(day)
+                                                   for day in weekdays)
+        self.default_id = default_id if default_id in calendars else None
+
+        company = holidays.get(None, set())
+        self.holidays = {}
+        self.working_holidays = {}
+        for calendar_id, weekdays in self.weekdays.items():
+            dates = company | holidays.get(calendar_id, set())
+            self.holidays[calendar_id] = frozenset(dates)
+            self.working_holidays[calendar_id] = sorted(
+                date for date in dates if date.weekday() in weekdays)
+
+    @classmethod
+    def load(cls):
+        calendars = {}
+        default_id = None
+        # Read from the primary: the index is shared by the process and
+        # must not be built from a lagging replica.
+        using = router.db_for_write(WorkCalendar)
+        rows = WorkCalendar.objects.using(using).values_list(
+            'id', 'working_weekdays', 'is_default')
+        for calendar_id, weekdays, is_default in rows:
+            calendars[calendar_id] = weekdays
+            if is_default:
+                default_id = calendar_id
+        holidays = {}
+        for calendar_id, date in Holiday.objects.using(using).values_list(
+                'calendar_id', 'date'):
+            holidays.setdefault(calendar_id, set()).add(date)
+        return cls(calendars, holidays, default_id)
+
+    def resolve(self, calendar_id):
+        if calendar_id in self.weekdays:
+            return calendar_id
+        return self.default_id
+
+    def day_kind(self, date, calendar_id=None):
+        calendar_id = self.resolve(calendar_id)
+        if date in self.holidays[calendar_id]:
+            return HOLIDAY
+        if date.weekday() not in self.weekdays[calendar_id]:
+            return WEEKEND
+        return WORKING
+
+    def is_working_day(self, date, calendar_id=None):
+        return self.day_kind(date, calendar_id) == WORKING
+
+    def expand_range(self, start, end, calendar_id=None):
+        """
+        The working dates from `start` through `end`.
+        """
+        calendar_id = self.resolve(calendar_id)
+        dates = []
+        date = start
+        while date <= end:
+            if self.is_working_day(date, calendar_id):
+                dates.append(date)
+            date += timedelta(days=1)
+        return dates
+
+    def working_days_between(self, start, end, calendar_id=None):
+        """
+        The number of working dates from `start` through `end`.
+        """
+        if end < start:
+            return 0
+        calendar_id = self.resolve(calendar_id)
+        weekdays = self.weekdays[calendar_id]
+        days = (end - start).days + 1
+        weeks, remainder = divmod(days, 7)
+        count = weeks * len(weekdays)
+        for offset in range(remainder):
+            if (start.weekday() + offset) % 7 in weekdays:
+                count += 1
+        holidays = self.working_holidays[calendar_id]
+        count -= bisect_right(holidays, end) - bisect_left(holidays, start)
+        return count
+
+
+def index_seconds():
+    return getattr(settings, 'HR_CALENDAR_INDEX_SECONDS', 30)
+
+
+def version(using):
+    """
+    A fingerprint of the calendars and holidays in the database, which
+    every insert, update and delete changes, whichever process made it.
+    """
+    fingerprint = []
+    for model in (WorkCalendar, Holiday):
+        aggregate = model.objects.using(using).aggregate(
+            count=Count('id'), updated_at=Max('updated_at'))
+        fingerprint += [aggregate['count'], aggregate['updated_at']]
+    return tuple(fingerprint)
+
+
+def get_index():
+    """
+    The process-wide `CalendarIndex`.
+
+    Writes in this process drop it through `invalidate`. Writes made
+    elsewhere are noticed by comparing its version with the database, at
+    most every `HR_CALENDAR_INDEX_SECONDS`, and it is reloaded when they
+    differ.
+    """
+    global _index
+    index = _index
+    now = time.monotonic()
+    if index is not None and now - index.checked_at < index_seconds():
+        return index
+    # The primary, like `CalendarIndex.load`.
+    current = version(router.db_for_write(WorkCalendar))
+    if index is None or index.version != current:
+        with _index_lock:
+            index = CalendarIndex.load()
+            index.version = current
+            _index = index
+    index.checked_at = now
+    return index
+
+
+def invalidate():
+    global _index
+    _index = None
+
+
+def assign_holiday(holiday, user, hours=None):
+    """
+    Give every active employee the holiday applies to a holiday `DayOff`,
+    in one `bulk_create`. Employees who already have a holiday on that
+    date, or for whom it is not a working weekday, are skipped. Returns
+    the created days off.
+    """
+    if hours is None:
+        hours = getattr(settings, 'HR_WORKDAY_HOURS', 8)
+    index = get_index()
+    employees = Employee.objects.filter(is_active=True)
+    if holiday.calendar_id is not None:
+        if holiday.calendar_id == index.default_id:
+            employees = employees.filter(
+                models.Q(calendar_id=holiday.calendar_id) |
+                models.Q(calendar__isnull=True))
+        else:
+            employees = employees.filter(calendar_id=holiday.calendar_id)
+    employees = employees.exclude(id__in=DayOff.objects.filter(
+        date=holiday.date, day_off_type='hy').values('employee_id'))
+
+    days_off = []
+    for employee_id, calendar_id in employees.values_list('id',
+                                                          'calendar_id'):
+        weekdays = index.weekdays[index.resolve(calendar_id)]
+        if holiday.date.weekday() not in weekdays:
+            continue
+        days_off.append(DayOff(employee_id=employee_id, date=holiday.date,
+                               hours=hours, day_off_type='hy',
+                               is_paid=True, note=holiday.name[:120],
+                               entered_by=user, updated_by=user))
+    with transaction.atomic(), rollups.batch():
+        DayOff.objects.bulk_create(days_off, batch_size=500)
+        # Read back with their ids, which the ledger links to.
+        days_off = list(DayOff.objects.filter(
+            date=holiday.date, day_off_type='hy',
+            employee_id__in=[day_off.employee_id for day_off in days_off]))
+        balances.days_off_created(days_off)
+        for day_off in days_off:
+            rollups.schedule(day_off.employee_id, [day_off.date])
+    return days_off
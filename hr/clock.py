@@ -0,0 +1,180 @@
+from django.db import IntegrityError, transaction
+from django.utils import dateparse, timezone
+
+from .models import ClockEvent, ClockStatus, Employee, WorkPeriod
+from .overlaps import find_overlap
+
+CLOCK_IN = 'in'
+CLOCK_OUT = 'out'
+
+APPLIED = 'applied'
+DUPLICATE = 'duplicate'
+ERROR = 'error'
+
+
+class ClockError(Exception):
+    pass
+
+
+def to_minute(value):
+    return value.replace(second=0, microsecond=0)
+
+
+def clock_in(status, when):
+    """
+    Open a work period at `when`. The caller must hold the lock on the
+    employee's `status` (see `ClockStatusManager.lock`).
+    """
+    if status.work_period_id is not None:
+        raise ClockError('Employee already clocked in')
+    if find_overlap(status.employee_id, when) is not None:
+        raise ClockError('This work period overlaps with an existing one.')
+    work_period = WorkPeriod.objects.create(employee_id=status.employee_id,
+                                            start_time=when)
+    status.work_period = work_period
+    status.last_start_time = when
+    status.last_end_time = None
+    status.save()
+    return work_period
+
+
+def clock_out(status, when):
+    """
+    Close the open work period at `when`. The caller must hold the lock on
+    the employee's `status`.
+    """
+    if status.work_period_id is None:
+        raise ClockError('Employee already clocked out')
+    work_period = status.work_period
+    if not (work_period.start_time < when <= timezone.now()):
+        raise ClockError('Clock out can not be out of range')
+    if find_overlap(status.employee_id, work_period.start_time, when,
+                    exclude_id=work_period.id) is not None:
+        raise ClockError('This work period overlaps with an existing one.')
+    work_period.end_time = when
+    work_period.save()
+    status.work_period = None
+    status.last_end_time = when
+    status.save()
+    return work_period
+
+
+def _parse(event):
+    key = str(event.get('key') or '')
+    if not key or len(key) > 64:
+        raise ClockError("'key' is required and at most 64 characters")
+    event_type = event.get('type')
+    if event_type not in (CLOCK_IN, CLOCK_OUT):
+        raise ClockError("'type' must be 'in' or 'out'")
+    when = dateparse.parse_datetime(str(event.get('time')))
+    if when is None:
+        raise ClockError("'time' is not a valid date/time")
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    if when > timezone.now():
+        raise ClockError('Event time is in the future')
+    try:
+        employee_id = int(event.get('employee'))
+    except (TypeError, ValueError):
+        raise ClockError("'employee' must be an employee id")
+    return key, employee_id, event_type, to_minute(when)
+
+
+def _apply(status, key, event_type, when):
+    with transaction.atomic():
+        event = ClockEvent.objects.create(
+            key=key, employee_id=status.employee_id, event_type=event_type,
+            event_time=when)
+        if event_type == CLOCK_IN:
+            event.work_period = clock_in(status, when)
+        else:
+            event.work_period = clock_out(status, when)
+        event.save(update_fields=['work_period'])
+    return event
+
+
+def apply_events(events):
+    """
+    Apply a list of clock events and return one result per event.
+
+    Keys that were already applied, or that repeat an earlier event of the
+    batch, are answered with the work period of the first application
+    without touching the work periods again. The events of each employee
+    are applied in time order, then list order, in one transaction holding
+    the lock on the employee's clock status; each event that fails is
+    rolled back on its own.
+    """
+    results = [None] * len(events)
+    parsed = {}
+    for index, event in enumerate(events):
+        if not isinstance(event, dict):
+            results[index] = {'key': None, 'status': ERROR,
+                              'error': 'Event is not an object'}
+            continue
+        try:
+            key, employee_id, event_type, when = _parse(event)
+        except ClockError as e:
+            results[index] = {'key': event.get('key'), 'status': ERROR,
+                              'error': str(e)}
+            continue
+        parsed[index] = (key, employee_id, event_type, when)
+
+    applied = dict(ClockEvent.objects.filter(
+        key__in=[key for key, _, _, _ in parsed.values()]
+    ).values_list('key', 'work_period_id'))
+    known_employees = set(Employee.objects.filter(
+        id__in=set(employee_id for _, employee_id, _, _ in parsed.values())
+    ).values_list('id', flat=True))
+
+    by_employee = {}
+    # The index of the first event of the batch with each key.
+    first = {}
+    repeats = []
+    for index in sorted(parsed):
+        key, employee_id, event_type, when = parsed[index]
+        if key in applied:
+            results[index] = {'key': key, 'status': DUPLICATE,
+                              'work_period': applied[key]}
+        elif key in first:
+            repeats.append(index)
+        elif employee_id not in known_employees:
+            results[index] = {'key': key, 'status': ERROR,
+                              'error': "No employee with id '{}'".format(
+                                  employee_id)}
+        else:
+            first[key] = index
+            by_employee.setdefault(employee_id, []).append(index)
+
+    for employee_id, indexes in by_employee.items():
+        indexes.sort(key=lambda index: (parsed[index][3], index))
+        with transaction.atomic():
+            status = ClockStatus.objects.lock(employee_id)
+            for index in indexes:
+                key, _, event_type, when = parsed[index]
+                try:
+                    event = _apply(status, key, event_type, when)
+                except IntegrityError:
+                    # Applied by a concurrent request.
+                    status.refresh_from_db()
+                    results[index] = {
+                        'key': key, 'status': DUPLICATE,
+                        'work_period': ClockEvent.objects.filter(
+                            key=key).values_list('work_period_id',
+                                                 flat=True).first()}
+                except ClockError as e:
+                    status.refresh_from_db()
+                    results[index] = {'key': key, 'status': ERROR,
+                                      'error': str(e)}
+                else:
+                    results[index] = {'key': key, 'status': APPLIED,
+                                      'work_period': event.work_period_id}
+
+    for index in repeats:
+        key = parsed[index][0]
+        result = results[first[key]]
+        if result['status'] == ERROR:
+            results[index] = dict(result)
+        else:
+            results[index] = {'key': key, 'status': DUPLICATE,
+                              'work_period': result.get('work_period')}
+    return results
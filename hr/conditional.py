@@ -0,0 +1,83 @@
+import calendar
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from authentication.roles import get_role
+
+from .includes import include_paths
+
+
+class ConditionalGetMixin(object):
+    """
+    ETag and Last-Modified validators for list and retrieve, computed from
+    `updated_at` before the response is serialized, so that an unchanged
+    resource is answered with `304 Not Modified` without rendering it.
+
+    A list is fingerprinted by the count, highest id and latest
+    `updated_at` of the filtered queryset in one aggregate query. Requests
+    with `include=` are not short-circuited, since the fingerprint does
+    not cover related resources.
+    """
+    last_modified_field = 'updated_at'
+
+    def make_etag(self, *parts):
+        request = self.request
+        # The role picks the serializer, e.g. for timeclocks.
+        role = get_role(request)
+        if role is not None:
+            role = (role.hr_role, role.is_global_admin)
+        parts += (request.get_full_path(), request.user.id, role,
+                  request.accepted_media_type)
+        value = ':'.join(str(part) for part in parts)
+        return quote_etag(hashlib.sha1(value.encode('utf-8')).hexdigest())
+
+    def conditional_response(self, etag, last_modified):
+        timestamp = None
+        if last_modified is not None:
+            timestamp = calendar.timegm(last_modified.utctimetuple())
+        not_modified = get_conditional_response(
+            self.request._request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+        return not_modified, timestamp
+
+    def set_validators(self, response, etag, timestamp):
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if include_paths(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        fingerprint = queryset.order_by().aggregate(
+            count=Count('id'), max_id=Max('id'),
+            last_modified=Max(self.last_modified_field))
+        etag = self.make_etag(fingerprint['count'], fingerprint['max_id'],
+                              fingerprint['last_modified'])
+        not_modified, timestamp = self.conditional_response(
+            etag, fingerprint['last_modified'])
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        return self.set_validators(response, etag, timestamp)
+
+    def retrieve(self, request, *args, **kwargs):
+        if include_paths(request):
+            return super().retrieve(request, *args, **kwargs)
+        instance = self.get_object()
+        last_modified = getattr(instance, self.last_modified_field)
+        etag = self.make_etag(instance.pk, last_modified)
+        not_modified, timestamp = self.conditional_response(etag,
+                                                            last_modified)
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        return self.set_validators(response, etag, timestamp)
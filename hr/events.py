@@ -0,0 +1,114 @@
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+DAYS_OFF_REQUEST_CREATED = 'days-off-request.created'
+DAYS_OFF_REQUEST_STATUS_CHANGED = 'days-off-request.status-changed'
+CLOCK_IN = 'work-period.clock-in'
+CLOCK_OUT = 'work-period.clock-out'
+RESET = 'reset'
+
+WORK_PERIOD_EVENTS = (CLOCK_IN, CLOCK_OUT)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+class LocalBackend(object):
+    """
+    In-process fan-out hub.
+
+    Events are kept in a bounded ring buffer with increasing ids, and
+    subscribers block on one shared condition until an event newer than
+    the last one they saw arrives. An idle subscriber therefore costs a
+    waiting thread and nothing else, however many there are.
+    """
+
+    def __init__(self, size=None):
+        size = size or getattr(settings, 'HR_EVENT_BUFFER_SIZE', 1000)
+        self.events = deque(maxlen=size)
+        self.last_id = 0
+        self.condition = threading.Condition()
+
+    def publish(self, user_id, payload):
+        with self.condition:
+            self.last_id += 1
+            payload = dict(payload, id=self.last_id)
+            self.events.append((self.last_id, user_id, payload))
+            self.condition.notify_all()
+        return payload
+
+    def wait(self, after, timeout):
+        """
+        `(id, user_id, payload)` entries newer than `after`, waiting up to
+        `timeout` seconds for one to arrive. Returns None if events after
+        `after` have already been dropped from the buffer.
+        """
+        with self.condition:
+            if after > self.last_id:
+                return None
+            self.condition.wait_for(lambda: self.last_id > after, timeout)
+            if self.events and self.events[0][0] > after + 1:
+                return None
+            return [event for event in self.events if event[0] > after]
+
+    def latest_id(self):
+        return self.last_id
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'HR_EVENT_BACKEND',
+                               'hr.events.LocalBackend')
+                _backend = import_string(path)()
+    return _backend
+
+
+def publish(event_type, instance):
+    """
+    Publish an event about `instance`, which must have an `employee`.
+    """
+    employee = instance.employee
+    payload = {
+        'type': event_type,
+        'resource_type': instance._meta.model_name,
+        'resource_id': instance.pk,
+        'employee': employee.pk,
+        'time': timezone.now().isoformat(),
+    }
+    return get_backend().publish(employee.user_id, payload)
+
+
+def is_visible(event_type, owner_id, role, user_id):
+    """
+    Managers see every event, timeclocks see clock events and employees
+    only see events about themselves.
+    """
+    if role is not None and role.is_manager:
+        return True
+    if role is not None and role.is_terminal:
+        return event_type in WORK_PERIOD_EVENTS
+    return owner_id == user_id
+
+
+def events_after(after, timeout, role, user_id):
+    """
+    Visible events newer than `after`, waiting up to `timeout` seconds.
+    Returns `(events, last_id)`. A single `reset` event means that the
+    client missed events and should reload.
+    """
+    backend = get_backend()
+    entries = backend.wait(after, timeout)
+    if entries is None:
+        last_id = backend.latest_id()
+        return [{'type': RESET, 'id': last_id}], last_id
+    events = [payload for _, owner_id, payload in entries
+              if is_visible(payload['type'], owner_id, role, user_id)]
+    last_id = entries[-1][0] if entries else after
+    return events, last_id
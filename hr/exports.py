@@ -0,0 +1,145 @@
+import csv
+import heapq
+import os
+import tempfile
+from datetime import timedelta
+
+from django.utils import timezone
+import xlsxwriter
+
+from . import history
+from .models import DayOff
+from .reports import PAY_PERIOD, pay_period_days, period_start
+from .rollups import day_bounds, local_day
+
+CSV = 'csv'
+XLSX = 'xlsx'
+FORMATS = (CSV, XLSX)
+CONTENT_TYPES = {
+    CSV: 'text/csv',
+    XLSX: ('application/vnd.openxmlformats-officedocument.'
+           'spreadsheetml.sheet'),
+}
+
+WORK = 'work'
+DAY_OFF = 'day-off'
+
+HEADER = ('payroll_id', 'last_name', 'first_name', 'date', 'kind',
+          'day_off_type', 'is_paid', 'start_time', 'end_time', 'hours')
+
+# Bytes read at a time when streaming a finished XLSX file.
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def pay_period(day):
+    """
+    First and last day of the pay period that contains `day`.
+    """
+    start = period_start(day, PAY_PERIOD)
+    return start, start + timedelta(days=pay_period_days() - 1)
+
+
+def _work_rows(work_periods):
+    rows = work_periods.filter(end_time__isnull=False).order_by(
+        'employee_id', 'start_time').values_list(
+        'employee_id', 'employee__payroll_id', 'employee__last_name',
+        'employee__first_name', 'start_time', 'end_time', 'adjustment')
+    for (employee_id, payroll_id, last_name, first_name, start_time,
+         end_time, adjustment) in rows.iterator():
+        seconds = (end_time - start_time).total_seconds()
+        hours = round(seconds / 3600 + (adjustment or 0) / 60, 2)
+        day = local_day(start_time)
+        yield (employee_id, day, 0), (
+            payroll_id, last_name, first_name, day, WORK, '', '',
+            timezone.localtime(start_time).strftime('%H:%M'),
+            timezone.localtime(end_time).strftime('%H:%M'), hours)
+
+
+def _day_off_rows(first, last):
+    rows = DayOff.objects.filter(
+        date__gte=first, date__lte=last
+    ).order_by('employee_id', 'date').values_list(
+        'employee_id', 'employee__payroll_id', 'employee__last_name',
+        'employee__first_name', 'date', 'day_off_type', 'is_paid', 'hours')
+    for (employee_id, payroll_id, last_name, first_name, day, day_off_type,
+         is_paid, hours) in rows.iterator():
+        yield (employee_id, day, 1), (
+            payroll_id, last_name, first_name, day, DAY_OFF, day_off_type,
+            is_paid, '', '', hours)
+
+
+def payroll_rows(first, last):
+    """
+    Work periods and days off from `first` through `last`, one row per
+    `HEADER`, by employee and date.
+
+    Work periods come from the archive too when the pay period reaches
+    into it. Every table is read with `values_list(...).iterator()` and
+    merged as they stream, so memory use does not grow with the number of
+    rows.
+    """
+    start, end = day_bounds(first, last)
+    streams = [_work_rows(work_periods)
+               for work_periods in history.sources(start, end)]
+    streams.append(_day_off_rows(first, last))
+    merged = heapq.merge(*streams, key=lambda row: row[0])
+    for _, row in merged:
+        yield row
+
+
+class Echo(object):
+    """
+    A file-like object that hands back what is written to it, so that
+    `csv.writer` can produce the lines of a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def xlsx_chunks(rows):
+    """
+    Write `rows` to an XLSX file in constant memory mode and yield it in
+    chunks. The workbook can only be read once it is closed, so it is
+    built in a temporary file first.
+    """
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True,
+                                              'default_date_format':
+                                                  'yyyy-mm-dd'})
+        sheet = workbook.add_worksheet('Payroll')
+        sheet.write_row(0, 0, HEADER)
+        for index, row in enumerate(rows, 1):
+            sheet.write_row(index, 0, row)
+        workbook.close()
+        with open(path, 'rb') as f:
+            chunk = f.read(FILE_CHUNK_SIZE)
+            while chunk:
+                yield chunk
+                chunk = f.read(FILE_CHUNK_SIZE)
+    finally:
+        os.remove(path)
+
+
+def export(first, last, file_format=CSV):
+    """
+    The chunks of a payroll export in `file_format`.
+    """
+    rows = payroll_rows(first, last)
+    if file_format == XLSX:
+        return xlsx_chunks(rows)
+    return csv_lines(rows)
+
+
+def filename(first, last, file_format=CSV):
+    return 'payroll-{}-{}.{}'.format(first.isoformat(), last.isoformat(),
+                                     file_format)
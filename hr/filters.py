@@ -6,9 +6,9 @@ from django.contrib.auth.models import User
 class WorkPeriodFilter(django_filters.FilterSet):
     order_by_field = 'order'
     min_start_date = django_filters.DateTimeFilter(name='start_time', 
-                                                   lookup_expr=('gte',))
+                                                   lookup_expr='gte')
     max_start_date = django_filters.DateTimeFilter(name='start_time',
-                                                   lookup_expr=('lt',))
+                                                   lookup_expr='lt')
     class Meta:
         model = WorkPeriod
         fields = ('employee', 'id', 'min_start_date', 'max_start_date')
@@ -21,10 +21,8 @@ class EmployeeFilter(django_filters.FilterSet):
 
 class DayOffFilter(django_filters.FilterSet):
     order_by_field = 'order'
-    min_date = django_filters.DateTimeFilter(name='date', 
-                                                   lookup_expr=('gte',))
-    max_date = django_filters.DateTimeFilter(name='date',
-                                                   lookup_expr=('lt',))
+    min_date = django_filters.DateTimeFilter(name='date', lookup_expr='gte')
+    max_date = django_filters.DateTimeFilter(name='date', lookup_expr='lt')
     class Meta:
         model = DayOff
         fields = ('employee', 'id', 'min_date', 'max_date')
@@ -33,10 +31,28 @@ class DayOffFilter(django_filters.FilterSet):
         
 class DaysOffRequestFilter(django_filters.FilterSet):
     order_by_field = 'order'
-    seen = django_filters.BooleanFilter(name='seen',lookup_expr=('exact',))
+    seen = django_filters.BooleanFilter(name='seen', lookup_expr='exact')
     
     class Meta:
         model = DaysOffRequest
         fields = ('seen', 'start_date', 'employee')
         order_by = ['start_date', '-start_date', 'id', '-id']
 
+
+class ClockStatusFilter(django_filters.FilterSet):
+    is_clocked_in = django_filters.BooleanFilter(name='work_period',
+                                                 lookup_expr='isnull',
+                                                 exclude=True)
+
+    class Meta:
+        model = ClockStatus
+        fields = ('employee', 'is_clocked_in')
+
+
+class HoursRollupFilter(django_filters.FilterSet):
+    min_start_date = django_filters.DateFilter(name='date', lookup_expr='gte')
+    max_start_date = django_filters.DateFilter(name='date', lookup_expr='lt')
+
+    class Meta:
+        model = HoursRollup
+        fields = ('employee', 'min_start_date', 'max_start_date')
@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, prefetch_related_objects
+
+from .models import ArchivedWorkPeriod, WorkPeriod
+
+BOUNDARY_KEY = 'hr:archive-boundary'
+
+# The columns of `WorkPeriod` in model order, which archived rows are read
+# as when both tables are combined.
+FIELDS = ('id', 'employee_id', 'start_time', 'end_time', 'adjustment', 'note',
+          'is_deleted')
+
+
+def horizon_days():
+    return getattr(settings, 'HR_ARCHIVE_HORIZON_DAYS', 400)
+
+
+def boundary_seconds():
+    return getattr(settings, 'HR_ARCHIVE_BOUNDARY_SECONDS', 5)
+
+
+def archive_boundary():
+    """
+    Start time of the newest live archived work period, or None if none
+    is archived. Ranges starting after it never need the archive. Deleted
+    work periods, which `purge_deleted_work_periods` archives much sooner,
+    are never read and do not move it.
+
+    It is read from the archive and cached per process for at most
+    `HR_ARCHIVE_BOUNDARY_SECONDS`, so archiving done elsewhere is seen
+    within that time.
+    """
+    seconds = boundary_seconds()
+    boundary = cache.get(BOUNDARY_KEY) if seconds > 0 else None
+    if boundary is None:
+        boundary = ArchivedWorkPeriod.objects.filter(
+            is_deleted=False).aggregate(
+                Max('start_time'))['start_time__max'] or False
+        if seconds > 0:
+            cache.set(BOUNDARY_KEY, boundary, seconds)
+    return boundary or None
+
+
+def extend_boundary(start_time):
+    """
+    Move the boundary of this process forward to `start_time` if it is not
+    already past it. Other processes read it from the archive once their
+    cached boundary expires.
+    """
+    boundary = archive_boundary()
+    if (boundary is None or boundary < start_time) and boundary_seconds() > 0:
+        cache.set(BOUNDARY_KEY, start_time, boundary_seconds())
+
+
+def forget_boundary():
+    """
+    Drop the cached boundary, e.g. after archiving was rolled back.
+    """
+    cache.delete(BOUNDARY_KEY)
+
+
+def reaches_archive(start=None):
+    boundary = archive_boundary()
+    return boundary is not None and (start is None or start <= boundary)
+
+
+def _between(queryset, start, end, filters):
+    queryset = queryset.filter(**filters)
+    if start is not None:
+        queryset = queryset.filter(start_time__gte=start)
+    if end is not None:
+        queryset = queryset.filter(start_time__lt=end)
+    return queryset
+
+
+def sources(start=None, end=None, **filters):
+    """
+    Querysets of the live work periods starting in [start, end): the hot
+    table, and the archive only when the range reaches back into it.
+    Each can be aggregated on its own.
+    """
+    result = [_between(WorkPeriod.objects.all(), start, end, filters)]
+    if reaches_archive(start):
+        result.append(_between(
+            ArchivedWorkPeriod.objects.filter(is_deleted=False),
+            start, end, filters))
+    return result
+
+
+def work_periods(start=None, end=None, **filters):
+    """
+    Live `WorkPeriod` instances starting in [start, end), read from the
+    hot table alone unless the range reaches back into the archive, in
+    which case the archived rows are added with a UNION. The combined
+    queryset can only be ordered and sliced.
+    """
+    hot, *cold = sources(start, end, **filters)
+    if not cold:
+        return hot
+    return hot.union(cold[0].values_list(*FIELDS), all=True)
+
+
+class CombinedWorkPeriods(object):
+    """
+    Live work periods of a `WorkPeriod` queryset and an `ArchivedWorkPeriod`
+    queryset filtered alike, which can be filtered, counted, ordered and
+    sliced like one queryset, e.g. by a paginator. Slices are read with a
+    UNION and their employees are prefetched.
+    """
+    model = WorkPeriod
+    ordered = True
+
+    def __init__(self, hot, cold, ordering=('start_time', 'id')):
+        self.hot = hot
+        self.cold = cold
+        self.ordering = ordering
+        self._result_cache = None
+
+    def filter(self, *args, **kwargs):
+        return CombinedWorkPeriods(self.hot.filter(*args, **kwargs),
+                                   self.cold.filter(*args, **kwargs),
+                                   self.ordering)
+
+    def order_by(self, *ordering):
+        return CombinedWorkPeriods(self.hot, self.cold, ordering)
+
+    def count(self):
+        return self.hot.count() + self.cold.count()
+
+    def __len__(self):
+        if self._result_cache is not None:
+            return len(self._result_cache)
+        return self.count()
+
+    def union(self):
+        # Both sides must select the same columns, in model order.
+        hot = self.hot.select_related(None).prefetch_related(None).defer(
+            None).order_by()
+        return hot.union(self.cold.order_by().values_list(*FIELDS),
+                         all=True).order_by(*self.ordering)
+
+    def __getitem__(self, key):
+        if self._result_cache is not None:
+            return self._result_cache[key]
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        work_periods = list(self.union()[key])
+        prefetch_related_objects(work_periods, 'employee')
+        return work_periods
+
+    def __iter__(self):
+        if self._result_cache is None:
+            self._result_cache = self[:]
+        return iter(self._result_cache)
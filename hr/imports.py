@@ -0,0 +1,185 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import transaction
+from django.utils import dateparse, timezone
+
+from .models import ClockStatus, Employee, WorkPeriod
+from .overlaps import find_batch_overlaps
+from .rollups import local_day, refresh_days
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+FORMATS = (CSV, NDJSON)
+
+CONTENT_TYPES = {
+    'text/csv': CSV,
+    'application/x-ndjson': NDJSON,
+    'application/ndjson': NDJSON,
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class ImportResult(object):
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def rows_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return self.rows / self.elapsed
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'errors': self.errors,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second(), 1),
+        }
+
+
+def _csv_rows(lines):
+    reader = csv.DictReader(lines)
+    # The header is read with the first row.
+    line_number = None
+    for row in reader:
+        if line_number is None:
+            line_number = reader.line_num
+        yield line_number, row
+        # A quoted value can span lines; the next row starts after them.
+        line_number = reader.line_num + 1
+
+
+def read_rows(lines, format):
+    """
+    Lazily parse CSV or NDJSON text lines into `(line number, row)` pairs,
+    numbered from 1 by the line of the file each row starts on. NDJSON
+    lines are decoded by `import_work_periods`, so that a malformed line is
+    reported like any other invalid row.
+    """
+    if format == CSV:
+        return _csv_rows(lines)
+    if format == NDJSON:
+        return ((line_number, line)
+                for line_number, line in enumerate(lines, 1) if line.strip())
+    raise ValueError("Unknown import format '{}'".format(format))
+
+
+def _parse_time(value):
+    if value in (None, ''):
+        return None
+    parsed = dateparse.parse_datetime(str(value))
+    if parsed is None:
+        raise ValueError("Invalid date/time '{}'".format(value))
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _build(row):
+    if isinstance(row, str):
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        raise ValueError('Row is not an object')
+    payroll_id = row.get('payroll_id')
+    if not payroll_id:
+        raise ValueError('payroll_id is required')
+    start_time = _parse_time(row.get('start_time'))
+    if start_time is None:
+        raise ValueError('start_time is required')
+    adjustment = row.get('adjustment')
+    note = row.get('note') or None
+    if note is not None and len(note) > 60:
+        raise ValueError('note is longer than 60 characters')
+    return str(payroll_id), WorkPeriod(
+        start_time=start_time,
+        end_time=_parse_time(row.get('end_time')),
+        adjustment=int(adjustment) if adjustment not in (None, '') else None,
+        note=note,
+    )
+
+
+def _import_chunk(chunk, result):
+    parsed = []
+    for row_number, row in chunk:
+        try:
+            parsed.append((row_number,) + _build(row))
+        except (ValueError, TypeError) as e:
+            result.errors.append({'row': row_number, 'error': str(e)})
+
+    payroll_ids = set(payroll_id for _, payroll_id, _ in parsed)
+    employees = {}
+    for payroll_id, employee_id in Employee.objects.filter(
+            payroll_id__in=payroll_ids).values_list('payroll_id', 'id'):
+        employees.setdefault(payroll_id, []).append(employee_id)
+
+    by_employee = {}
+    for row_number, payroll_id, work_period in parsed:
+        employee_ids = employees.get(payroll_id, [])
+        if len(employee_ids) != 1:
+            error = "No employee with payroll_id '{}'"
+            if employee_ids:
+                error = "More than one employee with payroll_id '{}'"
+            result.errors.append({'row': row_number,
+                                  'error': error.format(payroll_id)})
+            continue
+        employee_id = employee_ids[0]
+        work_period.employee_id = employee_id
+        by_employee.setdefault(employee_id, []).append(
+            (row_number, work_period))
+
+    with transaction.atomic():
+        work_periods = []
+        for employee_id, rows in by_employee.items():
+            errors = find_batch_overlaps(
+                employee_id,
+                [(wp.start_time, wp.end_time) for _, wp in rows])
+            for index, (row_number, work_period) in enumerate(rows):
+                if index in errors:
+                    result.errors.append({'row': row_number,
+                                          'error': errors[index]})
+                else:
+                    work_periods.append(work_period)
+        WorkPeriod.objects.bulk_create(work_periods)
+        # bulk_create does not send post_save, so refresh the derived
+        # tables here.
+        days = {}
+        for work_period in work_periods:
+            days.setdefault(work_period.employee_id, set()).add(
+                local_day(work_period.start_time))
+        for employee_id, employee_days in days.items():
+            ClockStatus.objects.refresh(employee_id)
+            refresh_days(employee_id, employee_days)
+    result.created += len(work_periods)
+
+
+def import_work_periods(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert work periods from an iterable of `(line number, row dict)`
+    pairs, as `read_rows` gives, `chunk_size` rows at a time. Errors are
+    reported by line number.
+
+    Each chunk resolves its employees by `payroll_id` with one query, is
+    checked for overlaps and is inserted with `bulk_create` in its own
+    transaction. Invalid rows are reported in the result and skipped.
+    """
+    result = ImportResult()
+    started = time.time()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        _import_chunk(chunk, result)
+        result.rows += len(chunk)
+    result.elapsed = time.time() - started
+    result.errors.sort(key=lambda error: error['row'])
+    return result
@@ -0,0 +1,105 @@
+from django.core.exceptions import FieldDoesNotExist
+
+
+def underscore(name):
+    return name.strip().replace('-', '_')
+
+
+def include_paths(request):
+    param = request.query_params.get('include', None)
+    if not param:
+        return []
+    return [path for path in param.split(',') if path]
+
+
+def related_lookups(model, paths):
+    """
+    Split JSON:API `include` paths into `select_related` lookups (forward
+    foreign keys and one-to-ones, joined in the same query) and
+    `prefetch_related` lookups (everything else). The relationships of the
+    included resources are loaded along with them.
+    """
+    select, prefetch = set(), set()
+    for path in paths:
+        current = model
+        lookup = []
+        joinable = True
+        for name in path.split('.'):
+            try:
+                field = current._meta.get_field(underscore(name))
+            except FieldDoesNotExist:
+                break
+            if not field.is_relation:
+                break
+            lookup.append(field.name)
+            if not (field.many_to_one or field.one_to_one):
+                joinable = False
+            current = field.related_model
+        if lookup:
+            lookups = select if joinable else prefetch
+            lookups.add('__'.join(lookup))
+            lookups.update('__'.join(lookup + [name])
+                           for name in forward_relations(current))
+    return sorted(select), sorted(prefetch)
+
+
+def forward_relations(model):
+    """
+    Foreign keys and one-to-ones of `model`. The JSON:API renderer loads
+    the related object of each to find its resource type, so they are
+    joined up front instead of fetched once per row.
+    """
+    return [field.name for field in model._meta.concrete_fields
+            if field.is_relation]
+
+
+def fieldset(request, resource_type):
+    """
+    The field names of the `fields[type]=` parameter, underscored, or None
+    if it is not given.
+    """
+    param = request.query_params.get('fields[{}]'.format(resource_type), None)
+    if not param:
+        return None
+    return set(underscore(name) for name in param.split(',') if name)
+
+
+def sparse_fields(model, request, resource_type):
+    """
+    Model fields to load for a `fields[type]=` request, or None to load
+    everything.
+
+    The primary key and foreign keys are always kept, since ownership
+    checks and relationships need them. A fieldset naming anything that is
+    not a concrete field (e.g. a method) loads everything.
+    """
+    names = fieldset(request, resource_type)
+    if names is None:
+        return None
+    concrete = model._meta.concrete_fields
+    if not names <= set(field.name for field in concrete):
+        return None
+    names.update(field.name for field in concrete
+                 if field.primary_key or field.is_relation)
+    return sorted(names)
+
+
+def optimize(queryset, request, resource_type, sparse=True):
+    """
+    Apply `select_related`/`prefetch_related` for the relationships and
+    requested includes, and, if `sparse`, `only()` for the requested sparse
+    fieldset. Querysets that load instances to be saved or deleted must not
+    be sparse, since signal handlers read their unrequested fields.
+    """
+    select, prefetch = related_lookups(queryset.model, include_paths(request))
+    select = sorted(set(select).union(forward_relations(queryset.model)))
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    fields = None
+    if sparse:
+        fields = sparse_fields(queryset.model, request, resource_type)
+    if fields is not None:
+        queryset = queryset.only(*fields)
+    return queryset
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import dateparse, timezone
+
+from hr.balances import accrue
+
+
+class Command(BaseCommand):
+    help = ('Accrue time off for the period containing a date, for every '
+            'active accrual policy. Meant to run daily; each employee '
+            'accrues once per policy and period.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Date to accrue for '
+                                           '(default: today).')
+
+    def handle(self, *args, **options):
+        day = timezone.localdate()
+        if options['date'] is not None:
+            day = dateparse.parse_date(options['date'])
+            if day is None:
+                raise CommandError("Invalid date '{}'".format(options['date']))
+        entries = accrue(day)
+        self.stdout.write('Posted {} accruals for {}.'.format(len(entries),
+                                                              day))
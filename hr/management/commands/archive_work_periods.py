@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hr.archive import DEFAULT_CHUNK_SIZE, archive_closed
+from hr.history import horizon_days
+
+
+class Command(BaseCommand):
+    help = ('Move closed work periods older than the archive horizon out '
+            'of the work period table.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Archive work periods that started at least '
+                                 'this many days ago (default: '
+                                 'HR_ARCHIVE_HORIZON_DAYS).')
+        parser.add_argument('--chunk-size', type=int,
+                            default=DEFAULT_CHUNK_SIZE,
+                            help='Work periods moved per transaction.')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = horizon_days()
+        if days < 0 or options['chunk_size'] < 1:
+            raise CommandError('--days and --chunk-size must be positive.')
+        before = timezone.now() - timedelta(days=days)
+        count = archive_closed(before, options['chunk_size'])
+        self.stdout.write('Archived {} work periods that started before '
+                          '{}.'.format(count, before.date()))
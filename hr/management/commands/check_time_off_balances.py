@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from hr.balances import check
+
+
+class Command(BaseCommand):
+    help = ('Recompute every time off balance from the ledger and the days '
+            'off, and report the ones that drifted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Correct the drifted balances.')
+
+    def handle(self, *args, **options):
+        drift = check(fix=options['fix'])
+        for row in drift:
+            self.stdout.write(
+                'Employee {employee} {day_off_type}: accrued {accrued} '
+                '(expected {expected_accrued}), used {used} '
+                '(expected {expected_used})'.format(**row))
+        if not drift:
+            self.stdout.write('All balances are consistent.')
+        elif options['fix']:
+            self.stdout.write('Fixed {} balances.'.format(len(drift)))
+        else:
+            self.stderr.write('{} balances drifted; run with --fix to '
+                              'correct them.'.format(len(drift)))
@@ -0,0 +1,75 @@
+import resource
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import dateparse, timezone
+
+from hr import exports
+
+
+class CountingRows(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+class Command(BaseCommand):
+    help = 'Export the work periods and days off of a pay period.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pay-period', help='Any date in the pay period '
+                                                 '(default: today).')
+        parser.add_argument('--file', choices=exports.FORMATS,
+                            default=exports.CSV, help='File format.')
+        parser.add_argument('--output', help='File to write (default: '
+                                             'standard output).')
+        parser.add_argument('--stats', action='store_true',
+                            help='Report rows per second and peak memory '
+                                 'use on standard error.')
+
+    def handle(self, *args, **options):
+        day = timezone.localdate()
+        if options['pay_period'] is not None:
+            day = dateparse.parse_date(options['pay_period'])
+            if day is None:
+                raise CommandError("Invalid date '{}'".format(
+                    options['pay_period']))
+        file_format = options['file']
+        if file_format == exports.XLSX and options['output'] is None:
+            raise CommandError('--output is required for XLSX exports.')
+
+        first, last = exports.pay_period(day)
+        rows = CountingRows(exports.payroll_rows(first, last))
+        if file_format == exports.XLSX:
+            chunks = exports.xlsx_chunks(rows)
+        else:
+            chunks = exports.csv_lines(rows)
+
+        started = time.time()
+        if options['output'] is None:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+        else:
+            if file_format == exports.XLSX:
+                f = open(options['output'], 'wb')
+            else:
+                f = open(options['output'], 'w', newline='')
+            with f:
+                for chunk in chunks:
+                    f.write(chunk)
+        elapsed = time.time() - started
+
+        if options['stats']:
+            # ru_maxrss is in kilobytes on Linux.
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.stderr.write(
+                'Exported {} rows from {} to {} in {:.2f}s ({:.0f} rows/s), '
+                'peak RSS {} MB.'.format(
+                    rows.count, first, last, elapsed,
+                    rows.count / elapsed if elapsed else 0, peak // 1024))
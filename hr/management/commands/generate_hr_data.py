@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.synthetic import Generator
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic users, employees, work periods and days off '
+            'for development and benchmarks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100,
+                            help='Number of employees (default: 100).')
+        parser.add_argument('--managers', type=int, default=5,
+                            help='Number of managers (default: 5).')
+        parser.add_argument('--terminals', type=int, default=2,
+                            help='Number of terminal users (default: 2).')
+        parser.add_argument('--years', type=int, default=1,
+                            help='Years of work periods, ending yesterday '
+                                 '(default: 1).')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed (default: 0).')
+        parser.add_argument('--prefix', default='bench',
+                            help="Username prefix of the generated users "
+                                 "(default: 'bench').")
+
+    def handle(self, *args, **options):
+        if options['employees'] < 1 or options['years'] < 1:
+            raise CommandError('--employees and --years must be positive.')
+        if options['managers'] < 1 or options['terminals'] < 1:
+            raise CommandError('--managers and --terminals must be positive.')
+        if User.objects.filter(
+                username__startswith=options['prefix']).exists():
+            raise CommandError(
+                "Users with prefix '{}' already exist.".format(
+                    options['prefix']))
+
+        Generator(prefix=options['prefix'], employees=options['employees'],
+                  managers=options['managers'],
+                  terminals=options['terminals'], years=options['years'],
+                  seed=options['seed'], stdout=self.stdout).run()
+        self.stdout.write('Done.')
@@ -0,0 +1,45 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hr.imports import (CSV, DEFAULT_CHUNK_SIZE, FORMATS, NDJSON,
+                        import_work_periods, read_rows)
+
+EXTENSIONS = {
+    '.csv': CSV,
+    '.ndjson': NDJSON,
+    '.jsonl': NDJSON,
+}
+
+
+class Command(BaseCommand):
+    help = 'Import work periods from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help='Input format, guessed from the file '
+                                 'extension by default.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format']
+        if format is None:
+            extension = os.path.splitext(path)[1].lower()
+            format = EXTENSIONS.get(extension, None)
+            if format is None:
+                raise CommandError('Cannot guess the format of {}, use '
+                                   '--format.'.format(path))
+
+        with open(path, newline='') as lines:
+            result = import_work_periods(read_rows(lines, format),
+                                         chunk_size=options['chunk_size'])
+
+        for error in result.errors:
+            self.stderr.write('Line {row}: {error}'.format(**error))
+        self.stdout.write(
+            'Imported {} of {} rows in {:.1f}s ({:.0f} rows/sec).'.format(
+                result.created, result.rows, result.elapsed,
+                result.rows_per_second()))
@@ -0,0 +1,42 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hr import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Measure how many idle long-poll subscribers one worker process '
+            'can hold, and how fast they wake up.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, action='append',
+                            help='Number of subscribers to hold. Repeatable '
+                                 '(default: 100, 1000 and 5000).')
+        parser.add_argument('--hold', type=float, default=5.0,
+                            help='Seconds to hold them idle (default: 5).')
+        parser.add_argument('--output', help='File to write the results '
+                                             'to as JSON.')
+
+    def handle(self, *args, **options):
+        counts = options['subscribers'] or [100, 1000, 5000]
+        if min(counts) < 1 or options['hold'] < 0:
+            raise CommandError('--subscribers and --hold must be positive.')
+
+        self.stdout.write('{:>11} {:>8} {:>10} {:>12} {:>10} {:>10} '
+                          '{:>10}'.format('subscribers', 'woken', 'start ms',
+                                          'KB/sub', 'idle cpu', 'wake p95',
+                                          'wake max'))
+        results = []
+        for count in counts:
+            result = benchmark.idle_subscribers(count, options['hold'])
+            results.append(result)
+            self.stdout.write(
+                '{subscribers:>11} {woken:>8} {start_ms:>10.1f} '
+                '{rss_kb_per_subscriber:>12} {idle_cpu_ms:>10.1f} '
+                '{wake_p95_ms:>10.1f} {wake_max_ms:>10.1f}'.format(**result))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            self.stdout.write('Wrote {}.'.format(options['output']))
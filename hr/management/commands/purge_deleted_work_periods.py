@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from hr.archive import DEFAULT_CHUNK_SIZE, archive_deleted
+
+
+class Command(BaseCommand):
+    help = ('Move soft-deleted work periods older than a number of days '
+            'to the archive table, or delete them for good.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90,
+                            help='Only work periods that started at least '
+                                 'this many days ago (default: 90).')
+        parser.add_argument('--purge', action='store_true',
+                            help='Delete them instead of archiving them.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=DEFAULT_CHUNK_SIZE,
+                            help='Work periods moved per transaction.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['chunk_size'] < 1:
+            raise CommandError('--days and --chunk-size must be positive.')
+        before = timezone.now() - timedelta(days=options['days'])
+        count = archive_deleted(before, options['chunk_size'],
+                                keep=not options['purge'])
+        self.stdout.write('{} {} deleted work periods that started before '
+                          '{}.'.format('Purged' if options['purge']
+                                       else 'Archived', count,
+                                       before.date()))
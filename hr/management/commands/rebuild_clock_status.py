@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from hr.models import ClockStatus
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the clock status table from work periods.'
+
+    def handle(self, *args, **options):
+        count = ClockStatus.objects.rebuild()
+        self.stdout.write('Rebuilt clock status for {} employees.'.format(count))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import dateparse, timezone
+
+from hr.models import ArchivedWorkPeriod, DayOff, WorkPeriod
+from hr.rollups import local_day, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily hours rollups for a range of dates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date to rebuild '
+                                            '(default: first work period).')
+        parser.add_argument('--end', help='Last date to rebuild '
+                                          '(default: today).')
+
+    def handle(self, *args, **options):
+        start = self.parse_date(options['start'])
+        end = self.parse_date(options['end']) or timezone.localdate()
+        if start is None:
+            start = self.first_date()
+            if start is None:
+                self.stdout.write('Nothing to roll up.')
+                return
+        if start > end:
+            raise CommandError('--start must not be after --end.')
+
+        count = rebuild(start, end)
+        self.stdout.write('Rebuilt {} rollups from {} to {}.'.format(
+            count, start, end))
+
+    def first_date(self):
+        dates = []
+        for model in (WorkPeriod, ArchivedWorkPeriod):
+            work_period = model.objects.order_by('start_time').first()
+            if work_period is not None:
+                dates.append(local_day(work_period.start_time))
+        day_off = DayOff.objects.order_by('date').first()
+        if day_off is not None:
+            dates.append(day_off.date)
+        return min(dates) if dates else None
+
+    def parse_date(self, value):
+        if value is None:
+            return None
+        parsed = dateparse.parse_date(value)
+        if parsed is None:
+            raise CommandError("Invalid date '{}'".format(value))
+        return parsed
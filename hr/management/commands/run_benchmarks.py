@@ -0,0 +1,90 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hr import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Measure the latency, queries and throughput of the API '
+            'endpoints against data from generate_hr_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench',
+                            help="Username prefix of the generated users "
+                                 "(default: 'bench').")
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Measured requests per endpoint '
+                                 '(default: 20).')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Unmeasured requests per endpoint first '
+                                 '(default: 2).')
+        parser.add_argument('--only', action='append',
+                            help='Run the scenarios starting with this '
+                                 'name, e.g. work-periods. Repeatable.')
+        parser.add_argument('--archive', action='store_true',
+                            help='Run the scenarios again after archiving '
+                                 'the work periods past the archive horizon '
+                                 '(rolled back afterwards).')
+        parser.add_argument('--output', help='File to write the results '
+                                             'to as JSON.')
+        parser.add_argument('--baseline', help='Results of an earlier run '
+                                               'to compare with.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='p95 slowdown that counts as a regression '
+                                 '(default: 0.2, i.e. 20%%).')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if any scenario '
+                                 'regressed.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations must be positive.')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError('Can not read the baseline: {}'.format(e))
+
+        try:
+            report = benchmark.run(prefix=options['prefix'],
+                                   iterations=options['iterations'],
+                                   warmup=options['warmup'],
+                                   only=options['only'],
+                                   archive=options['archive'])
+        except benchmark.BenchmarkError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            '{:<40} {:>6} {:>10} {:>10} {:>8} {:>10} {:>10}'.format(
+                'scenario', 'status', 'p50 ms', 'p95 ms', 'queries', 'bytes',
+                'req/s'))
+        for result in report['results']:
+            self.stdout.write(
+                '{name:<40} {status:>6} {p50_ms:>10.1f} {p95_ms:>10.1f} '
+                '{queries:>8} {bytes:>10} {requests_per_second:>10}'.format(
+                    **result))
+
+        if report['archived_work_periods'] is not None:
+            self.stdout.write("Archived {} work periods for the scenarios "
+                              "prefixed with 'archived.'.".format(
+                                  report['archived_work_periods']))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write('Wrote {}.'.format(options['output']))
+
+        if baseline is not None:
+            regressions = benchmark.compare(report, baseline,
+                                            options['threshold'])
+            for name, field, before, after in regressions:
+                self.stdout.write('Regression: {} {} {} -> {}'.format(
+                    name, field, before, after))
+            if not regressions:
+                self.stdout.write('No regressions against {}.'.format(
+                    options['baseline']))
+            elif options['fail_on_regression']:
+                raise CommandError('{} regressions.'.format(len(regressions)))
@@ -0,0 +1,160 @@
+import threading
+import time
+
+from authentication.authentication import stats as token_cache_stats
+
+# Upper bounds, in seconds, of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+LABELS = ('route', 'action', 'method', 'status')
+
+# The database counters only cover the requests sampled for them, which
+# `hr_http_sql_sampled_requests_total` counts.
+COUNTERS = (
+    ('sql_sampled', 'hr_http_sql_sampled_requests_total',
+     'Requests whose database queries were recorded.'),
+    ('db_queries', 'hr_http_db_queries_total',
+     'Database queries run by sampled requests.'),
+    ('db_seconds', 'hr_http_db_query_seconds_total',
+     'Time spent in database queries by sampled requests.'),
+    ('serialize_seconds', 'hr_http_serialize_seconds_total',
+     'Time spent serializing response data.'),
+    ('render_seconds', 'hr_http_render_seconds_total',
+     'Time spent rendering responses.'),
+    ('response_bytes', 'hr_http_response_bytes_total',
+     'Size of the response bodies, streaming responses excluded.'),
+)
+
+
+class Series(object):
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.totals = dict((name, 0) for name, _, _ in COUNTERS)
+
+
+class Registry(object):
+    """
+    Request metrics of this process, per route, action, method and status.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, labels, duration, **totals):
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = Series()
+            series.count += 1
+            series.duration += duration
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    series.buckets[index] += 1
+            for name, value in totals.items():
+                series.totals[name] += value
+
+    def render(self):
+        """
+        The metrics in the Prometheus text exposition format.
+        """
+        with self.lock:
+            items = sorted(
+                (labels, series.count, series.duration,
+                 list(series.buckets), dict(series.totals))
+                for labels, series in self.series.items())
+
+        lines = [
+            '# HELP hr_http_request_duration_seconds Request latency.',
+            '# TYPE hr_http_request_duration_seconds histogram',
+        ]
+        for labels, count, duration, buckets, _ in items:
+            for bound, value in zip(LATENCY_BUCKETS, buckets):
+                lines.append('hr_http_request_duration_seconds_bucket'
+                             '{{{},le="{}"}} {}'.format(
+                                 format_labels(labels), bound, value))
+            lines.append('hr_http_request_duration_seconds_bucket'
+                         '{{{},le="+Inf"}} {}'.format(format_labels(labels),
+                                                      count))
+            lines.append(
+                'hr_http_request_duration_seconds_sum{{{}}} {}'.format(
+                    format_labels(labels), duration))
+            lines.append('hr_http_request_duration_seconds_count{{{}}} '
+                         '{}'.format(format_labels(labels), count))
+        for name, metric, help_text in COUNTERS:
+            lines.append('# HELP {} {}'.format(metric, help_text))
+            lines.append('# TYPE {} counter'.format(metric))
+            for labels, _, _, _, totals in items:
+                lines.append('{}{{{}}} {}'.format(
+                    metric, format_labels(labels), totals[name]))
+
+        for name in ('hits', 'misses'):
+            metric = 'hr_token_cache_{}_total'.format(name)
+            lines.append('# TYPE {} counter'.format(metric))
+            lines.append('{} {}'.format(metric, token_cache_stats[name]))
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+def format_labels(labels):
+    return ','.join('{}="{}"'.format(name, escape(value))
+                    for name, value in zip(LABELS, labels))
+
+
+registry = Registry()
+
+
+def request_metrics(request):
+    """
+    The metrics being collected for `request` by `MetricsMiddleware`, or
+    None. Accepts Django and DRF requests.
+    """
+    request = getattr(request, '_request', request)
+    return getattr(request, '_metrics', None)
+
+
+class MetricsMixin(object):
+    """
+    Adds the action, serializer time and the end of the view to the
+    metrics `MetricsMiddleware` collects for the request.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        metrics = request_metrics(request)
+        if metrics is not None:
+            metrics['action'] = (getattr(self, 'action', None) or
+                                 request.method.lower())
+        super().initial(request, *args, **kwargs)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        metrics = request_metrics(self.request)
+        if metrics is not None:
+            to_representation = serializer.to_representation
+
+            def timed(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return to_representation(*args, **kwargs)
+                finally:
+                    metrics['serialize_seconds'] += (time.perf_counter() -
+                                                     started)
+
+            serializer.to_representation = timed
+        return serializer
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args,
+                                             **kwargs)
+        metrics = request_metrics(request)
+        if metrics is not None:
+            metrics['view_done'] = time.perf_counter()
+        return response
@@ -0,0 +1,126 @@
+import logging
+import random
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections
+from django.utils.deprecation import MiddlewareMixin
+
+from rest_framework.permissions import SAFE_METHODS
+
+from . import replicas
+from .metrics import registry
+
+logger = logging.getLogger('hr.metrics')
+
+
+def slow_request_ms():
+    return getattr(settings, 'HR_SLOW_REQUEST_MS', 1000)
+
+
+def slow_request_ignored():
+    return getattr(settings, 'HR_SLOW_REQUEST_IGNORE', ())
+
+
+def slow_request_sql_limit():
+    return getattr(settings, 'HR_SLOW_REQUEST_SQL_LIMIT', 50)
+
+
+def sql_sample_rate():
+    return getattr(settings, 'HR_METRICS_SQL_SAMPLE_RATE', 0.1)
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    """
+    Records the latency and response size of every request in
+    `hr.metrics.registry`, and logs requests slower than
+    `HR_SLOW_REQUEST_MS`.
+
+    The database queries and time of a sample of `HR_METRICS_SQL_SAMPLE_RATE`
+    of the requests are recorded and logged too. They are captured through
+    the connections' debug cursor, as `DEBUG = True` does, for the duration
+    of the request only, which costs every query of it some time.
+    """
+
+    def process_request(self, request):
+        capture = None
+        if random.random() < sql_sample_rate():
+            capture = []
+            for connection in connections.all():
+                capture.append((connection, connection.force_debug_cursor,
+                                len(connection.queries_log)))
+                connection.force_debug_cursor = True
+        request._metrics = {
+            'start': time.perf_counter(),
+            'capture': capture,
+            'action': '',
+            'serialize_seconds': 0.0,
+            'view_done': None,
+        }
+
+    def process_response(self, request, response):
+        metrics = getattr(request, '_metrics', None)
+        if metrics is None:
+            return response
+        now = time.perf_counter()
+        duration = now - metrics['start']
+
+        sampled = metrics['capture'] is not None
+        queries = []
+        for connection, force_debug_cursor, start in metrics['capture'] or ():
+            queries.extend(islice(connection.queries_log, start, None))
+            connection.force_debug_cursor = force_debug_cursor
+        db_seconds = sum(float(query['time']) for query in queries)
+
+        render_seconds = 0.0
+        if metrics['view_done'] is not None:
+            render_seconds = now - metrics['view_done']
+        response_bytes = 0
+        if not response.streaming:
+            response_bytes = len(response.content)
+
+        match = request.resolver_match
+        route = match.view_name if match is not None else 'unmatched'
+        registry.observe(
+            (route, metrics['action'], request.method, response.status_code),
+            duration, sql_sampled=int(sampled), db_queries=len(queries),
+            db_seconds=db_seconds,
+            serialize_seconds=metrics['serialize_seconds'],
+            render_seconds=render_seconds, response_bytes=response_bytes)
+
+        if (duration * 1000 >= slow_request_ms() and
+                route not in slow_request_ignored()):
+            if sampled:
+                limit = slow_request_sql_limit()
+                logger.warning(
+                    'Slow request %s %s (%s %s): %.0f ms, %d queries in '
+                    '%.0f ms%s', request.method, request.get_full_path(),
+                    route, metrics['action'], duration * 1000, len(queries),
+                    db_seconds * 1000, ''.join(
+                        '\n  [{} s] {}'.format(query['time'], query['sql'])
+                        for query in queries[:limit]))
+            else:
+                logger.warning(
+                    'Slow request %s %s (%s %s): %.0f ms, queries not '
+                    'sampled', request.method, request.get_full_path(),
+                    route, metrics['action'], duration * 1000)
+        return response
+
+
+class ReplicaMiddleware(MiddlewareMixin):
+    """
+    Starts every request on the primary database, and pins users who write
+    to it for `HR_REPLICA_PIN_SECONDS` so that they read their own writes.
+    Views opt in to the replica through `hr.replicas.ReplicaReadMixin`.
+    """
+
+    def process_request(self, request):
+        replicas.use_primary()
+
+    def process_response(self, request, response):
+        if (request.method not in SAFE_METHODS and
+                response.status_code < 400 and
+                replicas.replica_alias() is not None):
+            replicas.pin(response, getattr(request, 'user', None))
+        return response
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 09:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_clock_status(apps, schema_editor):
+    """
+    One status per employee from their most recent work period.
+    """
+    WorkPeriod = apps.get_model('hr', 'WorkPeriod')
+    ClockStatus = apps.get_model('hr', 'ClockStatus')
+    statuses = []
+    employee_id = None
+    work_periods = WorkPeriod.objects.filter(is_deleted=False).order_by(
+        'employee_id', '-start_time', '-id')
+    for work_period in work_periods.iterator():
+        if work_period.employee_id == employee_id:
+            continue
+        employee_id = work_period.employee_id
+        statuses.append(ClockStatus(
+            employee_id=employee_id,
+            work_period_id=(work_period.id if work_period.end_time is None
+                            else None),
+            last_start_time=work_period.start_time,
+            last_end_time=work_period.end_time))
+    ClockStatus.objects.bulk_create(statuses, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0003_auto_20160623_0554'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClockStatus',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_start_time', models.DateTimeField(blank=True, null=True)),
+                ('last_end_time', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='clock_status', to='hr.Employee')),
+                ('work_period', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hr.WorkPeriod')),
+            ],
+            options={
+                'verbose_name_plural': 'Clock statuses',
+            },
+        ),
+        migrations.RunPython(fill_clock_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 10:03
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0004_clockstatus'),
+    ]
+
+    # The work period indexes depend on the backend and are created by
+    # 0015_work_period_indexes.
+    operations = [
+        migrations.AddIndex(
+            model_name='dayoff',
+            index=models.Index(fields=['employee', 'date'], name='hr_dayoff_employee_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='daysoffrequest',
+            index=models.Index(fields=['seen', 'start_date'], name='hr_dor_seen_start_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 11:40
+from __future__ import unicode_literals
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import DurationField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+import django.db.models.deletion
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Daily totals for every existing work period and day off, as
+    `rollups.rebuild` computes them.
+    """
+    WorkPeriod = apps.get_model('hr', 'WorkPeriod')
+    DayOff = apps.get_model('hr', 'DayOff')
+    HoursRollup = apps.get_model('hr', 'HoursRollup')
+    rollups = {}
+
+    def rollup(employee_id, day):
+        key = (employee_id, day)
+        if key not in rollups:
+            rollups[key] = HoursRollup(employee_id=employee_id, date=day)
+        return rollups[key]
+
+    duration = ExpressionWrapper(F('end_time') - F('start_time'),
+                                 output_field=DurationField())
+    worked = WorkPeriod.objects.filter(
+        is_deleted=False, end_time__isnull=False
+    ).annotate(
+        day=TruncDate('start_time')
+    ).values('employee_id', 'day').annotate(
+        worked=Sum(duration), adjustment=Sum('adjustment')
+    ).order_by().values_list('employee_id', 'day', 'worked', 'adjustment')
+    for employee_id, day, total, adjustment in worked.iterator():
+        total += timedelta(minutes=adjustment or 0)
+        rollup(employee_id, day).worked_minutes = int(
+            total.total_seconds() // 60)
+    days_off = DayOff.objects.values('employee_id', 'date', 'is_paid').annotate(
+        total=Sum('hours')
+    ).order_by().values_list('employee_id', 'date', 'is_paid', 'total')
+    for employee_id, day, is_paid, hours in days_off.iterator():
+        if is_paid:
+            rollup(employee_id, day).paid_day_off_hours += hours
+        else:
+            rollup(employee_id, day).unpaid_day_off_hours += hours
+    HoursRollup.objects.bulk_create(rollups.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0005_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HoursRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('worked_minutes', models.IntegerField(default=0)),
+                ('paid_day_off_hours', models.IntegerField(default=0)),
+                ('unpaid_day_off_hours', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hours_rollups', to='hr.Employee')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='hoursrollup',
+            unique_together=set([('employee', 'date')]),
+        ),
+        migrations.AddIndex(
+            model_name='hoursrollup',
+            index=models.Index(fields=['date'], name='hr_rollup_date_idx'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 13:25
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0006_hoursrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClockEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('event_type', models.CharField(choices=[('in', 'Clock in'), ('out', 'Clock out')], max_length=3)),
+                ('event_time', models.DateTimeField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='clock_events', to='hr.Employee')),
+                ('work_period', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hr.WorkPeriod')),
+            ],
+        ),
+    ]
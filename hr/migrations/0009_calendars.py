@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 15:10
+from __future__ import unicode_literals
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0008_usersettings_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkCalendar',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40, unique=True)),
+                ('working_weekdays', models.CharField(default='01234', max_length=7, validators=[django.core.validators.RegexValidator(message='Please enter weekdays as digits, Monday being 0, e.g. `01234`', regex='^[0-6]{0,7}$')])),
+                ('is_default', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Holiday',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('name', models.CharField(max_length=60)),
+                ('calendar', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to='hr.WorkCalendar')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='holiday',
+            unique_together=set([('calendar', 'date')]),
+        ),
+        migrations.AddField(
+            model_name='employee',
+            name='calendar',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='employees', to='hr.WorkCalendar'),
+        ),
+    ]
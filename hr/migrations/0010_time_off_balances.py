@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 15:40
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def post_existing_usage(apps, schema_editor):
+    """
+    Start the ledger with one usage entry per existing paid day off.
+    """
+    DayOff = apps.get_model('hr', 'DayOff')
+    TimeOffEntry = apps.get_model('hr', 'TimeOffEntry')
+    TimeOffBalance = apps.get_model('hr', 'TimeOffBalance')
+    types = getattr(settings, 'HR_BALANCE_TYPES', ('vn', 'pl'))
+
+    used = {}
+    entries = []
+    days_off = DayOff.objects.filter(is_paid=True, day_off_type__in=types)
+    for day_off in days_off.iterator():
+        entries.append(TimeOffEntry(
+            employee_id=day_off.employee_id, day_off_type=day_off.day_off_type,
+            kind='usage', hours=-day_off.hours, date=day_off.date,
+            day_off_id=day_off.id))
+        key = (day_off.employee_id, day_off.day_off_type)
+        used[key] = used.get(key, 0) + day_off.hours
+    TimeOffEntry.objects.bulk_create(entries, batch_size=500)
+    TimeOffBalance.objects.bulk_create(
+        (TimeOffBalance(employee_id=employee_id, day_off_type=day_off_type,
+                        used=hours)
+         for (employee_id, day_off_type), hours in used.items()),
+        batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0009_calendars'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccrualPolicy',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40)),
+                ('day_off_type', models.CharField(choices=[('hy', 'Holiday'), ('vn', 'Vacation'), ('pl', 'Personal')], max_length=2)),
+                ('hours', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('period', models.CharField(choices=[('pay-period', 'Pay period'), ('month', 'Month')], default='pay-period', max_length=10)),
+                ('max_balance', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Accrual policies',
+            },
+        ),
+        migrations.CreateModel(
+            name='TimeOffBalance',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day_off_type', models.CharField(choices=[('hy', 'Holiday'), ('vn', 'Vacation'), ('pl', 'Personal')], max_length=2)),
+                ('accrued', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('used', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_off_balances', to='hr.Employee')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TimeOffEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day_off_type', models.CharField(choices=[('hy', 'Holiday'), ('vn', 'Vacation'), ('pl', 'Personal')], max_length=2)),
+                ('kind', models.CharField(choices=[('accrual', 'Accrual'), ('usage', 'Usage'), ('adjustment', 'Adjustment')], max_length=10)),
+                ('hours', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('date', models.DateField()),
+                ('note', models.CharField(blank=True, max_length=120, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('day_off', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hr.DayOff')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='time_off_entries', to='hr.Employee')),
+                ('policy', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='hr.AccrualPolicy')),
+            ],
+            options={
+                'verbose_name_plural': 'Time off entries',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='timeoffbalance',
+            unique_together=set([('employee', 'day_off_type')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timeoffentry',
+            unique_together=set([('employee', 'policy', 'date')]),
+        ),
+        migrations.AddIndex(
+            model_name='timeoffentry',
+            index=models.Index(fields=['employee', 'day_off_type'], name='hr_tofe_employee_type_idx'),
+        ),
+        migrations.RunPython(post_existing_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 16:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0010_time_off_balances'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedWorkPeriod',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('adjustment', models.IntegerField(blank=True, null=True)),
+                ('note', models.CharField(blank=True, max_length=60, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='hr.Employee')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedworkperiod',
+            index=models.Index(fields=['employee', 'start_time'], name='hr_awp_employee_start_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 16:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0011_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedworkperiod',
+            index=models.Index(fields=['start_time'], name='hr_awp_start_idx'),
+        ),
+    ]
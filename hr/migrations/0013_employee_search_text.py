@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 17:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def fill_search_text(apps, schema_editor):
+    from hr.search import search_text
+
+    Employee = apps.get_model('hr', 'Employee')
+    rows = Employee.objects.values_list(
+        'id', 'first_name', 'last_name', 'payroll_id', 'primary_phone',
+        'secondary_phone', 'user__username')
+    for row in rows.iterator():
+        Employee.objects.filter(id=row[0]).update(
+            search_text=search_text(*row[1:]))
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX hr_employee_search_trgm_idx ON hr_employee '
+            'USING gin (search_text gin_trgm_ops)')
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS hr_employee_search_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0012_archivedworkperiod_start_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='search_text',
+            field=models.CharField(blank=True, default='', editable=False, max_length=200),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 21:05
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# The `(employee, start_time)`, `(start_time)` and open period indexes of
+# the work periods, which depend on the backend and are therefore created
+# with raw SQL instead of through `Meta.indexes`.
+#
+# PostgreSQL matches the ORM's `is_deleted = false` against partial
+# indexes, so they only cover live work periods there. SQLite can not:
+# Django passes `is_deleted` as a bound parameter, which its planner never
+# proves against a partial index predicate, so its indexes cover every
+# row, and only the open period index is partial. Other backends have no
+# partial indexes and get full ones, without an open period index.
+INDEXES = {
+    'postgresql': (
+        ('hr_wp_live_employee_start_idx', '(employee_id, start_time)',
+         'NOT is_deleted'),
+        ('hr_wp_live_start_idx', '(start_time)', 'NOT is_deleted'),
+        ('hr_wp_live_open_idx', '(employee_id, start_time)',
+         'end_time IS NULL AND NOT is_deleted'),
+    ),
+    'sqlite': (
+        ('hr_wp_employee_start_idx', '(employee_id, start_time)', None),
+        ('hr_wp_start_idx', '(start_time)', None),
+        ('hr_wp_open_idx', '(employee_id, start_time)', 'end_time IS NULL'),
+    ),
+    None: (
+        ('hr_wp_employee_start_idx', '(employee_id, start_time)', None),
+        ('hr_wp_start_idx', '(start_time)', None),
+    ),
+}
+
+
+def indexes(schema_editor):
+    vendor = schema_editor.connection.vendor
+    return INDEXES.get(vendor, INDEXES[None])
+
+
+def create_indexes(apps, schema_editor):
+    for name, columns, condition in indexes(schema_editor):
+        sql = 'CREATE INDEX {} ON hr_workperiod {}'.format(name, columns)
+        if condition is not None:
+            sql += ' WHERE ' + condition
+        schema_editor.execute(sql)
+
+
+def drop_indexes(apps, schema_editor):
+    for name, _, _ in indexes(schema_editor):
+        if schema_editor.connection.vendor == 'mysql':
+            schema_editor.execute(
+                'DROP INDEX {} ON hr_workperiod'.format(name))
+        else:
+            schema_editor.execute('DROP INDEX {}'.format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0014_rosterchange'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
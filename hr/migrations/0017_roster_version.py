@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.3 on 2026-10-18 16:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_changes(apps, schema_editor):
+    """
+    Existing changes keep their id as their version.
+    """
+    RosterChange = apps.get_model('hr', 'RosterChange')
+    RosterVersion = apps.get_model('hr', 'RosterVersion')
+    RosterChange.objects.update(version=F('id'))
+    latest = RosterChange.objects.aggregate(Max('id'))['id__max'] or 0
+    RosterVersion.objects.create(pk=1, value=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hr', '0016_calendar_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='rosterchange',
+            name='version',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(number_changes, migrations.RunPython.noop),
+    ]
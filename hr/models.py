@@ -1,7 +1,7 @@
 from datetime import datetime
 
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import connections, models, transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
 from localflavor.us.models import USZipCodeField, USStateField
@@ -15,12 +15,52 @@ PhoneValidator = RegexValidator(
     regex=r'^\(\d{3}\)\d{3}-\d{4}$',
     message='Please enter a phone in the format `(999)999-9999`')
 
+CLOCK_EVENT_TYPES = (
+    ('in', 'Clock in'),
+    ('out', 'Clock out'),
+)
+
+WeekdaysValidator = RegexValidator(
+    regex=r'^[0-6]{0,7}$',
+    message='Please enter weekdays as digits, Monday being 0, e.g. `01234`')
+
 DAY_OFF_TYPES = (
     ('hy', 'Holiday'),
     ('vn', 'Vacation'),
     ('pl', 'Personal'),
 )
 
+class WorkCalendar(models.Model):
+    """
+    Working weekdays of a location. Employees without a calendar use the
+    default one.
+    """
+    name = models.CharField(max_length=40, unique=True)
+    working_weekdays = models.CharField(max_length=7, default='01234',
+                                        validators=[WeekdaysValidator])
+    is_default = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+class Holiday(models.Model):
+    """
+    A holiday of one calendar, or of the whole company when `calendar` is
+    empty.
+    """
+    calendar = models.ForeignKey(WorkCalendar, null=True, blank=True,
+                                 related_name='holidays')
+    date = models.DateField()
+    name = models.CharField(max_length=60)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('calendar', 'date')
+
+    def __str__(self):
+        return '{} ({})'.format(self.name, self.date)
+
 class Employee(models.Model):
     user = models.OneToOneField(User)
     payroll_id = models.CharField(max_length=25, null=True, blank=True)
@@ -38,11 +78,24 @@ class Employee(models.Model):
     state = USStateField()
     postal_code = USZipCodeField()
     is_active = models.BooleanField(default=True)
+    calendar = models.ForeignKey(WorkCalendar, null=True, blank=True,
+                                 related_name='employees',
+                                 on_delete=models.SET_NULL)
     created_by = models.ForeignKey(User, related_name='employee_creates')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_by = models.ForeignKey(User, related_name='employee_updates')
     updated_at = models.DateTimeField(auto_now=True)
+    # Normalized name, payroll id, phones and username, kept up to date on
+    # save and searched by `hr.search`.
+    search_text = models.CharField(max_length=200, blank=True, default='',
+                                   editable=False)
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return '{} {}'.format(self.first_name, self.last_name)
         
@@ -52,6 +105,32 @@ class Employee(models.Model):
     def owner(self):
         return self.user
         
+class WorkPeriodQuerySet(models.QuerySet):
+    def latest_per_employee(self):
+        """
+        Restrict the queryset to the most recent work period of each
+        employee, in a single query.
+        """
+        if connections[self.db].features.can_distinct_on_fields:
+            latest = self.order_by('employee_id', '-start_time', '-id')
+            return self.filter(
+                id__in=latest.distinct('employee_id').values('id'))
+        latest = self.filter(
+            employee_id=models.OuterRef('employee_id')
+        ).order_by('-start_time', '-id').values('id')[:1]
+        return self.annotate(
+            latest_id=models.Subquery(latest)
+        ).filter(id=models.F('latest_id'))
+
+
+class LiveWorkPeriodManager(models.Manager):
+    """
+    Leaves out soft-deleted work periods.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class WorkPeriod(models.Model):
     employee = models.ForeignKey(Employee, related_name='work_periods')
     start_time = models.DateTimeField(blank=True)
@@ -59,13 +138,148 @@ class WorkPeriod(models.Model):
     adjustment = models.IntegerField(null=True, blank=True)
     note = models.CharField(max_length=60, null=True, blank=True)
     is_deleted = models.BooleanField(default=False)
+
+    # Deleted work periods are only reachable through `all_objects`, for
+    # the admin and audits.
+    objects = LiveWorkPeriodManager.from_queryset(WorkPeriodQuerySet)()
+    all_objects = WorkPeriodQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the period was loaded from, so that rollups can
+        # refresh the day it moved away from.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    # The `(employee, start_time)`, `(start_time)` and open period indexes
+    # are created per backend by migration 0015: partial over live rows on
+    # PostgreSQL, full elsewhere.
     
     def __str__(self):
         return str(self.id)
 
     def owner(self):
         return self.employee.user
+
+class ArchivedWorkPeriod(models.Model):
+    """
+    A work period moved out of `WorkPeriod`, keeping its id.
+    """
+    id = models.IntegerField(primary_key=True)
+    employee = models.ForeignKey(Employee, related_name='+')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField(null=True, blank=True)
+    adjustment = models.IntegerField(null=True, blank=True)
+    note = models.CharField(max_length=60, null=True, blank=True)
+    is_deleted = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'start_time'],
+                         name='hr_awp_employee_start_idx'),
+            models.Index(fields=['start_time'], name='hr_awp_start_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.id)
+
+    def owner(self):
+        return self.employee.user
       
+class ClockStatusManager(models.Manager):
+    def refresh(self, employee_id):
+        """
+        Recompute the clock status of one employee from their most recent
+        work period.
+        """
+        latest = WorkPeriod.objects.filter(
+            employee_id=employee_id).order_by('-start_time', '-id').first()
+        defaults = {'work_period': None, 'last_start_time': None,
+                    'last_end_time': None}
+        if latest is not None:
+            defaults.update(
+                work_period=latest if latest.end_time is None else None,
+                last_start_time=latest.start_time,
+                last_end_time=latest.end_time)
+        status, _ = self.update_or_create(employee_id=employee_id,
+                                          defaults=defaults)
+        return status
+
+    def rebuild(self):
+        """
+        Rebuild the whole table from `WorkPeriod`.
+        """
+        latest = WorkPeriod.objects.latest_per_employee()
+        statuses = [
+            self.model(employee_id=work_period.employee_id,
+                       work_period=(work_period
+                                    if work_period.end_time is None
+                                    else None),
+                       last_start_time=work_period.start_time,
+                       last_end_time=work_period.end_time)
+            for work_period in latest.iterator()
+        ]
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(statuses, batch_size=500)
+        return len(statuses)
+
+    def lock(self, employee_id):
+        """
+        Fetch the status of an employee with a row lock, serializing clock
+        operations for that employee until the transaction ends.
+        """
+        status = self.select_for_update().filter(
+            employee_id=employee_id).first()
+        if status is None:
+            self.refresh(employee_id)
+            status = self.select_for_update().get(employee_id=employee_id)
+        return status
+
+
+class ClockStatus(models.Model):
+    """
+    Denormalized per-employee clock state, kept in sync with `WorkPeriod`
+    writes so that "who is clocked in" is a single indexed read.
+    """
+    employee = models.OneToOneField(Employee, related_name='clock_status')
+    work_period = models.ForeignKey(WorkPeriod, null=True, blank=True,
+                                    related_name='+',
+                                    on_delete=models.SET_NULL)
+    last_start_time = models.DateTimeField(null=True, blank=True)
+    last_end_time = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ClockStatusManager()
+
+    class Meta:
+        verbose_name_plural = 'Clock statuses'
+
+    def is_clocked_in(self):
+        return self.work_period_id is not None
+
+    def owner(self):
+        return self.employee.user
+
+class ClockEvent(models.Model):
+    """
+    A clock event replayed by a timeclock, recorded under its client
+    supplied idempotency key once it has been applied.
+    """
+    key = models.CharField(max_length=64, unique=True)
+    employee = models.ForeignKey(Employee, related_name='clock_events')
+    event_type = models.CharField(max_length=3, choices=CLOCK_EVENT_TYPES)
+    event_time = models.DateTimeField()
+    work_period = models.ForeignKey(WorkPeriod, null=True, blank=True,
+                                    related_name='+',
+                                    on_delete=models.SET_NULL)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def owner(self):
+        return self.employee.user
+
 class DayOff(models.Model):
     employee = models.ForeignKey(Employee, related_name='days_off')
     days_off_request = models.ForeignKey('DaysOffRequest', null=True, 
@@ -79,9 +293,19 @@ class DayOff(models.Model):
     entered_at = models.DateTimeField(auto_now_add=True)
     updated_by = models.ForeignKey(User, related_name='day_off_updates')
     updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
     
     class Meta:
         verbose_name_plural = 'Days off'
+        indexes = [
+            models.Index(fields=['employee', 'date'],
+                         name='hr_dayoff_employee_date_idx'),
+        ]
     
     def owner(self):
         return self.employee.user
@@ -99,18 +323,156 @@ class DaysOffRequest(models.Model):
     requested_at = models.DateTimeField(auto_now_add=True)
     updated_by = models.ForeignKey(User)
     updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
     
     class Meta:
         verbose_name_plural = 'Days off requests'
+        indexes = [
+            models.Index(fields=['seen', 'start_date'],
+                         name='hr_dor_seen_start_idx'),
+        ]
     
     def owner(self):
         return self.employee.user
       
+class HoursRollup(models.Model):
+    """
+    Worked minutes and day off hours per employee and day, maintained
+    incrementally from `WorkPeriod` and `DayOff` writes.
+    """
+    employee = models.ForeignKey(Employee, related_name='hours_rollups')
+    date = models.DateField()
+    worked_minutes = models.IntegerField(default=0)
+    paid_day_off_hours = models.IntegerField(default=0)
+    unpaid_day_off_hours = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('employee', 'date')
+        indexes = [
+            models.Index(fields=['date'], name='hr_rollup_date_idx'),
+        ]
+
+    def owner(self):
+        return self.employee.user
+
+ACCRUAL_PERIODS = (
+    ('pay-period', 'Pay period'),
+    ('month', 'Month'),
+)
+
+TIME_OFF_ENTRY_KINDS = (
+    ('accrual', 'Accrual'),
+    ('usage', 'Usage'),
+    ('adjustment', 'Adjustment'),
+)
+
+class AccrualPolicy(models.Model):
+    """
+    Hours of a day off type that every active employee accrues each
+    period, up to an optional cap on the balance.
+    """
+    name = models.CharField(max_length=40)
+    day_off_type = models.CharField(max_length=2, choices=DAY_OFF_TYPES)
+    hours = models.DecimalField(max_digits=6, decimal_places=2)
+    period = models.CharField(max_length=10, choices=ACCRUAL_PERIODS,
+                              default='pay-period')
+    max_balance = models.DecimalField(max_digits=6, decimal_places=2,
+                                      null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name_plural = 'Accrual policies'
+
+    def __str__(self):
+        return self.name
+
+class TimeOffEntry(models.Model):
+    """
+    One accrual, usage or adjustment of an employee's time off balance.
+    Usage is negative. Entries are only ever added, never changed.
+    """
+    employee = models.ForeignKey(Employee, related_name='time_off_entries')
+    day_off_type = models.CharField(max_length=2, choices=DAY_OFF_TYPES)
+    kind = models.CharField(max_length=10, choices=TIME_OFF_ENTRY_KINDS)
+    hours = models.DecimalField(max_digits=8, decimal_places=2)
+    date = models.DateField()
+    day_off = models.ForeignKey(DayOff, null=True, blank=True,
+                                on_delete=models.SET_NULL, related_name='+')
+    policy = models.ForeignKey(AccrualPolicy, null=True, blank=True,
+                               on_delete=models.SET_NULL, related_name='+')
+    note = models.CharField(max_length=120, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'Time off entries'
+        # One accrual per policy and period; other kinds leave `policy`
+        # empty and are not constrained.
+        unique_together = ('employee', 'policy', 'date')
+        indexes = [
+            models.Index(fields=['employee', 'day_off_type'],
+                         name='hr_tofe_employee_type_idx'),
+        ]
+
+    def owner(self):
+        return self.employee.user
+
+class TimeOffBalance(models.Model):
+    """
+    Running totals of the `TimeOffEntry` rows of an employee and day off
+    type, kept up to date with every entry so reading a balance is one
+    row.
+    """
+    employee = models.ForeignKey(Employee, related_name='time_off_balances')
+    day_off_type = models.CharField(max_length=2, choices=DAY_OFF_TYPES)
+    accrued = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    used = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee', 'day_off_type')
+
+    @property
+    def balance(self):
+        return self.accrued - self.used
+
+    def owner(self):
+        return self.employee.user
+
+ROSTER_ACTIONS = (
+    ('added', 'Added'),
+    ('changed', 'Changed'),
+    ('removed', 'Removed'),
+)
+
+class RosterChange(models.Model):
+    """
+    One change to the terminal roster, at the roster version it made.
+    """
+    # Not a foreign key, so that removals outlive the employee.
+    employee_id = models.IntegerField()
+    action = models.CharField(max_length=7, choices=ROSTER_ACTIONS)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    version = models.BigIntegerField(default=0, db_index=True)
+
+class RosterVersion(models.Model):
+    """
+    The roster version, one row that every change bumps. The bump holds the
+    row's lock until the change commits, so versions become visible in
+    order, unlike autoincrement ids.
+    """
+    value = models.BigIntegerField(default=0)
+
 class UserSettings(models.Model):
     user = models.OneToOneField(User, null=True, blank=True)
     summary_text = models.CharField(max_length=250,null=True, blank=True)
     summary_weeks = models.IntegerField(null=True, blank=True)
     summary_view = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = 'User settings'
@@ -0,0 +1,117 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import history
+from .models import ArchivedWorkPeriod, WorkPeriod
+
+# Open work periods (no `end_time`) extend indefinitely.
+END_OF_TIME = datetime.max.replace(tzinfo=timezone.utc)
+
+# Longest closed work period expected, when deciding whether the archive
+# can hold an overlapping one.
+MAX_PERIOD = timedelta(days=1)
+
+
+def _end(end_time):
+    return END_OF_TIME if end_time is None else end_time
+
+
+def _intersecting(queryset, employee_id, start_time, end_time):
+    queryset = queryset.filter(
+        Q(end_time__gt=start_time) | Q(end_time__isnull=True),
+        employee_id=employee_id,
+    )
+    if end_time is not None:
+        queryset = queryset.filter(start_time__lt=end_time)
+    return queryset
+
+
+def overlapping(employee_id, start_time, end_time=None):
+    """
+    Work period querysets of the employee that intersect
+    [start_time, end_time): the hot table, and the archive when the range
+    reaches back into it.
+    """
+    querysets = [_intersecting(WorkPeriod.objects.all(), employee_id,
+                               start_time, end_time)]
+    # A period that started up to a day before the range can still run
+    # into it.
+    if history.reaches_archive(start_time - MAX_PERIOD):
+        querysets.append(_intersecting(
+            ArchivedWorkPeriod.objects.filter(is_deleted=False),
+            employee_id, start_time, end_time))
+    return querysets
+
+
+def find_overlap(employee_id, start_time, end_time=None, exclude_id=None):
+    """
+    Return the earliest existing work period that intersects
+    [start_time, end_time), or None.
+    """
+    found = []
+    for queryset in overlapping(employee_id, start_time, end_time):
+        if exclude_id is not None:
+            queryset = queryset.exclude(id=exclude_id)
+        work_period = queryset.order_by('start_time').first()
+        if work_period is not None:
+            found.append(work_period)
+    return min(found, key=lambda work_period: work_period.start_time,
+               default=None)
+
+
+def find_batch_overlaps(employee_id, periods, exclude_ids=()):
+    """
+    Validate a batch of proposed `(start_time, end_time)` periods for one
+    employee, ignoring the existing periods in `exclude_ids`, e.g. the ones
+    the batch replaces.
+
+    The employee's existing periods in the window covered by the batch are
+    loaded with a single query, then every proposed period is checked
+    against them and against the earlier periods of the batch in memory.
+    Returns a dict mapping the index of each rejected period to a message.
+    """
+    errors = {}
+    if not periods:
+        return errors
+
+    for index, (start_time, end_time) in enumerate(periods):
+        if end_time is not None and end_time <= start_time:
+            errors[index] = 'End Time can not be before Start Time'
+
+    window_start = min(start for start, _ in periods)
+    window_end = None
+    if all(end is not None for _, end in periods):
+        window_end = max(end for _, end in periods)
+    existing = sorted(
+        (start, _end(end))
+        for queryset in overlapping(employee_id, window_start, window_end)
+        for start, end in queryset.exclude(id__in=exclude_ids).values_list(
+            'start_time', 'end_time'))
+
+    # Running maximum of the end times of existing periods, in start order,
+    # so one bisect tells whether anything starting before `end` runs past
+    # `start`.
+    existing_starts = [start for start, _ in existing]
+    max_ends = []
+    for _, end in existing:
+        max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+
+    accepted_end = None
+    order = sorted((index for index in range(len(periods))
+                    if index not in errors),
+                   key=lambda index: periods[index][0])
+    for index in order:
+        start, end = periods[index][0], _end(periods[index][1])
+        position = bisect_left(existing_starts, end)
+        if position and max_ends[position - 1] > start:
+            errors[index] = 'This work period overlaps with an existing one.'
+            continue
+        if accepted_end is not None and accepted_end > start:
+            errors[index] = ('This work period overlaps with another one '
+                             'in the batch.')
+            continue
+        accepted_end = end
+    return errors
@@ -0,0 +1,180 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_json_api import pagination
+
+from .includes import underscore
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class KeysetPagination(pagination.PageNumberPagination):
+    """
+    JSON:API pagination by keyset over a unique ordering such as
+    `(start_time, id)`, so that a page deep into history costs the same as
+    the first one.
+
+    Pages are addressed with `?cursor=` links. The view's
+    `keyset_ordering` sets the ordering, which `?sort=-<first field>`
+    reverses. The total count is only computed with `?count=true`, and
+    `?page=` keeps the page number behaviour for existing clients.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    sort_query_param = 'sort'
+    ordering = ('id',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset = self.page_query_param not in request.query_params
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        cursor = request.query_params.get(self.cursor_query_param, None)
+        self.keyset_page_size = self.get_page_size(request)
+        if self.keyset_page_size is None:
+            if cursor is None:
+                return None
+            self.keyset_page_size = self.max_page_size
+
+        self.fields = self.get_ordering(request, view)
+        direction, position = self.decode_cursor(cursor, queryset)
+        forward = direction == NEXT
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+
+        if position is not None:
+            queryset = queryset.filter(
+                self.keyset_filter(position, forward))
+        if forward:
+            order_by = [('-' + name if descending else name)
+                        for name, descending in self.fields]
+        else:
+            order_by = [(name if descending else '-' + name)
+                        for name, descending in self.fields]
+        results = list(queryset.order_by(*order_by)
+                       [:self.keyset_page_size + 1])
+        has_more = len(results) > self.keyset_page_size
+        results = results[:self.keyset_page_size]
+        if not forward:
+            results.reverse()
+
+        if forward:
+            self.has_next, self.has_previous = has_more, position is not None
+        else:
+            self.has_next, self.has_previous = True, has_more
+            if position is None:
+                self.has_next = False
+        self.results = results
+        return results
+
+    def get_ordering(self, request, view):
+        """
+        `(name, descending)` pairs for the keyset ordering, descending when
+        the request sorts by the first field with a leading `-`.
+        """
+        ordering = getattr(view, 'keyset_ordering', self.ordering)
+        sort = request.query_params.get(self.sort_query_param, None)
+        descending = False
+        if sort:
+            descending = sort.startswith('-')
+            if underscore(sort.lstrip('-')) != ordering[0]:
+                name = ordering[0].replace('_', '-')
+                raise ParseError("'{}' must be {} or -{}".format(
+                    self.sort_query_param, name, name))
+        return [(name, descending) for name in ordering]
+
+    def keyset_filter(self, position, forward):
+        """
+        Rows strictly after `position` in the direction of travel, as
+        `(a > x) OR (a = x AND b > y) ...` for the ordering fields.
+        """
+        condition = Q()
+        for index, (name, descending) in enumerate(self.fields):
+            lookup = 'lt' if descending == forward else 'gt'
+            term = Q(**{name + '__' + lookup: position[index]})
+            for previous in range(index):
+                term &= Q(**{self.fields[previous][0]: position[previous]})
+            condition |= term
+        return condition
+
+    def encode_cursor(self, direction, instance):
+        position = None
+        if instance is not None:
+            position = []
+            for name, _ in self.fields:
+                value = getattr(instance, name)
+                if isinstance(value, date):
+                    value = value.isoformat()
+                position.append(value)
+        data = json.dumps([direction, position]).encode('utf-8')
+        return urlsafe_b64encode(data).decode('ascii')
+
+    def decode_cursor(self, cursor, queryset):
+        if cursor is None:
+            return NEXT, None
+        try:
+            data = urlsafe_b64decode(cursor.encode('ascii'))
+            direction, position = json.loads(data.decode('utf-8'))
+            if direction not in (NEXT, PREVIOUS):
+                raise ValueError(direction)
+            if position is not None:
+                if len(position) != len(self.fields):
+                    raise ValueError(position)
+                opts = queryset.model._meta
+                position = [opts.get_field(name).to_python(value)
+                            for (name, _), value in zip(self.fields,
+                                                        position)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound('Invalid cursor')
+        return direction, position
+
+    def cursor_link(self, direction, instance):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(direction, instance))
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        first = remove_query_param(self.request.build_absolute_uri(),
+                                   self.cursor_query_param)
+        next = previous = None
+        if self.results and self.has_next:
+            next = self.cursor_link(NEXT, self.results[-1])
+        if self.results and self.has_previous:
+            previous = self.cursor_link(PREVIOUS, self.results[0])
+        meta = OrderedDict([('page_size', self.keyset_page_size)])
+        if self.count is not None:
+            meta['count'] = self.count
+
+        return Response({
+            'results': data,
+            'meta': {
+                'pagination': meta,
+            },
+            'links': OrderedDict([
+                ('first', first),
+                ('last', self.cursor_link(PREVIOUS, None)),
+                ('next', next),
+                ('prev', previous),
+            ]),
+        })
+
+
+class SearchPagination(pagination.PageNumberPagination):
+    """
+    Page numbers over ranked search results, which have no keyset.
+    """
+    page_size = 25
@@ -0,0 +1,24 @@
+from django.conf import settings
+from rest_framework import parsers
+
+
+class LineStreamParser(parsers.BaseParser):
+    """
+    Hands the request body to the view as a lazy iterator of text lines,
+    so that large uploads are never read into memory at once.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if stream is None:
+            return iter(())
+        return (line.decode(encoding) for line in stream)
+
+
+class CSVStreamParser(LineStreamParser):
+    media_type = 'text/csv'
+
+
+class NDJSONStreamParser(LineStreamParser):
+    media_type = 'application/x-ndjson'
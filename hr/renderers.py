@@ -0,0 +1,32 @@
+import json
+
+from rest_framework import renderers
+
+
+class EventStreamRenderer(renderers.BaseRenderer):
+    """
+    Lets content negotiation accept `text/event-stream`. The view returns a
+    streaming response itself, so only error responses are rendered here.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode(self.charset)
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    """
+    Metrics in the Prometheus text format; errors are rendered as JSON.
+    """
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return json.dumps(data).encode(self.charset)
@@ -0,0 +1,120 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.permissions import SAFE_METHODS
+
+PIN_COOKIE = 'hr_primary_pin'
+PIN_SALT = 'hr.replicas.pin'
+
+_state = threading.local()
+
+
+def replica_alias():
+    """
+    The alias of the read replica, or None when none is configured.
+    """
+    alias = getattr(settings, 'HR_REPLICA_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+def pin_seconds():
+    return getattr(settings, 'HR_REPLICA_PIN_SECONDS', 10)
+
+
+def use_replica():
+    """
+    Send the reads of the current request to the replica.
+    """
+    _state.replica = True
+
+
+def use_primary():
+    _state.replica = False
+
+
+def pin(response, user):
+    """
+    Keep `user` on the primary for `HR_REPLICA_PIN_SECONDS`, so that they
+    read their own writes while the replica catches up. The pin is a
+    signed cookie, so every worker sees it.
+    """
+    if user is not None and user.is_authenticated:
+        response.set_signed_cookie(PIN_COOKIE, str(user.pk), salt=PIN_SALT,
+                                   max_age=pin_seconds(), httponly=True)
+
+
+def is_pinned(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return False
+    value = request.get_signed_cookie(PIN_COOKIE, default=None,
+                                      salt=PIN_SALT, max_age=pin_seconds())
+    return value == str(user.pk)
+
+
+class ReplicaRouter(object):
+    """
+    Reads go to the replica while `use_replica()` is in effect for the
+    request, everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'replica', False):
+            return replica_alias() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = (DEFAULT_DB_ALIAS, replica_alias())
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaReadMixin(object):
+    """
+    Serves the `replica_actions` of a viewset from the replica when they
+    are called with a safe method by a user who has not written recently.
+    """
+    replica_actions = ()
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication and permission checks read from the primary.
+        super().initial(request, *args, **kwargs)
+        if (self.action in self.replica_actions and
+                request.method in SAFE_METHODS and
+                replica_alias() is not None and
+                not is_pinned(request)):
+            use_replica()
+
+
+def health_check_seconds():
+    return getattr(settings, 'HR_DB_HEALTH_CHECK_SECONDS', 30)
+
+
+def check_connections(**kwargs):
+    """
+    Close persistent connections that stopped working between requests,
+    e.g. after a database restart, so the request opens a new one instead
+    of failing on the first query. Each connection of a thread is checked
+    at most every `HR_DB_HEALTH_CHECK_SECONDS`.
+    """
+    if not getattr(settings, 'HR_DB_HEALTH_CHECKS', True):
+        return
+    now = time.monotonic()
+    checked = getattr(_state, 'checked', None)
+    if checked is None:
+        checked = _state.checked = {}
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        last = checked.get(connection.alias)
+        if last is not None and now - last < health_check_seconds():
+            continue
+        checked[connection.alias] = now
+        if not connection.is_usable():
+            connection.close()
@@ -0,0 +1,136 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import (DateField, F, Func, IntegerField, Min, Sum,
+                              Value)
+from django.utils import dateparse
+
+from .calendars import get_index
+
+DAY = 'day'
+WEEK = 'week'
+PAY_PERIOD = 'pay-period'
+PERIODS = (DAY, WEEK, PAY_PERIOD)
+
+
+def pay_period_start():
+    value = getattr(settings, 'HR_PAY_PERIOD_START', '2016-01-04')
+    return dateparse.parse_date(value) if isinstance(value, str) else value
+
+
+def pay_period_days():
+    return getattr(settings, 'HR_PAY_PERIOD_DAYS', 14)
+
+
+def period_days(period):
+    if period == DAY:
+        return 1
+    if period == WEEK:
+        return 7
+    return pay_period_days()
+
+
+def period_start(day, period):
+    """
+    First day of the day/week/pay period that contains `day`.
+    """
+    if period == DAY:
+        return day
+    if period == WEEK:
+        return day - timedelta(days=day.weekday())
+    anchor = pay_period_start()
+    length = pay_period_days()
+    return anchor + timedelta(days=(day - anchor).days // length * length)
+
+
+def period_end(start, period):
+    """
+    Last day of the period that starts on `start`.
+    """
+    return start + timedelta(days=period_days(period) - 1)
+
+
+class PeriodNumber(Func):
+    """
+    The number of whole periods of `length` days from the date `base` to
+    a date expression, which must not be before it.
+    """
+    templates = {
+        'postgresql': '({date} - {base}) / {length}',
+        'sqlite': ('(CAST(julianday({date}) AS INTEGER) - '
+                   'CAST(julianday({base}) AS INTEGER)) / {length}'),
+        'mysql': '(TO_DAYS({date}) - TO_DAYS({base})) DIV {length}',
+    }
+
+    def __init__(self, expression, base, length):
+        super().__init__(expression, Value(base, output_field=DateField()),
+                         Value(length), output_field=IntegerField())
+
+    def as_sql(self, compiler, connection):
+        parts = []
+        params = []
+        for expression in self.source_expressions:
+            sql, expression_params = compiler.compile(expression)
+            parts.append(sql)
+            params.extend(expression_params)
+        template = self.templates.get(connection.vendor,
+                                      self.templates['postgresql'])
+        date, base, length = parts
+        return template.format(date=date, base=base, length=length), params
+
+
+def period_starts(rollups, period):
+    """
+    An expression grouping each rollup's date by its period, and a
+    function from its values to the start of the period, or None if there
+    are no rollups.
+
+    Periods are numbered from the one holding the first date of
+    `rollups`, with the date arithmetic done in the database.
+    """
+    if period == DAY:
+        return F('date'), lambda day: day
+    first = rollups.aggregate(first=Min('date'))['first']
+    if first is None:
+        return None
+    base = period_start(first, period)
+    length = period_days(period)
+    return (PeriodNumber(F('date'), base, length),
+            lambda number: base + timedelta(days=number * length))
+
+
+def hours_report(rollups, period=DAY):
+    """
+    Total hours per employee and period, one dict per employee-period,
+    summed in the database from the daily `HoursRollup` rows, with the
+    number of working days of the period in the employee's calendar.
+    """
+    starts = period_starts(rollups, period)
+    if starts is None:
+        return []
+    expression, to_start = starts
+    rows = rollups.annotate(bucket=expression).values(
+        'employee_id', 'bucket', 'employee__calendar_id'
+    ).annotate(
+        worked_minutes=Sum('worked_minutes'),
+        day_off_hours=Sum('paid_day_off_hours')
+    ).order_by('employee_id', 'bucket').values_list(
+        'employee_id', 'bucket', 'employee__calendar_id', 'worked_minutes',
+        'day_off_hours')
+    index = get_index()
+
+    report = []
+    for employee_id, group, calendar_id, worked_minutes, day_off_hours in rows:
+        start = to_start(group)
+        worked_hours = round(worked_minutes / 60, 2)
+        report.append({
+            'employee': employee_id,
+            'period': period,
+            'period_start': start,
+            'working_days': index.working_days_between(
+                start, period_end(start, period), calendar_id),
+            'worked_hours': worked_hours,
+            'day_off_hours': day_off_hours,
+            'total_hours': round(worked_hours + day_off_hours, 2),
+        })
+    return report
@@ -0,0 +1,193 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import history
+from .models import DayOff, HoursRollup
+
+# Rebuilds aggregate this many days at a time to bound memory use.
+REBUILD_WINDOW_DAYS = 31
+
+_pending = threading.local()
+
+
+def local_day(value):
+    """
+    The local calendar day a work period is counted on.
+    """
+    return timezone.localtime(value).date()
+
+
+def day_bounds(first, last):
+    """
+    Aware datetimes spanning the local days `first` through `last`.
+    """
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(first, time.min), tz)
+    end = timezone.make_aware(
+        datetime.combine(last + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def worked_by_day(work_periods):
+    """
+    Worked time per employee and local day, aggregated in the database.
+
+    Yields `(employee_id, day, timedelta)`. Open and deleted work periods
+    are skipped, and `adjustment` is applied as minutes.
+    """
+    duration = ExpressionWrapper(F('end_time') - F('start_time'),
+                                 output_field=DurationField())
+    rows = work_periods.filter(
+        is_deleted=False, end_time__isnull=False
+    ).annotate(
+        day=TruncDate('start_time')
+    ).values('employee_id', 'day').annotate(
+        worked=Sum(duration), adjustment=Sum('adjustment')
+    ).order_by().values_list('employee_id', 'day', 'worked', 'adjustment')
+    for employee_id, day, worked, adjustment in rows:
+        yield employee_id, day, worked + timedelta(minutes=adjustment or 0)
+
+
+def days_off_by_day(days_off):
+    """
+    Day off hours per employee, day and paid status, aggregated in the
+    database. Yields `(employee_id, day, is_paid, hours)`.
+    """
+    rows = days_off.values('employee_id', 'date', 'is_paid').annotate(
+        total=Sum('hours')
+    ).order_by().values_list('employee_id', 'date', 'is_paid', 'total')
+    for row in rows:
+        yield row
+
+
+def compute(work_period_sources, days_off):
+    """
+    Map `(employee_id, day)` to unsaved `HoursRollup` rows, from one or
+    more work period querysets (see `history.sources`).
+    """
+    rollups = {}
+
+    def rollup(employee_id, day):
+        key = (employee_id, day)
+        if key not in rollups:
+            rollups[key] = HoursRollup(employee_id=employee_id, date=day)
+        return rollups[key]
+
+    worked_by_key = {}
+    for work_periods in work_period_sources:
+        for employee_id, day, worked in worked_by_day(work_periods):
+            key = (employee_id, day)
+            worked_by_key[key] = worked_by_key.get(key, timedelta()) + worked
+    for (employee_id, day), worked in worked_by_key.items():
+        rollup(employee_id, day).worked_minutes = int(
+            worked.total_seconds() // 60)
+    for employee_id, day, is_paid, hours in days_off_by_day(days_off):
+        if is_paid:
+            rollup(employee_id, day).paid_day_off_hours += hours
+        else:
+            rollup(employee_id, day).unpaid_day_off_hours += hours
+    return rollups
+
+
+def day_runs(days):
+    """
+    Split sorted, distinct `days` into `(first, last)` runs of consecutive
+    days.
+    """
+    runs = []
+    for day in days:
+        if runs and runs[-1][1] + timedelta(days=1) == day:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+def refresh_days(employee_id, days):
+    """
+    Recompute the rollups of one employee for the given days only.
+    Work periods are read for each run of consecutive days, so that two
+    far-apart days do not aggregate everything in between.
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    ranges = Q()
+    for first, last in day_runs(days):
+        start, end = day_bounds(first, last)
+        ranges |= Q(start_time__gte=start, start_time__lt=end)
+    start, end = day_bounds(days[0], days[-1])
+    rollups = compute(
+        [work_periods.filter(ranges) for work_periods in
+         history.sources(start, end, employee_id=employee_id)],
+        DayOff.objects.filter(employee_id=employee_id, date__in=days))
+    with transaction.atomic():
+        HoursRollup.objects.filter(employee_id=employee_id,
+                                   date__in=days).delete()
+        HoursRollup.objects.bulk_create(
+            rollup for (_, day), rollup in rollups.items() if day in days)
+
+
+def schedule(employee_id, days):
+    """
+    Refresh the given days of an employee, or collect them if a `batch()`
+    is active.
+    """
+    pending = getattr(_pending, 'days', None)
+    if pending is None:
+        refresh_days(employee_id, days)
+    else:
+        pending.setdefault(employee_id, set()).update(days)
+
+
+@contextmanager
+def batch(refresh=True):
+    """
+    Collect the refreshes scheduled by the writes inside the block and run
+    them once per employee when it exits, instead of once per row. With
+    `refresh` false they are dropped, for writes known not to change any
+    totals.
+    """
+    if getattr(_pending, 'days', None) is not None:
+        yield
+        return
+    _pending.days = {}
+    try:
+        yield
+        days = _pending.days if refresh else {}
+    finally:
+        _pending.days = None
+    for employee_id, employee_days in days.items():
+        refresh_days(employee_id, employee_days)
+
+
+def rebuild(first, last):
+    """
+    Rebuild every rollup for the local days `first` through `last`.
+    Returns the number of rollup rows written.
+    """
+    count = 0
+    window_start = first
+    while window_start <= last:
+        window_end = min(
+            window_start + timedelta(days=REBUILD_WINDOW_DAYS - 1), last)
+        start, end = day_bounds(window_start, window_end)
+        rollups = compute(
+            history.sources(start, end),
+            DayOff.objects.filter(date__gte=window_start,
+                                  date__lte=window_end))
+        with transaction.atomic():
+            HoursRollup.objects.filter(date__gte=window_start,
+                                       date__lte=window_end).delete()
+            HoursRollup.objects.bulk_create(
+                (rollup for (_, day), rollup in rollups.items()
+                 if window_start <= day <= window_end))
+        count += len(rollups)
+        window_start = window_end + timedelta(days=1)
+    return count
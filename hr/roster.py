@@ -0,0 +1,132 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import Employee, RosterChange, RosterVersion
+
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+# Fields the terminals show; changes to any other field leave the roster
+# as it is.
+ROSTER_FIELDS = ('first_name', 'last_name', 'is_active')
+
+# Deltas touching more employees than this are sent as a full snapshot.
+MAX_DELTA = 500
+
+SNAPSHOT_KEY = 'hr:roster-snapshot:{}'
+SNAPSHOT_SECONDS = 24 * 60 * 60
+
+# The primary key of the one `RosterVersion` row.
+VERSION_ID = 1
+
+
+def record(employee, created=False, deleted=False):
+    """
+    Log a change to `employee` if it changes what the terminals show.
+    Called by the `Employee` signal handlers; code that changes
+    `ROSTER_FIELDS` with `QuerySet.update()`, or creates employees with
+    `bulk_create()`, sends no signals and must call `record_ids()`.
+    """
+    loaded = getattr(employee, '_loaded_values', {})
+    if deleted:
+        action = REMOVED
+    elif created:
+        action = ADDED
+    elif any(loaded.get(name) != getattr(employee, name)
+             for name in ROSTER_FIELDS if name in loaded):
+        action = CHANGED
+    else:
+        return None
+    return record_ids([employee.id], action)[0]
+
+
+def record_ids(employee_ids, action):
+    """
+    Log `action` for each of `employee_ids` at one new version.
+    """
+    with transaction.atomic():
+        current = bump()
+        return RosterChange.objects.bulk_create(
+            RosterChange(employee_id=employee_id, action=action,
+                         version=current)
+            for employee_id in employee_ids)
+
+
+def bump():
+    """
+    The next roster version. The update locks the version row until the
+    calling transaction commits, so a later version never becomes visible
+    before an earlier one.
+    """
+    versions = RosterVersion.objects.filter(pk=VERSION_ID)
+    if not versions.update(value=F('value') + 1):
+        RosterVersion.objects.get_or_create(pk=VERSION_ID)
+        versions.update(value=F('value') + 1)
+    return versions.values_list('value', flat=True).get()
+
+
+def version():
+    return RosterVersion.objects.filter(pk=VERSION_ID).values_list(
+        'value', flat=True).first() or 0
+
+
+def _entries(queryset):
+    return [[employee_id, '{} {}'.format(first_name, last_name)]
+            for employee_id, first_name, last_name in queryset.order_by(
+                'last_name', 'first_name', 'id').values_list(
+                'id', 'first_name', 'last_name')]
+
+
+def snapshot():
+    """
+    The active employees as `[id, full name]` pairs, with the version they
+    are current as of. Cached per version.
+    """
+    # Read the version first: a change that lands before the snapshot is
+    # read is sent again by the next delta, which is harmless.
+    current = version()
+    key = SNAPSHOT_KEY.format(current)
+    employees = cache.get(key)
+    if employees is None:
+        employees = _entries(Employee.objects.filter(is_active=True))
+        cache.set(key, employees, SNAPSHOT_SECONDS)
+    return {'version': current, 'employees': employees}
+
+
+def delta(since):
+    """
+    What changed after version `since`: added and changed employees as
+    `[id, full name]` pairs, and the ids of those to drop from the roster.
+    Terminals apply added and changed entries as upserts.
+
+    A delta touching more than `MAX_DELTA` employees, or asked for a
+    version newer than the current one, is answered with a `snapshot()`
+    marked `full` instead.
+    """
+    current = version()
+    if since > current:
+        return dict(snapshot(), full=True)
+    changes = {}
+    for employee_id, action in RosterChange.objects.filter(
+            version__gt=since, version__lte=current).order_by(
+                'version', 'id').values_list('employee_id', 'action'):
+        if changes.get(employee_id) != ADDED:
+            changes[employee_id] = action
+    if len(changes) > MAX_DELTA:
+        return dict(snapshot(), full=True)
+
+    active = dict(
+        (entry[0], entry) for entry in _entries(Employee.objects.filter(
+            id__in=list(changes), is_active=True)))
+    added, changed, removed = [], [], []
+    for employee_id, action in sorted(changes.items()):
+        if employee_id not in active:
+            removed.append(employee_id)
+        elif action == ADDED:
+            added.append(active[employee_id])
+        else:
+            changed.append(active[employee_id])
+    return {'version': current, 'since': since, 'full': False,
+            'added': added, 'changed': changed, 'removed': removed}
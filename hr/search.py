@@ -0,0 +1,215 @@
+import re
+import threading
+from bisect import bisect_left
+
+from django.db import connections, router
+from django.db.models import Count, Max
+
+from .models import Employee
+
+# Shortest query term matched through trigrams; shorter terms match word
+# prefixes only.
+NGRAM = 3
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def normalize(value):
+    """
+    Lower case words of `value`, without punctuation, so that
+    `(555)123-4567` and `555-123-4567` both become `5551234567`.
+    """
+    value = re.sub(r'(?<=\d)[^\w\s]+(?=\d)', '', str(value or '').lower())
+    return ' '.join(re.findall(r'\w+', value))
+
+
+def search_text(first_name, last_name, payroll_id=None, primary_phone=None,
+                secondary_phone=None, username=None):
+    """
+    The text an employee is found by, stored in `Employee.search_text`.
+    """
+    return normalize(' '.join(
+        str(value) for value in (first_name, last_name, payroll_id,
+                                 primary_phone, secondary_phone, username)
+        if value))[:Employee._meta.get_field('search_text').max_length]
+
+
+def terms(query):
+    return normalize(query).split()
+
+
+def ngrams(word):
+    return set(word[index:index + NGRAM]
+               for index in range(len(word) - NGRAM + 1))
+
+
+def rank(text, query_terms):
+    """
+    Score of `text` for the query: every term must occur in it, terms that
+    start a word count more, and whole words more again. None when a term
+    is missing.
+    """
+    words = text.split()
+    score = 0
+    for term in query_terms:
+        if term not in text:
+            return None
+        if term in words:
+            score += 3
+        elif any(word.startswith(term) for word in words):
+            score += 2
+        else:
+            score += 1
+    return score
+
+
+class SearchIndex(object):
+    """
+    In-process n-gram and word prefix index of the employees' search text,
+    for databases without trigram indexes.
+    """
+
+    def __init__(self, rows):
+        self.texts = {}
+        self.grams = {}
+        words = set()
+        for employee_id, text in rows:
+            self.texts[employee_id] = text
+            for word in text.split():
+                words.add((word, employee_id))
+                for gram in ngrams(word):
+                    self.grams.setdefault(gram, set()).add(employee_id)
+        self.words = sorted(words)
+
+    @classmethod
+    def load(cls):
+        # Read from the primary, like `calendars.CalendarIndex.load`.
+        return cls(Employee.objects.using(router.db_for_write(
+            Employee)).values_list('id', 'search_text'))
+
+    def prefixed(self, prefix):
+        ids = set()
+        position = bisect_left(self.words, (prefix,))
+        while (position < len(self.words) and
+               self.words[position][0].startswith(prefix)):
+            ids.add(self.words[position][1])
+            position += 1
+        return ids
+
+    def candidates(self, term):
+        if len(term) < NGRAM:
+            return self.prefixed(term)
+        found = None
+        for gram in ngrams(term):
+            ids = self.grams.get(gram, set())
+            found = ids if found is None else found & ids
+            if not found:
+                return set()
+        return found
+
+    def search(self, query_terms):
+        """
+        `(employee_id, score)` pairs, best first.
+        """
+        found = None
+        for term in sorted(query_terms, key=len, reverse=True):
+            ids = self.candidates(term)
+            found = ids if found is None else found & ids
+            if not found:
+                return []
+        results = []
+        for employee_id in found:
+            score = rank(self.texts[employee_id], query_terms)
+            if score is not None:
+                results.append((employee_id, score))
+        results.sort(key=lambda result: (-result[1],
+                                         self.texts[result[0]]))
+        return results
+
+
+def version(using):
+    """
+    A fingerprint of the employees in the database, which every insert,
+    update and delete changes, whichever process made it.
+    """
+    aggregate = Employee.objects.using(using).aggregate(
+        count=Count('id'), updated_at=Max('updated_at'))
+    return aggregate['count'], aggregate['updated_at']
+
+
+def get_index():
+    """
+    The process-wide `SearchIndex`, reloaded when the employees have
+    changed since it was built.
+    """
+    global _index
+    # The primary, like `SearchIndex.load`.
+    current = version(router.db_for_write(Employee))
+    index = _index
+    if index is None or index.version != current:
+        with _index_lock:
+            index = SearchIndex.load()
+            index.version = current
+            _index = index
+    return index
+
+
+def invalidate():
+    global _index
+    _index = None
+
+
+def uses_trigrams(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+class RankedEmployees(object):
+    """
+    Employees of `queryset` in the order of a list of ids, fetched a slice
+    at a time, so that a paginator only loads the page it shows.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, key):
+        ids = self.ids[key]
+        if not isinstance(key, slice):
+            return self.queryset.get(id=ids)
+        employees = self.queryset.in_bulk(ids)
+        return [employees[employee_id] for employee_id in ids
+                if employee_id in employees]
+
+
+def search_employees(queryset, query):
+    """
+    Employees of `queryset` matching every term of `query` in their name,
+    payroll id, phones or username, best matches first.
+
+    On PostgreSQL the terms are matched in the database through the
+    trigram index on `search_text` and ranked by similarity. Elsewhere the
+    in-process `SearchIndex` finds the matches. Either way the result can
+    be paginated without loading every match.
+    """
+    query_terms = terms(query)
+    if not query_terms:
+        return queryset.none()
+    if uses_trigrams(queryset):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        for term in query_terms:
+            queryset = queryset.filter(search_text__contains=term)
+        return queryset.annotate(
+            similarity=TrigramSimilarity('search_text', ' '.join(query_terms))
+        ).order_by('-similarity', 'last_name', 'id')
+    ids = [employee_id for employee_id, _ in get_index().search(query_terms)]
+    if ids and queryset.query.where:
+        # The index holds every employee; keep those the queryset allows.
+        allowed = set(queryset.values_list('id', flat=True))
+        ids = [employee_id for employee_id in ids if employee_id in allowed]
+    return RankedEmployees(ids, queryset)
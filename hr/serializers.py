@@ -1,40 +1,115 @@
+from rest_framework.settings import api_settings
 from rest_framework_json_api import serializers
+from rest_framework_json_api.utils import get_resource_type_from_serializer
 
+from .includes import fieldset
 from .models import *
+
+
+class ModelSerializer(serializers.ModelSerializer):
+    """
+    Also matches sparse fieldsets that name fields the way responses
+    format them, e.g. `fields[employees]=first-name`, where the JSON:API
+    serializer only matches `first_name`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request', None)
+        if request is None:
+            return
+        names = fieldset(request, get_resource_type_from_serializer(self))
+        if names is None:
+            return
+        # Rebuild the fields that the JSON:API serializer dropped.
+        del self._fields
+        for name in list(self.fields):
+            if name != api_settings.URL_FIELD_NAME and name not in names:
+                self.fields.pop(name)
+
         
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeSerializer(ModelSerializer):
+    included_serializers = {
+        'user': 'authentication.serializers.UserSerializer',
+        'created_by': 'authentication.serializers.UserSerializer',
+        'updated_by': 'authentication.serializers.UserSerializer',
+    }
 
     class Meta:
-        fields = '__all__'
+        exclude = ('search_text',)
         model = Employee
         
         
-class TerminalEmployeeSerializer(serializers.ModelSerializer):
+class TerminalEmployeeSerializer(ModelSerializer):
 
     class Meta:
         model = Employee
         fields = ('id', 'full_name')
 
-class WorkPeriodSerializer(serializers.ModelSerializer):
+class WorkPeriodSerializer(ModelSerializer):
+    included_serializers = {
+        'employee': EmployeeSerializer,
+    }
 
     class Meta:
         fields = '__all__'
         model = WorkPeriod
 
-class DayOffSerializer(serializers.ModelSerializer):
+class DayOffSerializer(ModelSerializer):
+    included_serializers = {
+        'employee': EmployeeSerializer,
+        'days_off_request': 'hr.serializers.DaysOffRequestSerializer',
+        'entered_by': 'authentication.serializers.UserSerializer',
+        'updated_by': 'authentication.serializers.UserSerializer',
+    }
 
     class Meta:
         fields = '__all__'
         model = DayOff
+        resource_name = 'days-off'
         read_only_fields = ('entered_at',)
 
-class DaysOffRequestSerializer(serializers.ModelSerializer):
+class DaysOffRequestSerializer(ModelSerializer):
+    included_serializers = {
+        'employee': EmployeeSerializer,
+        'updated_by': 'authentication.serializers.UserSerializer',
+    }
 
     class Meta:
         fields = '__all__'
         model = DaysOffRequest
 
-class SettingsSerializer(serializers.ModelSerializer):
+class ClockStatusSerializer(ModelSerializer):
+    included_serializers = {
+        'employee': EmployeeSerializer,
+        'work_period': WorkPeriodSerializer,
+    }
+
+    class Meta:
+        fields = '__all__'
+        model = ClockStatus
+        resource_name = 'clock-status'
+
+class WorkCalendarSerializer(ModelSerializer):
+
+    class Meta:
+        fields = '__all__'
+        model = WorkCalendar
+        resource_name = 'calendars'
+
+class HolidaySerializer(ModelSerializer):
+    included_serializers = {
+        'calendar': WorkCalendarSerializer,
+    }
+
+    class Meta:
+        fields = '__all__'
+        model = Holiday
+
+class SettingsSerializer(ModelSerializer):
+    included_serializers = {
+        'user': 'authentication.serializers.UserSerializer',
+    }
 
     class Meta:
         fields = '__all__'
@@ -0,0 +1,133 @@
+from functools import partial
+
+from django.db import transaction
+from django.contrib.auth.models import User
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import balances, calendars, events, replicas, roster, search
+from .models import (DayOff, DaysOffRequest, Employee, Holiday, WorkCalendar,
+                     WorkPeriod)
+from .rollups import local_day, schedule
+
+
+def _affected(instance, day_field, to_day):
+    """
+    `(employee_id, day)` pairs touched by a write, including the ones the
+    instance was loaded with if it has since moved.
+    """
+    affected = {(instance.employee_id, to_day(getattr(instance, day_field)))}
+    loaded = getattr(instance, '_loaded_values', {})
+    if loaded.get(day_field) is not None and 'employee_id' in loaded:
+        affected.add((loaded['employee_id'], to_day(loaded[day_field])))
+    return affected
+
+
+def _refresh(affected):
+    days = {}
+    for employee_id, day in affected:
+        days.setdefault(employee_id, set()).add(day)
+    for employee_id, employee_days in days.items():
+        schedule(employee_id, employee_days)
+
+
+def _remember(instance):
+    """
+    Treat the saved values as loaded, for the next save of the instance.
+    """
+    instance._loaded_values = dict(
+        (field.attname, getattr(instance, field.attname))
+        for field in instance._meta.concrete_fields)
+
+
+def _publish_on_commit(event_type, instance):
+    transaction.on_commit(partial(events.publish, event_type, instance))
+
+
+@receiver(post_save, sender=WorkPeriod)
+def work_period_saved(sender, instance, created, **kwargs):
+    _refresh(_affected(instance, 'start_time', local_day))
+    loaded = getattr(instance, '_loaded_values', {})
+    if created:
+        if instance.end_time is None:
+            _publish_on_commit(events.CLOCK_IN, instance)
+    elif instance.end_time is not None and loaded.get('end_time') is None:
+        _publish_on_commit(events.CLOCK_OUT, instance)
+    _remember(instance)
+
+
+@receiver(post_delete, sender=WorkPeriod)
+def work_period_deleted(sender, instance, **kwargs):
+    _refresh(_affected(instance, 'start_time', local_day))
+
+
+@receiver((post_save, post_delete), sender=DayOff)
+def day_off_changed(sender, instance, signal, **kwargs):
+    _refresh(_affected(instance, 'date', lambda day: day))
+    balances.day_off_changed(instance, deleted=signal is post_delete)
+    _remember(instance)
+
+
+@receiver(post_save, sender=DaysOffRequest)
+def days_off_request_saved(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    if created:
+        _publish_on_commit(events.DAYS_OFF_REQUEST_CREATED, instance)
+    elif 'status' in loaded and loaded['status'] != instance.status:
+        _publish_on_commit(events.DAYS_OFF_REQUEST_STATUS_CHANGED, instance)
+    _remember(instance)
+
+
+@receiver((post_save, post_delete), sender=WorkCalendar)
+@receiver((post_save, post_delete), sender=Holiday)
+def calendar_changed(sender, instance, **kwargs):
+    transaction.on_commit(calendars.invalidate)
+
+
+def _employee_search_text(employee, username):
+    return search.search_text(employee.first_name, employee.last_name,
+                              employee.payroll_id, employee.primary_phone,
+                              employee.secondary_phone, username)
+
+
+@receiver(pre_save, sender=Employee)
+def employee_saving(sender, instance, **kwargs):
+    username = instance.user.username if instance.user_id else None
+    instance.search_text = _employee_search_text(instance, username)
+
+
+@receiver((post_save, post_delete), sender=Employee)
+def employee_changed(sender, instance, signal, created=False, **kwargs):
+    roster.record(instance, created=created,
+                  deleted=signal is post_delete)
+    transaction.on_commit(search.invalidate)
+    _remember(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Logins only save `last_login`.
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    for employee in Employee.objects.filter(user=instance):
+        text = _employee_search_text(employee, instance.username)
+        if text != employee.search_text:
+            # `update` skips `auto_now`, which the search index version
+            # is read from.
+            Employee.objects.filter(id=employee.id).update(
+                search_text=text, updated_at=timezone.now())
+            transaction.on_commit(search.invalidate)
+
+
+@receiver(request_started)
+def request_starting(sender, **kwargs):
+    replicas.check_connections()
+
+
+@receiver(request_finished)
+def request_done(sender, **kwargs):
+    # Streaming responses read after the middleware has run, so the
+    # request's reads are only routed back to the primary here.
+    replicas.use_primary()
@@ -0,0 +1,209 @@
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.models import Privileges
+
+from . import balances, calendars, rollups, roster, search
+from .models import (ClockStatus, DayOff, DaysOffRequest, Employee,
+                     WorkPeriod)
+
+FIRST_NAMES = ('James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer',
+               'Michael', 'Linda', 'David', 'Elizabeth', 'William', 'Barbara',
+               'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Carlos', 'Maria', 'Wei', 'Mei', 'Ahmed', 'Fatima', 'Ivan',
+               'Olga', 'Kenji', 'Yuki', 'Tariq', 'Amara')
+LAST_NAMES = ('Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia',
+              'Miller', 'Davis', 'Rodriguez', 'Martinez', 'Hernandez',
+              'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor',
+              'Moore', 'Jackson', 'Martin', 'Lee', 'Nguyen', 'Kowalski',
+              'Okafor', 'Novak', 'Schmidt', 'Rossi', 'Tanaka', 'Haddad')
+CITIES = (('Detroit', 'MI', '48201'), ('Ann Arbor', 'MI', '48104'),
+          ('Toledo', 'OH', '43604'), ('Lansing', 'MI', '48933'))
+
+# Work periods buffered per bulk_create. Django splits each into batches
+# the database accepts.
+BATCH_SIZE = 5000
+
+ADMIN = 'a'
+MANAGER = 'm'
+TERMINAL = 't'
+EMPLOYEE = 'e'
+
+
+def usernames(prefix, role):
+    """
+    Usernames of the generated users with `role`, in creation order.
+    """
+    return User.objects.filter(
+        username__startswith=prefix, privileges__hr_role=role
+    ).order_by('id').values_list('username', flat=True)
+
+
+class Generator(object):
+    """
+    Realistic HR data at a configurable scale: users with roles, employees,
+    years of weekday punches with a lunch break, days off requests and the
+    days off of the approved ones.
+
+    Rows are written with `bulk_create`, so the derived tables (clock
+    status, hours rollups, time off balances, search index) are rebuilt
+    once at the end instead of per row.
+    """
+
+    def __init__(self, prefix='bench', employees=100, managers=5,
+                 terminals=2, years=1, seed=0, stdout=None):
+        self.prefix = prefix
+        self.employees = employees
+        self.managers = managers
+        self.terminals = terminals
+        self.years = years
+        self.random = random.Random(seed)
+        self.stdout = stdout
+        self.last_day = timezone.localdate() - timedelta(days=1)
+        self.first_day = self.last_day - timedelta(days=365 * years - 1)
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def run(self):
+        with transaction.atomic(), rollups.batch(refresh=False):
+            admin = self.create_users()
+            employee_ids = self.create_employees(admin)
+            self.log('Created {} employees.'.format(len(employee_ids)))
+            count = self.create_work_periods(employee_ids)
+            self.log('Created {} work periods.'.format(count))
+            count = self.create_days_off(employee_ids, admin)
+            self.log('Created {} days off.'.format(count))
+        self.log('Rebuilding derived tables...')
+        ClockStatus.objects.rebuild()
+        rollups.rebuild(self.first_day, self.last_day)
+        search.invalidate()
+        calendars.invalidate()
+
+    def create_users(self):
+        roles = ([ADMIN] + [MANAGER] * self.managers +
+                 [TERMINAL] * self.terminals + [EMPLOYEE] * self.employees)
+        password = make_password(self.prefix)
+        User.objects.bulk_create(
+            (User(username='{}{:06d}'.format(self.prefix, index),
+                  password=password)
+             for index in range(len(roles))))
+        users = list(User.objects.filter(
+            username__startswith=self.prefix).order_by('username'))
+        Privileges.objects.bulk_create(
+            (Privileges(user=user, hr_role=role,
+                        is_global_admin=role == ADMIN)
+             for user, role in zip(users, roles)))
+        self.users = list(zip(users, roles))
+        return users[0]
+
+    def create_employees(self, admin):
+        employees = []
+        for index, (user, role) in enumerate(self.users):
+            if role == TERMINAL:
+                continue
+            first_name = self.random.choice(FIRST_NAMES)
+            last_name = self.random.choice(LAST_NAMES)
+            phone = '({:03d}){:03d}-{:04d}'.format(
+                self.random.randint(200, 999), self.random.randint(200, 999),
+                self.random.randint(0, 9999))
+            city, state, postal_code = self.random.choice(CITIES)
+            payroll_id = 'P{:07d}'.format(index)
+            employees.append(Employee(
+                user=user, payroll_id=payroll_id, first_name=first_name,
+                last_name=last_name, primary_phone=phone,
+                address_street='{} Main St'.format(index + 1), city=city,
+                state=state, postal_code=postal_code,
+                is_active=self.random.random() > 0.05,
+                created_by=admin, updated_by=admin,
+                search_text=search.search_text(first_name, last_name,
+                                               payroll_id, phone,
+                                               username=user.username)))
+        Employee.objects.bulk_create(employees)
+        employee_ids = list(Employee.objects.filter(
+            user__username__startswith=self.prefix
+        ).order_by('id').values_list('id', flat=True))
+        # bulk_create sends no signals.
+        roster.record_ids(employee_ids, roster.ADDED)
+        return employee_ids
+
+    def punches(self, day):
+        """
+        A morning and an afternoon work period on `day`, in local time.
+        """
+        tz = timezone.get_current_timezone()
+        start = datetime.combine(day, time(7)) + timedelta(
+            minutes=self.random.randint(0, 90))
+        lunch = start + timedelta(minutes=self.random.randint(210, 270))
+        back = lunch + timedelta(minutes=self.random.randint(25, 45))
+        end = back + timedelta(minutes=self.random.randint(180, 270))
+        return [(timezone.make_aware(start, tz),
+                 timezone.make_aware(lunch, tz)),
+                (timezone.make_aware(back, tz), timezone.make_aware(end, tz))]
+
+    def create_work_periods(self, employee_ids):
+        count = 0
+        batch = []
+        day = self.first_day
+        while day <= self.last_day:
+            if day.weekday() < 5:
+                for employee_id in employee_ids:
+                    if self.random.random() < 0.04:
+                        continue
+                    for start, end in self.punches(day):
+                        batch.append(WorkPeriod(
+                            employee_id=employee_id, start_time=start,
+                            end_time=end,
+                            is_deleted=self.random.random() < 0.005))
+                if len(batch) >= BATCH_SIZE:
+                    WorkPeriod.objects.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            day += timedelta(days=1)
+        WorkPeriod.objects.bulk_create(batch)
+        return count + len(batch)
+
+    def create_days_off(self, employee_ids, admin):
+        requests = []
+        for employee_id in employee_ids:
+            for _ in range(self.years * self.random.randint(2, 5)):
+                start = self.first_day + timedelta(
+                    days=self.random.randint(0, 365 * self.years - 1))
+                end = min(start + timedelta(days=self.random.randint(0, 4)),
+                          self.last_day)
+                requests.append(DaysOffRequest(
+                    employee_id=employee_id, start_date=start, end_date=end,
+                    request_type=self.random.choice(('vn', 'vn', 'pl')),
+                    status=self.random.choice(('Approved', 'Approved',
+                                               'Denied', 'Pending')),
+                    seen=self.random.random() < 0.8, updated_by=admin))
+        DaysOffRequest.objects.bulk_create(requests)
+
+        days_off = []
+        taken = set()
+        approved = DaysOffRequest.objects.filter(
+            employee_id__in=employee_ids, status='Approved').order_by('id')
+        for days_off_request in approved.iterator():
+            day = days_off_request.start_date
+            while day <= days_off_request.end_date:
+                key = (days_off_request.employee_id, day)
+                if day.weekday() < 5 and key not in taken:
+                    taken.add(key)
+                    days_off.append(DayOff(
+                        employee_id=days_off_request.employee_id,
+                        days_off_request=days_off_request, date=day, hours=8,
+                        day_off_type=days_off_request.request_type,
+                        is_paid=days_off_request.is_paid,
+                        entered_by=admin, updated_by=admin))
+                day += timedelta(days=1)
+        DayOff.objects.bulk_create(days_off)
+        # Read back with their ids, which the ledger links to.
+        balances.days_off_created(
+            DayOff.objects.filter(employee_id__in=employee_ids))
+        return len(days_off)
@@ -1,3 +1,1840 @@
-from django.test import TestCase
+import json
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin import site
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.request import Request
+
+from authentication.models import Privileges
+
+from . import (approvals, archive, balances, calendars, clock, exports,
+               history, middleware, replicas, reports, rollups, roster,
+               search, signals)
+from .admin import WorkPeriodInline
+from .benchmark import compare, idle_subscribers
+from .imports import CSV, import_work_periods, read_rows
+from .metrics import registry
+from .middleware import ReplicaMiddleware
+from .models import (AccrualPolicy, ArchivedWorkPeriod, ClockEvent,
+                     ClockStatus, DayOff, DaysOffRequest, Employee, Holiday,
+                     HoursRollup, RosterChange, TimeOffBalance, TimeOffEntry,
+                     WorkPeriod)
+from .overlaps import find_batch_overlaps, find_overlap
+from .synthetic import Generator
+from .views import DayOffViewSet, DaysOffRequestViewSet, WorkPeriodViewSet
+
+
+def make_user(username, role='e'):
+    user = User.objects.create(username=username)
+    Privileges.objects.create(user=user, hr_role=role)
+    return user
+
+
+def make_employee(username, role='e', **fields):
+    user = make_user(username, role)
+    values = {
+        'first_name': username.title(),
+        'last_name': 'Tester',
+        'primary_phone': '(555)555-5555',
+        'address_street': '1 Main St',
+        'city': 'Detroit',
+        'state': 'MI',
+        'postal_code': '48201',
+        'created_by': user,
+        'updated_by': user,
+    }
+    values.update(fields)
+    return Employee.objects.create(user=user, **values)
+
+
+def local_time(day, hour, minute=0):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()) +
+                               timedelta(hours=hour, minutes=minute))
+
+
+class ApiTestCase(TestCase):
+
+    def login(self, username, role):
+        user = make_user(username, role)
+        self.client.force_login(user)
+        return user
+
+    def count_queries(self, path):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(captured)
+
+
+class ListQueryTests(ApiTestCase):
+    """
+    List endpoints run the same number of queries however many rows they
+    return.
+    """
+
+    def setUp(self):
+        self.login('manager', 'm')
+        self.count = 0
+
+    def add_employees(self, count):
+        day = timezone.localdate() - timedelta(days=7)
+        for _ in range(count):
+            self.count += 1
+            employee = make_employee('employee{}'.format(self.count))
+            WorkPeriod.objects.create(employee=employee,
+                                      start_time=local_time(day, 8),
+                                      end_time=local_time(day, 12))
+            WorkPeriod.objects.create(employee=employee,
+                                      start_time=local_time(day, 13))
+            DayOff.objects.create(employee=employee, date=day, hours=8,
+                                  day_off_type='vn', entered_by=employee.user,
+                                  updated_by=employee.user)
+
+    def assertConstantQueries(self, path):
+        self.add_employees(2)
+        self.count_queries(path)
+        expected = self.count_queries(path)
+        self.add_employees(5)
+        with self.assertNumQueries(expected):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+
+    def test_work_period_list(self):
+        self.assertConstantQueries('/hr/work-periods/')
+
+    def test_latest_work_periods(self):
+        self.assertConstantQueries('/hr/work-periods/latest/')
+
+    def test_employee_list(self):
+        self.assertConstantQueries('/hr/employees/')
+
+    def test_clock_status_list(self):
+        self.assertConstantQueries('/hr/clock-status/')
+
+    def test_includes_and_fields(self):
+        combinations = {
+            'work-periods': ('include=employee',
+                             'fields[work-periods]=start-time,end-time',
+                             'include=employee&fields[employees]=last-name'),
+            'employees': ('include=user,created-by',
+                          'fields[employees]=first-name,last-name',
+                          'include=user&fields[employees]=last-name'),
+            'days-off': ('include=employee,entered-by',
+                         'fields[days-off]=date,hours',
+                         'include=employee&fields[days-off]=hours'),
+        }
+        for resource, params in combinations.items():
+            for param in params:
+                path = '/hr/{}/?{}'.format(resource, param)
+                with self.subTest(path=path):
+                    self.assertConstantQueries(path)
+
+
+class SparseFieldsetTests(ApiTestCase):
+    """
+    Sparse fieldsets shrink list responses, and do not apply to the
+    instances that writes load.
+    """
+
+    def setUp(self):
+        self.manager = self.login('manager', 'm')
+        day = timezone.localdate() - timedelta(days=7)
+        for index in range(20):
+            employee = make_employee('employee{}'.format(index),
+                                     ssn='123-45-{:04}'.format(index))
+            WorkPeriod.objects.create(employee=employee,
+                                      start_time=local_time(day, 8),
+                                      end_time=local_time(day, 12))
+            self.day_off = DayOff.objects.create(
+                employee=employee, date=day, hours=8, day_off_type='vn',
+                entered_by=self.manager, updated_by=self.manager)
+
+    def get(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_payload_size(self):
+        for resource, fields in (('employees', 'first-name,last-name'),
+                                 ('work-periods', 'start-time'),
+                                 ('days-off', 'date')):
+            with self.subTest(resource=resource):
+                full = self.get('/hr/{}/'.format(resource))
+                sparse = self.get('/hr/{}/?fields[{}]={}'.format(
+                    resource, resource, fields))
+                self.assertEqual(
+                    set(sparse.json()['data'][0]['attributes']),
+                    set(fields.split(',')))
+                self.assertLess(len(sparse.content), len(full.content) / 2)
+
+    def test_ssn_left_out(self):
+        response = self.get(
+            '/hr/employees/?fields[employees]=first-name,last-name')
+        self.assertNotIn(b'123-45-', response.content)
+
+    def test_write_ignores_fields(self):
+        path = '/hr/days-off/{}/?fields[days-off]=hours'.format(
+            self.day_off.id)
+        body = {'data': {'type': 'days-off', 'id': str(self.day_off.id),
+                         'attributes': {'hours': 4}}}
+        response = self.client.patch(path, json.dumps(body),
+                                     content_type='application/vnd.api+json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.day_off.refresh_from_db()
+        self.assertEqual(self.day_off.hours, 4)
+
+
+class IndexTests(TestCase):
+    """
+    The planner uses the work period and days off indexes for the hot
+    lookups.
+    """
+    # query name -> index per vendor
+    INDEXES = {
+        'employee_range': {'postgresql': 'hr_wp_live_employee_start_idx',
+                           'sqlite': 'hr_wp_employee_start_idx'},
+        'time_range': {'postgresql': 'hr_wp_live_start_idx',
+                       'sqlite': 'hr_wp_start_idx'},
+        'open': {'postgresql': 'hr_wp_live_open_idx',
+                 'sqlite': 'hr_wp_open_idx'},
+        'days_off': {'postgresql': 'hr_dayoff_employee_date_idx',
+                     'sqlite': 'hr_dayoff_employee_date_idx'},
+        'unseen_requests': {'postgresql': 'hr_dor_seen_start_idx',
+                            'sqlite': 'hr_dor_seen_start_idx'},
+    }
+
+    def setUp(self):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            self.skipTest('No EXPLAIN support for ' + connection.vendor)
+        self.manager = make_user('manager', 'm')
+        self.employee = make_employee('worker')
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Empty test tables are cheaper to scan than to index.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('EXPLAIN ' + sql, params)
+            else:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(str(row) for row in cursor.fetchall())
+
+    def assertUsesIndex(self, name, queryset):
+        index = self.INDEXES[name][connection.vendor]
+        plan = self.plan(queryset)
+        self.assertIn(index, plan)
+
+    def filtered(self, viewset_class, **params):
+        """
+        The queryset a manager's list request with `params` runs, through
+        the viewset's filters.
+        """
+        request = Request(RequestFactory().get('/', params))
+        request.user = self.manager
+        view = viewset_class(request=request, action='list', kwargs={},
+                             format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())
+        # Every parameter is applied, e.g. none is dropped as invalid.
+        where = str(queryset.query).split(' WHERE ', 1)[-1]
+        for name in params:
+            field = view.filter_class.base_filters[name].name
+            self.assertIn('"{}"'.format(
+                queryset.model._meta.get_field(field).column), where, name)
+        return queryset
+
+    def date_param(self, value):
+        return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S')
+
+    def test_employee_range(self):
+        now = timezone.now()
+        self.assertUsesIndex('employee_range', self.filtered(
+            WorkPeriodViewSet, employee=self.employee.id,
+            min_start_date=self.date_param(now - timedelta(days=7)),
+            max_start_date=self.date_param(now)))
+
+    def test_time_range(self):
+        now = timezone.now()
+        self.assertUsesIndex('time_range', self.filtered(
+            WorkPeriodViewSet,
+            min_start_date=self.date_param(now - timedelta(days=7)),
+            max_start_date=self.date_param(now)))
+
+    def test_open_work_period(self):
+        # As `ClockStatus` and clocking in look it up.
+        self.assertUsesIndex('open', WorkPeriod.objects.filter(
+            employee_id=self.employee.id, end_time__isnull=True))
+
+    def test_days_off_range(self):
+        self.assertUsesIndex('days_off', self.filtered(
+            DayOffViewSet, employee=self.employee.id,
+            min_date=timezone.localdate().isoformat()))
+
+    def test_unseen_requests(self):
+        self.assertUsesIndex('unseen_requests', self.filtered(
+            DaysOffRequestViewSet, seen='False'))
+
+
+def intersects(start, end, other_start, other_end):
+    """
+    Whether [start, end) and [other_start, other_end) intersect, an end of
+    None being open.
+    """
+    return ((other_end is None or other_end > start) and
+            (end is None or other_start < end))
+
+
+class OverlapTests(TestCase):
+    """
+    `find_overlap` and `find_batch_overlaps` agree with a pairwise check
+    over random intervals, including open periods, touching endpoints,
+    soft-deleted rows and self-exclusion on update.
+    """
+    rounds = 20
+    existing_count = 40
+    probe_count = 100
+    batch_count = 60
+
+    def setUp(self):
+        # On a 15 minute grid, so that many intervals touch end to start.
+        self.base = timezone.now().replace(microsecond=0) - timedelta(days=3)
+
+    def interval(self, rng, open_chance=0.05):
+        start = self.base + timedelta(minutes=15 * rng.randint(0, 400))
+        if rng.random() < open_chance:
+            return start, None
+        return start, start + timedelta(minutes=15 * rng.randint(1, 16))
+
+    def create_existing(self, rng, seed):
+        # New employees per round rather than deleting the previous rows.
+        self.employee = make_employee('overlaps{}'.format(seed))
+        self.other = make_employee('other{}'.format(seed))
+        rows = []
+        for _ in range(self.existing_count):
+            start, end = self.interval(rng)
+            rows.append(WorkPeriod(employee=self.employee, start_time=start,
+                                   end_time=end,
+                                   is_deleted=rng.random() < 0.1))
+            start, end = self.interval(rng)
+            rows.append(WorkPeriod(employee=self.other, start_time=start,
+                                   end_time=end))
+        WorkPeriod.objects.bulk_create(rows)
+        return list(WorkPeriod.objects.filter(employee=self.employee))
+
+    def expected_overlap(self, existing, start, end, exclude_id=None):
+        found = [work_period for work_period in existing
+                 if work_period.id != exclude_id and
+                 intersects(start, end, work_period.start_time,
+                            work_period.end_time)]
+        return min((work_period.start_time for work_period in found),
+                   default=None)
+
+    def expected_batch(self, existing, periods):
+        errors = {}
+        accepted = []
+        order = sorted(range(len(periods)),
+                       key=lambda index: periods[index][0])
+        for index in order:
+            start, end = periods[index]
+            if end is not None and end <= start:
+                errors[index] = 'invalid'
+            elif self.expected_overlap(existing, start, end) is not None:
+                errors[index] = 'existing'
+            elif any(intersects(start, end, other_start, other_end)
+                     for other_start, other_end in accepted):
+                errors[index] = 'batch'
+            else:
+                accepted.append((start, end))
+        return errors
+
+    def kind(self, message):
+        if 'before' in message:
+            return 'invalid'
+        if 'batch' in message:
+            return 'batch'
+        return 'existing'
+
+    def test_find_overlap(self):
+        for seed in range(self.rounds):
+            rng = random.Random(seed)
+            existing = self.create_existing(rng, seed)
+            for _ in range(self.probe_count):
+                start, end = self.interval(rng, open_chance=0.1)
+                exclude_id = None
+                if rng.random() < 0.3:
+                    exclude_id = rng.choice(existing).id
+                found = find_overlap(self.employee.id, start, end,
+                                     exclude_id=exclude_id)
+                expected = self.expected_overlap(existing, start, end,
+                                                 exclude_id)
+                self.assertEqual(
+                    found.start_time if found is not None else None,
+                    expected, (seed, start, end, exclude_id))
+                if found is not None:
+                    self.assertEqual(found.employee_id, self.employee.id)
+                    self.assertFalse(found.is_deleted)
+                    self.assertNotEqual(found.id, exclude_id)
+
+    def test_find_batch_overlaps(self):
+        for seed in range(self.rounds):
+            rng = random.Random(seed)
+            existing = self.create_existing(rng, seed)
+            periods = []
+            for _ in range(self.batch_count):
+                start, end = self.interval(rng, open_chance=0.02)
+                if rng.random() < 0.05:
+                    # End before, or at, the start.
+                    end = start - timedelta(minutes=15 * rng.randint(0, 2))
+                periods.append((start, end))
+            errors = find_batch_overlaps(self.employee.id, periods)
+            self.assertEqual(
+                dict((index, self.kind(message))
+                     for index, message in errors.items()),
+                self.expected_batch(existing, periods), seed)
+
+
+class HoursReportTests(ApiTestCase):
+    """
+    The hours report sums worked time with adjustments, skips deleted and
+    open work periods, adds paid days off, and runs a fixed number of
+    queries.
+    """
+
+    def setUp(self):
+        self.manager = self.login('manager', 'm')
+        today = timezone.localdate()
+        self.monday = today - timedelta(days=today.weekday() + 7)
+
+    def add_week(self, employee):
+        monday = self.monday
+        WorkPeriod.objects.create(employee=employee,
+                                  start_time=local_time(monday, 8),
+                                  end_time=local_time(monday, 12),
+                                  adjustment=15)
+        WorkPeriod.objects.create(employee=employee,
+                                  start_time=local_time(monday, 13),
+                                  end_time=local_time(monday, 17))
+        WorkPeriod.objects.create(employee=employee,
+                                  start_time=local_time(monday, 18),
+                                  end_time=local_time(monday, 20),
+                                  is_deleted=True)
+        WorkPeriod.objects.create(employee=employee,
+                                  start_time=local_time(monday, 21))
+        DayOff.objects.create(employee=employee,
+                              date=monday + timedelta(days=1), hours=8,
+                              day_off_type='vn', entered_by=self.manager,
+                              updated_by=self.manager)
+
+    def report(self, period, **params):
+        params.update(period=period, min_start_date=self.monday.isoformat())
+        response = self.client.get('/hr/reports/hours/', params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_weekly_totals(self):
+        employee = make_employee('worker')
+        self.add_week(employee)
+        rows = self.report('week', employee=employee.id)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['period_start'], self.monday.isoformat())
+        self.assertEqual(rows[0]['worked_hours'], 8.25)
+        self.assertEqual(rows[0]['day_off_hours'], 8)
+        self.assertEqual(rows[0]['total_hours'], 16.25)
+
+    def test_daily_rows(self):
+        employee = make_employee('worker')
+        self.add_week(employee)
+        rows = self.report('day', employee=employee.id)
+        self.assertEqual([(row['period_start'], row['total_hours'])
+                          for row in rows],
+                         [(self.monday.isoformat(), 8.25),
+                          ((self.monday + timedelta(days=1)).isoformat(), 8)])
+
+    def test_pay_periods(self):
+        employee = make_employee('worker')
+        for offset in range(5):
+            HoursRollup.objects.create(
+                employee=employee, date=self.monday + timedelta(days=offset),
+                worked_minutes=60 * (offset + 1))
+        rollups = HoursRollup.objects.filter(employee=employee)
+        # Three day pay periods counted from a Tuesday long ago: Monday
+        # ends one, Tuesday to Thursday is the next.
+        tuesday = self.monday - timedelta(days=3 * 1000 - 1)
+        with self.settings(HR_PAY_PERIOD_START=tuesday.isoformat(),
+                           HR_PAY_PERIOD_DAYS=3):
+            report = reports.hours_report(rollups, reports.PAY_PERIOD)
+        self.assertEqual(
+            [(row['period_start'], row['worked_hours']) for row in report],
+            [(self.monday - timedelta(days=2), 1),
+             (self.monday + timedelta(days=1), 2 + 3 + 4),
+             (self.monday + timedelta(days=4), 5)])
+
+    def test_constant_queries(self):
+        path = '/hr/reports/hours/?period=pay-period'
+        for index in range(2):
+            self.add_week(make_employee('worker{}'.format(index)))
+        self.count_queries(path)
+        expected = self.count_queries(path)
+        for index in range(2, 7):
+            self.add_week(make_employee('worker{}'.format(index)))
+        with self.assertNumQueries(expected):
+            self.client.get(path)
+
+
+class KeysetPaginationTests(ApiTestCase):
+    """
+    Cursor pages follow the keyset ordering, reversed by `?sort=`, and
+    `latest` pages through employees in id order.
+    """
+
+    def setUp(self):
+        self.login('manager', 'm')
+        day = timezone.localdate() - timedelta(days=7)
+        self.employees = [make_employee('employee{}'.format(index))
+                          for index in range(3)]
+        self.ids = []
+        for hour, employee in zip((9, 8, 10, 7, 11),
+                                  self.employees * 2):
+            self.ids.append(WorkPeriod.objects.create(
+                employee=employee, start_time=local_time(day, hour),
+                end_time=local_time(day, hour, 30)).id)
+
+    def pages(self, path):
+        ids = []
+        while path:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            ids.extend(int(item['id']) for item in body['data'])
+            path = body['links']['next']
+        return ids
+
+    def test_ascending(self):
+        expected = [self.ids[index] for index in (3, 1, 0, 2, 4)]
+        self.assertEqual(self.pages('/hr/work-periods/?page_size=2'),
+                         expected)
+
+    def test_descending(self):
+        expected = [self.ids[index] for index in (4, 2, 0, 1, 3)]
+        self.assertEqual(
+            self.pages('/hr/work-periods/?page_size=2&sort=-start-time'),
+            expected)
+
+    def test_unknown_sort(self):
+        response = self.client.get('/hr/work-periods/?page_size=2&sort=note')
+        self.assertEqual(response.status_code, 400)
+
+    def test_latest_by_employee(self):
+        ids = self.pages('/hr/work-periods/latest/?page_size=2')
+        self.assertEqual(
+            [WorkPeriod.objects.get(id=id).employee_id for id in ids],
+            [employee.id for employee in self.employees])
+
+
+class ConditionalGetTests(ApiTestCase):
+    """
+    Unchanged lists and details are answered with 304 Not Modified, and
+    not across a change to the data or to the caller's role.
+    """
+
+    def setUp(self):
+        self.user = self.login('terminal', 't')
+        self.employee = make_employee('worker')
+
+    def etag(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response['ETag']
+
+    def status(self, path, etag):
+        return self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_not_modified(self):
+        for path in ('/hr/employees/',
+                     '/hr/employees/{}/'.format(self.employee.id)):
+            with self.subTest(path=path):
+                self.assertEqual(self.status(path, self.etag(path)), 304)
+
+    def test_changed(self):
+        path = '/hr/employees/'
+        etag = self.etag(path)
+        self.employee.city = 'Lansing'
+        self.employee.save()
+        self.assertEqual(self.status(path, etag), 200)
+
+    def test_role_changed(self):
+        path = '/hr/employees/{}/'.format(self.employee.id)
+        etag = self.etag(path)
+        Privileges.objects.filter(user=self.user).update(hr_role='m')
+        self.assertEqual(self.status(path, etag), 200)
+
+
+class IdleSubscriberTests(TestCase):
+    """
+    Idle long-poll subscribers all wake up on one event.
+    """
+
+    def test_wake_all(self):
+        result = idle_subscribers(50, hold=0.05)
+        self.assertEqual(result['woken'], 50)
+
+
+class CalendarTests(TestCase):
+    """
+    Holidays are assigned to the right employees, and the calendar index
+    follows changes made by other processes.
+    """
+
+    def setUp(self):
+        self.user = make_user('manager', 'm')
+        today = timezone.localdate()
+        self.monday = today - timedelta(days=today.weekday() - 7)
+
+    def day_off(self, employee, date, day_off_type):
+        return DayOff.objects.create(employee=employee, date=date, hours=8,
+                                     day_off_type=day_off_type,
+                                     entered_by=self.user,
+                                     updated_by=self.user)
+
+    def test_assign_holiday(self):
+        vacation = make_employee('vacation')
+        self.day_off(vacation, self.monday - timedelta(days=7), 'hy')
+        self.day_off(vacation, self.monday, 'vn')
+        plain = make_employee('plain')
+        assigned = make_employee('assigned')
+        self.day_off(assigned, self.monday, 'hy')
+        holiday = Holiday.objects.create(date=self.monday, name='Holiday')
+        days_off = calendars.assign_holiday(holiday, self.user)
+        self.assertEqual(sorted(day_off.employee_id for day_off in days_off),
+                         [vacation.id, plain.id])
+
+    @override_settings(HR_CALENDAR_INDEX_SECONDS=0)
+    def test_index_follows_other_processes(self):
+        friday = self.monday + timedelta(days=4)
+        self.assertEqual(calendars.get_index().working_days_between(
+            self.monday, friday), 5)
+        # Written without signals, as another process's writes are seen.
+        Holiday.objects.bulk_create([
+            Holiday(date=self.monday + timedelta(days=2), name='Holiday')])
+        self.assertEqual(calendars.get_index().working_days_between(
+            self.monday, friday), 4)
+        holiday = Holiday.objects.get()
+        holiday.date = self.monday + timedelta(days=5)
+        post_save.disconnect(signals.calendar_changed, sender=Holiday)
+        try:
+            holiday.save()
+        finally:
+            post_save.connect(signals.calendar_changed, sender=Holiday)
+        self.assertEqual(calendars.get_index().working_days_between(
+            self.monday, friday), 5)
+
+    @override_settings(HR_CALENDAR_INDEX_SECONDS=30)
+    def test_index_checked_after_ttl(self):
+        friday = self.monday + timedelta(days=4)
+        calendars.invalidate()
+        with mock.patch('hr.calendars.time.monotonic', return_value=100):
+            self.assertEqual(calendars.get_index().working_days_between(
+                self.monday, friday), 5)
+            Holiday.objects.bulk_create([
+                Holiday(date=self.monday + timedelta(days=2),
+                        name='Holiday')])
+            with self.assertNumQueries(0):
+                self.assertEqual(calendars.get_index().working_days_between(
+                    self.monday, friday), 5)
+        with mock.patch('hr.calendars.time.monotonic', return_value=131):
+            self.assertEqual(calendars.get_index().working_days_between(
+                self.monday, friday), 4)
+            # Checked again, and unchanged since.
+            with self.assertNumQueries(0):
+                calendars.get_index()
+
+    @override_settings(HR_CALENDAR_INDEX_SECONDS=30)
+    def test_invalidate(self):
+        friday = self.monday + timedelta(days=4)
+        calendars.get_index()
+        Holiday.objects.bulk_create([
+            Holiday(date=self.monday + timedelta(days=2), name='Holiday')])
+        calendars.invalidate()
+        self.assertEqual(calendars.get_index().working_days_between(
+            self.monday, friday), 4)
+
+
+class ApprovalLedgerTests(TestCase):
+    """
+    Approving a request posts one usage entry per day off, linked to it,
+    and denying it afterwards gives the hours back.
+    """
+
+    def test_entries_link_days_off(self):
+        manager = make_user('manager', 'm')
+        employee = make_employee('worker')
+        today = timezone.localdate()
+        monday = today - timedelta(days=today.weekday() - 7)
+        days_off_request = DaysOffRequest.objects.create(
+            employee=employee, start_date=monday,
+            end_date=monday + timedelta(days=3), request_type='vn',
+            updated_by=manager)
+        approvals.set_status([days_off_request.id], approvals.APPROVED,
+                             manager)
+        days_off = DayOff.objects.filter(employee=employee)
+        entries = TimeOffEntry.objects.filter(employee=employee)
+        self.assertEqual(days_off.count(), 4)
+        self.assertEqual(
+            sorted(entries.values_list('day_off_id', flat=True)),
+            sorted(days_off.values_list('id', flat=True)))
+        self.assertEqual(sum(entry.hours for entry in entries), -32)
+
+        approvals.set_status([days_off_request.id], approvals.DENIED,
+                             manager)
+        self.assertFalse(DayOff.objects.filter(employee=employee).exists())
+        self.assertEqual(sum(entry.hours for entry in entries.all()), 0)
+
+
+class ExportPayrollTests(TestCase):
+    """
+    `export_payroll` writes CSV through the command's stdout.
+    """
+
+    def test_csv_to_stdout(self):
+        employee = make_employee('worker', payroll_id='P1')
+        day = timezone.localdate() - timedelta(days=1)
+        WorkPeriod.objects.create(employee=employee,
+                                  start_time=local_time(day, 8),
+                                  end_time=local_time(day, 12))
+        out = StringIO()
+        call_command('export_payroll', pay_period=day.isoformat(),
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(',')[:3],
+                         ['payroll_id', 'last_name', 'first_name'])
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('P1,Tester,Worker,'))
+
+
+class SoftDeleteTests(ApiTestCase):
+    """
+    Soft-deleted work periods are left out of every read: lists, latest,
+    clock in and out, overlap checks, rollups and exports.
+    """
+
+    def setUp(self):
+        self.login('manager', 'm')
+        self.employee = make_employee('worker')
+        self.day = timezone.localdate() - timedelta(days=1)
+        self.live = WorkPeriod.objects.create(
+            employee=self.employee, start_time=local_time(self.day, 8),
+            end_time=local_time(self.day, 12))
+        self.deleted = WorkPeriod.objects.create(
+            employee=self.employee, start_time=local_time(self.day, 13),
+            end_time=local_time(self.day, 17), is_deleted=True)
+        self.deleted_open = WorkPeriod.objects.create(
+            employee=self.employee, start_time=local_time(self.day, 18),
+            is_deleted=True)
+
+    def ids(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()['data']
+        if isinstance(data, dict):
+            data = [data]
+        return [int(item['id']) for item in data]
+
+    def test_list(self):
+        self.assertEqual(self.ids('/hr/work-periods/'), [self.live.id])
+        self.assertEqual(self.ids('/hr/work-periods/mine/'), [])
+        response = self.client.get(
+            '/hr/work-periods/{}/'.format(self.deleted.id))
+        self.assertEqual(response.status_code, 404)
+
+    def test_latest(self):
+        self.assertEqual(self.ids('/hr/work-periods/latest/'),
+                         [self.live.id])
+        self.assertEqual(
+            self.ids('/hr/work-periods/latest/?employee={}'.format(
+                self.employee.id)),
+            [self.live.id])
+
+    def test_clock_in_and_out(self):
+        status = ClockStatus.objects.refresh(self.employee.id)
+        self.assertIsNone(status.work_period_id)
+        self.assertEqual(status.last_start_time, self.live.start_time)
+        # Over the deleted periods, which do not overlap.
+        with transaction.atomic():
+            status = ClockStatus.objects.lock(self.employee.id)
+            work_period = clock.clock_in(status, local_time(self.day, 14))
+        with transaction.atomic():
+            status = ClockStatus.objects.lock(self.employee.id)
+            clock.clock_out(status, local_time(self.day, 19))
+        work_period.refresh_from_db()
+        self.assertEqual(work_period.end_time, local_time(self.day, 19))
+
+    def test_overlaps(self):
+        self.assertIsNone(find_overlap(self.employee.id,
+                                       local_time(self.day, 14),
+                                       local_time(self.day, 20)))
+        self.assertEqual(find_overlap(self.employee.id,
+                                      local_time(self.day, 11),
+                                      local_time(self.day, 20)),
+                         self.live)
+        self.assertEqual(find_batch_overlaps(
+            self.employee.id, [(local_time(self.day, 14),
+                                local_time(self.day, 20))]), {})
+
+    def test_rollups(self):
+        rollup = HoursRollup.objects.get(employee=self.employee,
+                                         date=self.day)
+        self.assertEqual(rollup.worked_minutes, 240)
+        rollups.rebuild(self.day, self.day)
+        rollup = HoursRollup.objects.get(employee=self.employee,
+                                         date=self.day)
+        self.assertEqual(rollup.worked_minutes, 240)
+
+    def test_exports(self):
+        first, last = exports.pay_period(self.day)
+        rows = [row for row in exports.payroll_rows(first, last)
+                if row[4] == exports.WORK]
+        self.assertEqual([(row[7], row[8]) for row in rows],
+                         [('08:00', '12:00')])
+
+
+class ArchiveTests(ApiTestCase):
+    """
+    History reads the archive only for ranges that reach back into it, and
+    each process sees archiving done elsewhere once its cached boundary
+    expires.
+    """
+
+    def setUp(self):
+        history.forget_boundary()
+        self.addCleanup(history.forget_boundary)
+        self.login('manager', 'm')
+        self.employee = make_employee('worker')
+        today = timezone.localdate()
+        self.old_day = today - timedelta(days=500)
+        self.recent_day = today - timedelta(days=10)
+        for day in (self.old_day, self.recent_day):
+            for hour in (8, 13):
+                WorkPeriod.objects.create(
+                    employee=self.employee, start_time=local_time(day, hour),
+                    end_time=local_time(day, hour + 4))
+
+    def history(self, first, last):
+        path = '/hr/work-periods/history/?employee={}&start={}&end={}'.format(
+            self.employee.id, first, last)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        archive_queries = [query for query in captured
+                           if 'hr_archivedworkperiod' in query['sql']]
+        return len(response.json()['data']), len(archive_queries)
+
+    def test_history(self):
+        self.assertEqual(archive.archive_closed(), 2)
+        self.assertEqual(WorkPeriod.all_objects.count(), 2)
+        today = timezone.localdate()
+        self.assertEqual(self.history(self.old_day, today), (4, 1))
+        self.assertEqual(self.history(self.recent_day, today), (2, 0))
+
+    def test_history_query_count(self):
+        archive.archive_closed()
+        today = timezone.localdate()
+        path = '/hr/work-periods/history/?employee={}&start={}&end={}'.format(
+            self.employee.id, self.old_day, today)
+        self.client.get(path)
+        # Session, user with its role, the union and its employees.
+        with self.assertNumQueries(4):
+            self.client.get(path)
+
+    def test_boundary_read_from_database(self):
+        self.assertIsNone(history.archive_boundary())
+        # Archived by another process.
+        archived = ArchivedWorkPeriod.objects.create(
+            id=1000, employee=self.employee,
+            start_time=local_time(self.old_day, 18),
+            end_time=local_time(self.old_day, 19))
+        # Cached here until it expires.
+        self.assertIsNone(history.archive_boundary())
+        history.forget_boundary()
+        self.assertEqual(history.archive_boundary(), archived.start_time)
+
+    def test_purged_rows_do_not_move_boundary(self):
+        deleted = WorkPeriod.objects.create(
+            employee=self.employee,
+            start_time=local_time(self.recent_day - timedelta(days=90), 8),
+            end_time=local_time(self.recent_day - timedelta(days=90), 9),
+            is_deleted=True)
+        call_command('purge_deleted_work_periods', days=30,
+                     stdout=StringIO())
+        self.assertTrue(ArchivedWorkPeriod.objects.filter(
+            id=deleted.id).exists())
+        self.assertIsNone(history.archive_boundary())
+        history.forget_boundary()
+        self.assertIsNone(history.archive_boundary())
+        archive.archive_closed()
+        history.forget_boundary()
+        self.assertEqual(history.archive_boundary(),
+                         local_time(self.old_day, 13))
+        self.assertFalse(history.reaches_archive(
+            local_time(self.recent_day, 0)))
+
+    def list_ids(self, query):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get('/hr/work-periods/?' + query)
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        archive_queries = [item for item in captured
+                           if 'hr_archivedworkperiod' in item['sql']]
+        return ([int(item['id']) for item in body['data']],
+                body.get('links', {}).get('next'), len(archive_queries))
+
+    def test_list_reads_archive(self):
+        ids = list(WorkPeriod.objects.order_by('start_time').values_list(
+            'id', flat=True))
+        archive.archive_closed()
+        old, recent = self.old_day, self.recent_day
+        self.assertEqual(self.list_ids('min_start_date={}'.format(old)),
+                         (ids, None, 1))
+        self.assertEqual(self.list_ids('min_start_date={}'.format(recent)),
+                         (ids[2:], None, 0))
+        self.assertEqual(self.list_ids(''), (ids[2:], None, 0))
+        self.assertEqual(
+            self.list_ids('min_start_date={}&max_start_date={}'.format(
+                old, old + timedelta(days=1)))[0], ids[:2])
+
+        page, next_link, _ = self.list_ids(
+            'min_start_date={}&page_size=3'.format(old))
+        self.assertEqual(page, ids[:3])
+        page, next_link, _ = self.list_ids(next_link.split('?', 1)[1])
+        self.assertEqual((page, next_link), (ids[3:], None))
+        page, _, _ = self.list_ids(
+            'min_start_date={}&page_size=3&sort=-start-time'.format(old))
+        self.assertEqual(page, ids[:0:-1])
+        page, _, _ = self.list_ids(
+            'min_start_date={}&page_size=3&page=2'.format(old))
+        self.assertEqual(page, ids[3:])
+
+    def test_list_archive_query_count(self):
+        archive.archive_closed()
+        path = '/hr/work-periods/?min_start_date={}&page_size=10'.format(
+            self.old_day)
+        self.client.get(path)
+        # Session, user with its role, the union and its employees.
+        with self.assertNumQueries(4):
+            self.client.get(path)
+
+    @override_settings(HR_ARCHIVE_BOUNDARY_SECONDS=0)
+    def test_boundary_not_cached(self):
+        self.assertIsNone(history.archive_boundary())
+        archived = ArchivedWorkPeriod.objects.create(
+            id=1000, employee=self.employee,
+            start_time=local_time(self.old_day, 18),
+            end_time=local_time(self.old_day, 19))
+        self.assertEqual(history.archive_boundary(), archived.start_time)
+
+
+class SearchTests(ApiTestCase):
+    """
+    Employees are found by any part of their name, payroll id, phone or
+    username, and each process sees changes made by any other.
+    """
+
+    def setUp(self):
+        search.invalidate()
+        self.login('manager', 'm')
+        self.ada = make_employee('alovelace', first_name='Ada',
+                                 last_name='Lovelace', payroll_id='P100',
+                                 primary_phone='(555)123-4567')
+        self.alan = make_employee('aturing', first_name='Alan',
+                                  last_name='Turing', payroll_id='P200')
+
+    def search(self, query):
+        response = self.client.get('/hr/employees/search/?q=' + query)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [int(item['id']) for item in response.json()['data']]
+
+    def test_search(self):
+        self.assertEqual(self.search('lovel'), [self.ada.id])
+        self.assertEqual(self.search('a'), [self.ada.id, self.alan.id])
+        self.assertEqual(self.search('ada lovelace'), [self.ada.id])
+        self.assertEqual(self.search('555-123'), [self.ada.id])
+        self.assertEqual(self.search('p200'), [self.alan.id])
+        self.assertEqual(self.search('aturing'), [self.alan.id])
+        self.assertEqual(self.search('hopper'), [])
+
+    def test_username_change(self):
+        self.assertEqual(self.search('aturing'), [self.alan.id])
+        user = self.alan.user
+        user.username = 'enigma'
+        user.save()
+        self.assertEqual(self.search('aturing'), [])
+        self.assertEqual(self.search('enigma'), [self.alan.id])
+
+    def test_change_from_another_process(self):
+        self.assertEqual(self.search('hopper'), [])
+        # Without signals, as a write on another worker would be made.
+        Employee.objects.filter(id=self.alan.id).update(
+            search_text='grace hopper', updated_at=timezone.now())
+        self.assertEqual(self.search('hopper'), [self.alan.id])
+        Employee.objects.filter(id=self.alan.id).delete()
+        self.assertEqual(self.search('hopper'), [])
+
+    def test_employee_finds_only_self(self):
+        self.client.force_login(self.ada.user)
+        self.assertEqual(self.search('a'), [self.ada.id])
+        self.assertEqual(self.search('turing'), [])
+
+    def test_query_count(self):
+        self.search('lovelace')
+        # Session, user with its role, the index version and the page.
+        with self.assertNumQueries(4):
+            self.search('a')
+
+
+@override_settings(HR_REPLICA_DATABASE='default')
+class ReplicaTests(ApiTestCase):
+    """
+    Reads switch to the replica only after authentication, except for users
+    pinned to the primary by a recent write, and connections are checked
+    at most every `HR_DB_HEALTH_CHECK_SECONDS`.
+    """
+
+    def setUp(self):
+        self.manager = self.login('manager', 'm')
+
+    def pinned_response(self, user):
+        request = RequestFactory().post('/hr/employees/')
+        request.user = user
+        return ReplicaMiddleware().process_response(request, HttpResponse())
+
+    def test_pin_cookie(self):
+        response = self.pinned_response(self.manager)
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        request = RequestFactory().get('/hr/employees/')
+        request.COOKIES[replicas.PIN_COOKIE] = cookie.value
+        request.user = self.manager
+        self.assertTrue(replicas.is_pinned(request))
+        request.user = make_user('other')
+        self.assertFalse(replicas.is_pinned(request))
+        request.COOKIES[replicas.PIN_COOKIE] = str(self.manager.pk)
+        request.user = self.manager
+        self.assertFalse(replicas.is_pinned(request))
+
+    @override_settings(HR_REPLICA_DATABASE='none')
+    def test_no_pin_without_replica(self):
+        response = self.pinned_response(self.manager)
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+    def test_switch_after_authentication(self):
+        with mock.patch('hr.replicas.use_replica') as use_replica:
+            self.client.logout()
+            response = self.client.get('/hr/employees/')
+            self.assertEqual(response.status_code, 403)
+            self.assertFalse(use_replica.called)
+
+            self.client.force_login(self.manager)
+            self.client.get('/hr/employees/')
+            self.assertEqual(use_replica.call_count, 1)
+
+            cookie = self.pinned_response(self.manager).cookies[
+                replicas.PIN_COOKIE]
+            self.client.cookies[replicas.PIN_COOKIE] = cookie.value
+            self.client.get('/hr/employees/')
+            self.assertEqual(use_replica.call_count, 1)
+
+    def check_count(self):
+        connection.ensure_connection()
+        replicas._state.checked = {}
+        with mock.patch.object(connection, 'is_usable',
+                               return_value=True) as is_usable:
+            for _ in range(3):
+                replicas.check_connections()
+        return is_usable.call_count
+
+    def test_health_checks_rate_limited(self):
+        self.assertEqual(self.check_count(), 1)
+        with override_settings(HR_DB_HEALTH_CHECK_SECONDS=0):
+            self.assertEqual(self.check_count(), 3)
+
+
+class RosterTests(ApiTestCase):
+    """
+    Terminals get the active employees as a snapshot, then only what
+    changed after the version they have, or a full snapshot when too much
+    changed.
+    """
+
+    def setUp(self):
+        self.login('terminal', 't')
+        self.ada = make_employee('ada', first_name='Ada', last_name='Lovelace')
+        self.alan = make_employee('alan', first_name='Alan',
+                                  last_name='Turing')
+        self.grace = make_employee('grace', first_name='Grace',
+                                   last_name='Hopper')
+
+    def get(self, query=''):
+        response = self.client.get('/hr/roster/' + query)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_snapshot(self):
+        data = self.get()
+        self.assertEqual(data['version'], roster.version())
+        self.assertEqual(data['employees'], [
+            [self.grace.id, 'Grace Hopper'], [self.ada.id, 'Ada Lovelace'],
+            [self.alan.id, 'Alan Turing']])
+
+    def test_delta(self):
+        since = self.get()['version']
+        self.assertEqual(self.get('?since={}'.format(since))['added'], [])
+        # Fields the terminals do not show are not changes.
+        self.ada.primary_phone = '555-0100'
+        self.ada.save()
+        self.assertEqual(roster.version(), since)
+
+        self.ada.last_name = 'King'
+        self.ada.save()
+        self.alan.is_active = False
+        self.alan.save()
+        margaret = make_employee('margaret', first_name='Margaret',
+                                 last_name='Hamilton')
+        data = self.get('?since={}'.format(since))
+        self.assertEqual(data['version'], since + 3)
+        self.assertFalse(data['full'])
+        self.assertEqual(data['added'],
+                         [[margaret.id, 'Margaret Hamilton']])
+        self.assertEqual(data['changed'], [[self.ada.id, 'Ada King']])
+        self.assertEqual(data['removed'], [self.alan.id])
+
+        data = self.get('?since={}'.format(since + 2))
+        self.assertEqual((data['added'], data['changed'], data['removed']),
+                         ([[margaret.id, 'Margaret Hamilton']], [], []))
+
+    def test_delta_follows_versions(self):
+        since = roster.version()
+        RosterChange.objects.update(id=F('id') + 10)
+        # A change that took its id before the others but committed after
+        # `since` was read, so its version is newer.
+        RosterChange.objects.create(id=1, employee_id=self.ada.id,
+                                    action=roster.CHANGED,
+                                    version=roster.bump())
+        data = self.get('?since={}'.format(since))
+        self.assertEqual(data['changed'], [[self.ada.id, 'Ada Lovelace']])
+
+    def test_record_ids(self):
+        since = roster.version()
+        roster.record_ids([self.ada.id, self.alan.id], roster.CHANGED)
+        self.assertEqual(roster.version(), since + 1)
+        data = self.get('?since={}'.format(since))
+        self.assertEqual([entry[0] for entry in data['changed']],
+                         [self.ada.id, self.alan.id])
+
+    def test_full_snapshot_fallback(self):
+        since = roster.version()
+        with mock.patch.object(roster, 'MAX_DELTA', 2):
+            for employee in (self.ada, self.alan, self.grace):
+                employee.first_name += 'x'
+                employee.save()
+            data = self.get('?since={}'.format(since))
+        self.assertTrue(data['full'])
+        self.assertEqual(len(data['employees']), 3)
+        data = self.get('?since={}'.format(roster.version() + 1))
+        self.assertTrue(data['full'])
+
+    def test_invalid_since(self):
+        for since in ('-1', 'x'):
+            response = self.client.get('/hr/roster/?since=' + since)
+            self.assertEqual(response.status_code, 400)
+
+    def test_employees_denied(self):
+        self.client.force_login(self.ada.user)
+        response = self.client.get('/hr/roster/')
+        self.assertEqual(response.status_code, 403)
+
+
+class SyncTests(ApiTestCase):
+    """
+    Queued clock events are applied once per key, in time order per
+    employee, and each failing event is rolled back on its own.
+    """
+
+    def setUp(self):
+        self.login('terminal', 't')
+        self.employee = make_employee('worker')
+        self.day = timezone.localdate() - timedelta(days=1)
+
+    def event(self, key, event_type, hour, employee=None):
+        return {'key': key, 'type': event_type,
+                'time': local_time(self.day, hour).isoformat(),
+                'employee': employee or self.employee.id}
+
+    def sync(self, events, status_code=200):
+        response = self.client.post('/hr/work-periods/sync/',
+                                    json.dumps({'events': events}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, status_code, response.content)
+        return response.json().get('data')
+
+    def statuses(self, results):
+        return [(result['status'], result.get('work_period'))
+                for result in results['events']]
+
+    def test_replay(self):
+        events = [self.event('in-1', 'in', 8), self.event('out-1', 'out', 12)]
+        results = self.sync(events)
+        work_period = WorkPeriod.objects.get()
+        self.assertEqual(self.statuses(results),
+                         [('applied', work_period.id)] * 2)
+        self.assertEqual(work_period.end_time, local_time(self.day, 12))
+        self.assertIsNone(ClockStatus.objects.get(
+            employee=self.employee).work_period_id)
+
+        results = self.sync(events)
+        self.assertEqual(self.statuses(results),
+                         [('duplicate', work_period.id)] * 2)
+        self.assertEqual(WorkPeriod.objects.count(), 1)
+
+    def test_duplicate_in_batch(self):
+        results = self.sync([self.event('in-1', 'in', 8),
+                             self.event('in-1', 'in', 8)])
+        work_period = WorkPeriod.objects.get()
+        self.assertEqual(self.statuses(results),
+                         [('applied', work_period.id),
+                          ('duplicate', work_period.id)])
+
+    def test_out_of_order(self):
+        other = make_employee('other')
+        results = self.sync([
+            self.event('out-1', 'out', 12),
+            self.event('in-2', 'in', 9, other.id),
+            self.event('in-1', 'in', 8),
+        ])
+        self.assertEqual([status for status, _ in self.statuses(results)],
+                         ['applied'] * 3)
+        work_period = WorkPeriod.objects.get(employee=self.employee)
+        self.assertEqual((work_period.start_time, work_period.end_time),
+                         (local_time(self.day, 8), local_time(self.day, 12)))
+        self.assertEqual(ClockStatus.objects.get(
+            employee=other).work_period.start_time, local_time(self.day, 9))
+
+    def test_partial_failure(self):
+        results = self.sync([
+            self.event('in-1', 'in', 8),
+            self.event('in-2', 'in', 9),
+            self.event('out-1', 'out', 12),
+            self.event('in-3', 'in', 8, employee=9999),
+            'in',
+            {'type': 'in', 'employee': self.employee.id},
+            dict(self.event('in-4', 'in', 8),
+                 time=(timezone.now() + timedelta(hours=1)).isoformat()),
+        ])
+        statuses = [result['status'] for result in results['events']]
+        self.assertEqual(statuses, ['applied', 'error', 'applied', 'error',
+                                    'error', 'error', 'error'])
+        self.assertEqual(results['events'][1]['error'],
+                         'Employee already clocked in')
+        self.assertEqual(results['events'][3]['error'],
+                         "No employee with id '9999'")
+        self.assertEqual(
+            sorted(ClockEvent.objects.values_list('key', flat=True)),
+            ['in-1', 'out-1'])
+        work_period = WorkPeriod.objects.get()
+        self.assertEqual(work_period.end_time, local_time(self.day, 12))
+
+        # The failed key can be sent again once it applies.
+        results = self.sync([self.event('in-2', 'in', 13)])
+        self.assertEqual(results['events'][0]['status'], 'applied')
+
+    def test_invalid_requests(self):
+        response = self.client.post('/hr/work-periods/sync/',
+                                    json.dumps({'events': 'in'}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        with mock.patch('hr.views.MAX_SYNC_EVENTS', 2):
+            self.sync([self.event('in-{}'.format(index), 'in', 8)
+                       for index in range(3)], status_code=400)
+        self.assertFalse(ClockEvent.objects.exists())
+
+    def test_terminals_only(self):
+        self.login('manager', 'm')
+        self.sync([self.event('in-1', 'in', 8)], status_code=403)
+
+
+class ImportTests(ApiTestCase):
+    """
+    Streaming imports report invalid rows by file line, reject overlaps
+    within and across chunks, and refresh the derived tables.
+    """
+
+    def setUp(self):
+        self.login('manager', 'm')
+        self.ada = make_employee('ada', payroll_id='P1')
+        self.alan = make_employee('alan', payroll_id='P2')
+        self.day = timezone.localdate() - timedelta(days=1)
+
+    def time(self, hour):
+        return local_time(self.day, hour).isoformat()
+
+    def csv_lines(self, *rows):
+        lines = ['payroll_id,start_time,end_time,note']
+        lines += [','.join(row) for row in rows]
+        return [line + '\n' for line in lines]
+
+    def test_csv_line_numbers(self):
+        lines = self.csv_lines(
+            ('P1', self.time(8), self.time(12), '"two\nlines"'),
+            ('P1', 'yesterday', '', ''),
+            ('P9', self.time(8), '', ''),
+            ('', self.time(8), '', ''))
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'periods.csv')
+        with open(path, 'w') as f:
+            f.writelines(lines)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_work_periods', path, stdout=stdout,
+                     stderr=stderr)
+        self.assertEqual(stderr.getvalue().splitlines(), [
+            "Line 4: Invalid date/time 'yesterday'",
+            "Line 5: No employee with payroll_id 'P9'",
+            'Line 6: payroll_id is required'])
+        self.assertIn('Imported 1 of 4 rows', stdout.getvalue())
+        self.assertEqual(WorkPeriod.objects.get().note, 'two\nlines')
+
+    def test_ndjson(self):
+        body = '\n'.join([
+            json.dumps({'payroll_id': 'P1', 'start_time': self.time(8),
+                        'end_time': self.time(12)}),
+            '',
+            '{"payroll_id": ',
+            json.dumps(['P1']),
+            json.dumps({'payroll_id': 'P2', 'start_time': self.time(9)}),
+        ])
+        response = self.client.post('/hr/work-periods/import/', body,
+                                    content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200, response.content)
+        result = response.json()['data']
+        self.assertEqual((result['rows'], result['created']), (4, 2))
+        self.assertEqual([error['row'] for error in result['errors']],
+                         [3, 4])
+
+    def test_overlaps(self):
+        WorkPeriod.objects.create(employee=self.ada,
+                                  start_time=local_time(self.day, 6),
+                                  end_time=local_time(self.day, 7))
+        lines = self.csv_lines(
+            ('P1', self.time(8), self.time(10), ''),
+            ('P1', self.time(9), self.time(11), ''),
+            ('P2', self.time(8), self.time(10), ''),
+            ('P1', self.time(9), self.time(12), ''),
+            ('P1', self.time(6), self.time(8), ''))
+        result = import_work_periods(read_rows(lines, CSV), chunk_size=2)
+        self.assertEqual([error['row'] for error in result.errors], [3, 5, 6])
+        self.assertEqual(result.created, 2)
+        self.assertEqual(WorkPeriod.objects.filter(
+            employee=self.ada).count(), 2)
+
+    def test_ambiguous_payroll_id(self):
+        make_employee('grace', payroll_id='P1')
+        lines = self.csv_lines(('P1', self.time(8), self.time(12), ''),
+                               ('P2', self.time(8), self.time(12), ''))
+        result = import_work_periods(read_rows(lines, CSV))
+        self.assertEqual(result.errors, [
+            {'row': 2,
+             'error': "More than one employee with payroll_id 'P1'"}])
+        self.assertEqual(result.created, 1)
+
+    def test_derived_tables(self):
+        lines = self.csv_lines(('P1', self.time(8), self.time(12), ''),
+                               ('P1', self.time(13), '', ''))
+        result = import_work_periods(read_rows(lines, CSV))
+        self.assertEqual(result.errors, [])
+        status = ClockStatus.objects.get(employee=self.ada)
+        self.assertEqual(status.work_period.start_time,
+                         local_time(self.day, 13))
+        self.assertEqual(HoursRollup.objects.get(
+            employee=self.ada, date=self.day).worked_minutes, 240)
+
+
+class AdminTests(TestCase):
+
+    def setUp(self):
+        self.employee = make_employee('ada')
+        self.superuser = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.day = timezone.localdate() - timedelta(days=1)
+
+    def time(self, hour):
+        return local_time(self.day, hour)
+
+    def inline_formset(self, *periods):
+        request = RequestFactory().post('/')
+        request.user = self.superuser
+        inline = WorkPeriodInline(Employee, site)
+        formset_class = inline.get_formset(request, self.employee)
+        prefix = formset_class.get_default_prefix()
+        queryset = inline.get_queryset(request)
+        existing = list(queryset.filter(employee=self.employee))
+        data = {
+            prefix + '-TOTAL_FORMS': str(len(periods)),
+            prefix + '-INITIAL_FORMS': str(len(existing)),
+        }
+        for index, (start, end) in enumerate(periods):
+            field = '{}-{}-'.format(prefix, index)
+            if index < len(existing):
+                data[field + 'id'] = str(existing[index].id)
+            data[field + 'employee'] = str(self.employee.id)
+            for name, value in (('start_time', start), ('end_time', end)):
+                value = timezone.localtime(value)
+                data[field + name + '_0'] = value.date().isoformat()
+                data[field + name + '_1'] = value.time().isoformat()
+        return formset_class(data, instance=self.employee,
+                             queryset=queryset)
+
+    def test_inline_batch_overlap(self):
+        formset = self.inline_formset((self.time(8), self.time(12)),
+                                      (self.time(11), self.time(13)))
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(formset.forms[0].non_field_errors(), [])
+        self.assertEqual(formset.forms[1].non_field_errors(), [
+            'This work period overlaps with another one in the batch.'])
+
+    def test_inline_moves_existing(self):
+        # The later period moves away and the earlier one into its place,
+        # which only the submitted times together allow.
+        WorkPeriod.objects.create(employee=self.employee,
+                                  start_time=self.time(8),
+                                  end_time=self.time(10))
+        WorkPeriod.objects.create(employee=self.employee,
+                                  start_time=self.time(10),
+                                  end_time=self.time(12))
+        formset = self.inline_formset((self.time(13), self.time(15)),
+                                      (self.time(9), self.time(12)))
+        self.assertTrue(formset.is_valid(), formset.errors)
+
+    def test_inline_existing_overlap(self):
+        # Too old to be shown by the inline, but still checked.
+        old = timedelta(days=40)
+        WorkPeriod.objects.create(employee=self.employee,
+                                  start_time=self.time(8) - old,
+                                  end_time=self.time(10) - old)
+        formset = self.inline_formset((self.time(7) - old, self.time(9)))
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(formset.forms[0].non_field_errors(), [
+            'This work period overlaps with an existing one.'])
+
+    def clock_in(self):
+        work_period = WorkPeriod.objects.create(employee=self.employee,
+                                                start_time=self.time(8))
+        ClockStatus.objects.refresh(self.employee.id)
+        return work_period
+
+    def assert_clocked_out(self):
+        status = ClockStatus.objects.get(employee=self.employee)
+        self.assertIsNone(status.work_period)
+        self.assertIsNone(status.last_start_time)
+
+    def test_delete_refreshes_clock_status(self):
+        work_period = self.clock_in()
+        self.client.force_login(self.superuser)
+        response = self.client.post(
+            '/admin/hr/workperiod/{}/delete/'.format(work_period.id),
+            {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(WorkPeriod.all_objects.exists())
+        self.assert_clocked_out()
+
+    def test_bulk_delete_refreshes_clock_status(self):
+        work_period = self.clock_in()
+        self.client.force_login(self.superuser)
+        data = {'action': 'delete_selected', '_selected_action':
+                [work_period.id]}
+        response = self.client.post('/admin/hr/workperiod/', data)
+        # The confirmation page changes nothing.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ClockStatus.objects.get(
+            employee=self.employee).work_period, work_period)
+        data['post'] = 'yes'
+        response = self.client.post('/admin/hr/workperiod/', data)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(WorkPeriod.all_objects.exists())
+        self.assert_clocked_out()
+
+
+class MetricsTests(ApiTestCase):
+
+    route = 'hr:Employees-list'
+
+    def setUp(self):
+        registry.series.clear()
+
+    def series(self):
+        return registry.series[(self.route, 'list', 'GET', 200)]
+
+    def test_exposition(self):
+        labels = (self.route, 'list', 'GET', 200)
+        registry.observe(labels, 0.003, db_queries=2, response_bytes=10)
+        registry.observe(labels, 0.2, db_queries=3, response_bytes=20)
+        registry.observe(labels, 3.0, db_queries=1, response_bytes=30)
+        lines = registry.render().splitlines()
+        prefix = ('hr_http_request_duration_seconds_bucket{route='
+                  '"hr:Employees-list",action="list",method="GET",'
+                  'status="200",le=')
+        for bound, count in (('0.005', 1), ('0.1', 1), ('0.25', 2),
+                             ('2.5', 2), ('5.0', 3), ('+Inf', 3)):
+            self.assertIn('{}"{}"}} {}'.format(prefix, bound, count), lines)
+        label_text = ('route="hr:Employees-list",action="list",method="GET",'
+                      'status="200"')
+        self.assertIn('hr_http_request_duration_seconds_count{{{}}} 3'.format(
+            label_text), lines)
+        self.assertIn('hr_http_request_duration_seconds_sum{{{}}} {}'.format(
+            label_text, 0.003 + 0.2 + 3.0), lines)
+        self.assertIn('# TYPE hr_http_db_queries_total counter', lines)
+        self.assertIn('hr_http_db_queries_total{{{}}} 6'.format(label_text),
+                      lines)
+        self.assertIn('hr_http_response_bytes_total{{{}}} 60'.format(
+            label_text), lines)
+
+    def test_escaped_labels(self):
+        registry.observe(('a"b\\c', 'list', 'GET', 200), 0.1)
+        self.assertIn('route="a\\"b\\\\c"', registry.render())
+
+    @override_settings(HR_METRICS_SQL_SAMPLE_RATE=1)
+    def test_sampled_request(self):
+        self.login('manager', 'm')
+        response = self.client.get('/hr/employees/')
+        series = self.series()
+        self.assertEqual(series.count, 1)
+        self.assertEqual(series.totals['sql_sampled'], 1)
+        self.assertGreater(series.totals['db_queries'], 0)
+        self.assertEqual(series.totals['response_bytes'],
+                         len(response.content))
+        self.assertFalse(connection.force_debug_cursor)
+
+    @override_settings(HR_METRICS_SQL_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        self.login('manager', 'm')
+        self.client.get('/hr/employees/')
+        series = self.series()
+        self.assertEqual(series.count, 1)
+        self.assertEqual(series.totals['sql_sampled'], 0)
+        self.assertEqual(series.totals['db_queries'], 0)
+        self.assertEqual(len(connection.queries_log), 0)
+
+    @override_settings(HR_METRICS_SQL_SAMPLE_RATE=1, HR_SLOW_REQUEST_MS=0)
+    def test_slow_request_logged(self):
+        self.login('manager', 'm')
+        with self.assertLogs('hr.metrics', 'WARNING') as logs:
+            self.client.get('/hr/employees/')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('Slow request GET /hr/employees/ '
+                      '(hr:Employees-list list)', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(HR_METRICS_SQL_SAMPLE_RATE=1, HR_SLOW_REQUEST_MS=0,
+                       HR_SLOW_REQUEST_IGNORE=('hr:Employees-list',))
+    def test_slow_request_ignored(self):
+        self.login('manager', 'm')
+        with mock.patch.object(middleware.logger, 'warning') as warning:
+            self.client.get('/hr/employees/')
+        warning.assert_not_called()
+        self.assertEqual(self.series().count, 1)
+
+    def test_permissions(self):
+        self.assertIn(self.client.get('/metrics').status_code, (401, 403))
+        self.login('manager', 'm')
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        user = self.login('admin', 'e')
+        Privileges.objects.filter(user=user).update(is_global_admin=True)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hr_http_request_duration_seconds_count',
+                      response.content.decode('utf-8'))
+
+
+class GeneratorTests(TestCase):
+    """
+    The generator's bulk writes and rebuilds leave the derived tables as the
+    per-row refreshes would.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.generator = Generator(prefix='gen', employees=3, managers=1,
+                                  terminals=1, years=1, seed=1)
+        cls.generator.run()
+        cls.employee_ids = list(Employee.objects.filter(
+            user__username__startswith='gen').values_list('id', flat=True))
+
+    def test_clock_status(self):
+        generated = set(ClockStatus.objects.values_list(
+            'employee_id', 'work_period_id', 'last_start_time',
+            'last_end_time'))
+        ClockStatus.objects.all().delete()
+        for employee_id in self.employee_ids:
+            ClockStatus.objects.refresh(employee_id)
+        self.assertEqual(set(ClockStatus.objects.values_list(
+            'employee_id', 'work_period_id', 'last_start_time',
+            'last_end_time')), generated)
+
+    def test_rollups(self):
+        fields = ('employee_id', 'date', 'worked_minutes',
+                  'paid_day_off_hours', 'unpaid_day_off_hours')
+        generated = set(HoursRollup.objects.values_list(*fields))
+        self.assertTrue(generated)
+        days = [self.generator.first_day + timedelta(days=offset)
+                for offset in range((self.generator.last_day -
+                                     self.generator.first_day).days + 1)]
+        HoursRollup.objects.all().delete()
+        for employee_id in self.employee_ids:
+            rollups.refresh_days(employee_id, days)
+        self.assertEqual(set(HoursRollup.objects.values_list(*fields)),
+                         generated)
+
+    def test_balances(self):
+        self.assertTrue(TimeOffEntry.objects.exists())
+        self.assertEqual(balances.check(), [])
+
+
+class CompareTests(TestCase):
+
+    def report(self, *results):
+        return {'results': [
+            {'name': name, 'p95_ms': p95_ms, 'queries': queries}
+            for name, p95_ms, queries in results]}
+
+    def test_compare(self):
+        baseline = self.report(('list', 100.0, 5), ('detail', 10.0, 2),
+                               ('removed', 1.0, 1))
+        report = self.report(('list', 119.0, 5), ('detail', 12.5, 3),
+                             ('new', 500.0, 50))
+        self.assertEqual(compare(report, baseline), [
+            ('detail', 'p95_ms', 10.0, 12.5),
+            ('detail', 'queries', 2, 3)])
+        self.assertEqual(compare(report, baseline, threshold=0.1), [
+            ('list', 'p95_ms', 100.0, 119.0),
+            ('detail', 'p95_ms', 10.0, 12.5),
+            ('detail', 'queries', 2, 3)])
+        self.assertEqual(compare(report, {}), [])
+
+
+class BalanceTests(ApiTestCase):
+
+    def setUp(self):
+        self.manager = make_user('manager', 'm')
+        self.employee = make_employee('worker')
+        self.day = timezone.localdate()
+
+    def day_off(self, hours=8, day_off_type='vn', **fields):
+        return DayOff.objects.create(
+            employee=self.employee, date=self.day, hours=hours,
+            day_off_type=day_off_type, entered_by=self.manager,
+            updated_by=self.manager, **fields)
+
+    def balance(self, day_off_type='vn'):
+        return TimeOffBalance.objects.get(employee=self.employee,
+                                          day_off_type=day_off_type)
+
+    def test_endpoint(self):
+        balances.post([TimeOffEntry(
+            employee=self.employee, day_off_type='vn', kind=balances.ACCRUAL,
+            hours=40, date=self.day)])
+        self.day_off(hours=8)
+        self.client.force_login(self.employee.user)
+        response = self.client.get(
+            '/hr/employees/{}/balances/'.format(self.employee.id))
+        self.assertEqual(response.status_code, 200, response.content)
+        rows = dict((row['day_off_type'], row)
+                    for row in response.json()['data'])
+        self.assertEqual(sorted(rows), ['pl', 'vn'])
+        self.assertEqual(Decimal(rows['vn']['accrued']), 40)
+        self.assertEqual(Decimal(rows['vn']['used']), 8)
+        self.assertEqual(Decimal(rows['vn']['balance']), 32)
+        self.assertEqual(Decimal(rows['pl']['balance']), 0)
+
+        other = make_employee('other')
+        response = self.client.get(
+            '/hr/employees/{}/balances/'.format(other.id))
+        self.assertEqual(response.status_code, 404)
+
+    def test_usage_follows_days_off(self):
+        day_off = self.day_off(hours=8)
+        self.assertEqual(self.balance().used, 8)
+        day_off.hours = 4
+        day_off.save()
+        self.assertEqual(self.balance().used, 4)
+        # Unpaid days off, and types without a balance, use nothing.
+        day_off.is_paid = False
+        day_off.save()
+        self.assertEqual(self.balance().used, 0)
+        self.day_off(day_off_type='sk')
+        self.assertFalse(TimeOffBalance.objects.filter(
+            day_off_type='sk').exists())
+        day_off.delete()
+        self.assertEqual(self.balance().used, 0)
+        self.assertEqual(balances.check(), [])
+
+    def test_accrue(self):
+        inactive = make_employee('inactive', is_active=False)
+        policy = AccrualPolicy.objects.create(
+            name='Vacation', day_off_type='vn', hours=4, period='month',
+            max_balance=6)
+        entries = balances.accrue(self.day)
+        self.assertEqual([(entry.employee_id, entry.hours, entry.date)
+                          for entry in entries],
+                         [(self.employee.id, 4, self.day.replace(day=1))])
+        self.assertEqual(self.balance().accrued, 4)
+        # Once per policy and period.
+        self.assertEqual(balances.accrue(self.day), [])
+        self.assertEqual(self.balance().accrued, 4)
+        # Capped at the maximum balance.
+        next_month = self.day.replace(day=1) + timedelta(days=31)
+        entries = balances.accrue(next_month)
+        self.assertEqual([entry.hours for entry in entries], [2])
+        self.assertEqual(self.balance().accrued, 6)
+        self.assertEqual(balances.accrue(next_month + timedelta(days=31)),
+                         [])
+        self.assertFalse(TimeOffEntry.objects.filter(
+            employee=inactive).exists())
+        self.assertEqual(TimeOffEntry.objects.filter(policy=policy).count(),
+                         2)
+
+    def test_check_fix(self):
+        self.day_off(hours=8)
+        # Written without signals, so no usage is posted.
+        DayOff.objects.bulk_create([DayOff(
+            employee=self.employee, date=self.day + timedelta(days=1),
+            hours=4, day_off_type='vn', entered_by=self.manager,
+            updated_by=self.manager)])
+        TimeOffBalance.objects.filter(employee=self.employee).update(
+            accrued=10)
+        self.assertEqual(balances.check(), [{
+            'employee': self.employee.id, 'day_off_type': 'vn',
+            'accrued': 10, 'expected_accrued': 0,
+            'used': 8, 'expected_used': 12}])
+
+        self.assertEqual(len(balances.check(fix=True)), 1)
+        self.assertEqual(balances.check(), [])
+        self.assertEqual((self.balance().accrued, self.balance().used),
+                         (0, 12))
+        correction = TimeOffEntry.objects.get(note='Balance check correction')
+        self.assertEqual(correction.hours, -4)
+
+
+class ApprovalApiTests(ApiTestCase):
+
+    def setUp(self):
+        self.employee = make_employee('worker')
+        today = timezone.localdate()
+        self.monday = today - timedelta(days=today.weekday() - 7)
+        # Monday to the next Tuesday: seven working days.
+        self.days_off_request = self.make_request(
+            self.monday, self.monday + timedelta(days=8))
+
+    def make_request(self, start, end):
+        return DaysOffRequest.objects.create(
+            employee=self.employee, start_date=start, end_date=end,
+            request_type='vn', updated_by=self.employee.user)
+
+    def post(self, action, ids, **data):
+        data['ids'] = ids
+        return self.client.post(
+            '/hr/days-off-requests/{}/'.format(action), json.dumps(data),
+            content_type='application/json')
+
+    def results(self, action, ids, **data):
+        response = self.post(action, ids, **data)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']['requests']
+
+    def test_permissions(self):
+        ids = [self.days_off_request.id]
+        self.assertIn(self.post('approve', ids).status_code, (401, 403))
+        for username, role in (('employee', 'e'), ('terminal', 't')):
+            self.login(username, role)
+            self.assertEqual(self.post('approve', ids).status_code, 403)
+            self.assertEqual(self.post('deny', ids).status_code, 403)
+        self.client.force_login(self.employee.user)
+        self.assertEqual(self.post('approve', ids).status_code, 403)
+        self.days_off_request.refresh_from_db()
+        self.assertEqual(self.days_off_request.status, approvals.PENDING)
+        self.assertFalse(DayOff.objects.exists())
+
+    def test_invalid_input(self):
+        self.login('manager', 'm')
+        self.assertEqual(self.post('approve', 'all').status_code, 400)
+        self.assertEqual(self.post('approve', ['x']).status_code, 400)
+        self.assertEqual(self.post(
+            'approve', [self.days_off_request.id], hours='x').status_code,
+            400)
+
+    def test_result_per_id(self):
+        self.login('manager', 'm')
+        single = self.make_request(self.monday, self.monday)
+        denied = self.make_request(self.monday + timedelta(days=14),
+                                   self.monday + timedelta(days=14))
+        denied.status = approvals.DENIED
+        denied.save()
+        missing = single.id + 100
+        results = self.results('approve', [self.days_off_request.id, missing,
+                                           single.id])
+        self.assertEqual(results, [
+            {'id': self.days_off_request.id, 'status': approvals.APPROVED,
+             'days_off': 7},
+            {'id': missing, 'status': 'error',
+             'error': 'No days off request with this id'},
+            {'id': single.id, 'status': approvals.APPROVED, 'days_off': 1}])
+        self.assertEqual(self.results('deny', [denied.id, single.id]), [
+            {'id': denied.id, 'status': 'unchanged'},
+            {'id': single.id, 'status': approvals.DENIED, 'days_off': 0}])
+        self.assertEqual(DayOff.objects.filter(
+            days_off_request=self.days_off_request).count(), 7)
+        self.assertFalse(DayOff.objects.filter(
+            days_off_request=single).exists())
+
+    def test_reapproval_replaces_days_off(self):
+        self.login('manager', 'm')
+        ids = [self.days_off_request.id]
+        self.results('approve', ids)
+        first = set(DayOff.objects.values_list('id', flat=True))
+        self.assertEqual(self.results('approve', ids), [
+            {'id': ids[0], 'status': 'unchanged'}])
+        self.assertEqual(set(DayOff.objects.values_list('id', flat=True)),
+                         first)
+
+        self.results('deny', ids)
+        self.assertFalse(DayOff.objects.exists())
+        self.assertEqual(self.results('approve', ids, hours=4), [
+            {'id': ids[0], 'status': approvals.APPROVED, 'days_off': 7}])
+        days_off = DayOff.objects.filter(employee=self.employee)
+        self.assertTrue(first.isdisjoint(
+            days_off.values_list('id', flat=True)))
+        dates = list(days_off.values_list('date', flat=True))
+        self.assertEqual(len(dates), len(set(dates)))
+        self.assertEqual(set(days_off.values_list('hours', flat=True)), {4})
+        balance = TimeOffBalance.objects.get(employee=self.employee,
+                                             day_off_type='vn')
+        self.assertEqual(balance.used, 28)
+
+        # Back to pending with its days off kept, then approved again.
+        DaysOffRequest.objects.filter(id=ids[0]).update(
+            status=approvals.PENDING)
+        self.results('approve', ids)
+        self.assertEqual(days_off.count(), 7)
+        self.assertEqual(set(days_off.values_list('hours', flat=True)), {8})
+        balance.refresh_from_db()
+        self.assertEqual(balance.used, 56)
+        self.assertEqual(balances.check(), [])
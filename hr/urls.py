@@ -11,6 +11,16 @@ router.register(r'work-periods', WorkPeriodViewSet,base_name='Work Periods')
 router.register(r'days-off', DayOffViewSet, base_name= 'Day Off')
 router.register(r'days-off-requests', DaysOffRequestViewSet, 
                 base_name= 'Days Off Request')
+router.register(r'clock-status', ClockStatusViewSet,
+                base_name='Clock Status')
+router.register(r'reports/hours', HoursReportViewSet,
+                base_name='Hours Report')
+router.register(r'roster', RosterViewSet, base_name='Roster')
+router.register(r'exports/payroll', PayrollExportViewSet,
+                base_name='Payroll Export')
+router.register(r'calendars', WorkCalendarViewSet, base_name='Calendars')
+router.register(r'holidays', HolidayViewSet, base_name='Holidays')
+router.register(r'events', EventViewSet, base_name='Events')
 router.register(r'user-settings', SettingsViewSet, base_name= 'Settings')
 
 
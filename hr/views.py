@@ -1,50 +1,88 @@
+import csv
+import json
 import random
+from datetime import timedelta
+
 from django.contrib.auth.models import User, Group
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django.utils import dateparse, timezone
 
 from rest_framework import exceptions, filters, permissions, status, response
 from rest_framework import parsers, renderers, viewsets
 from rest_framework.decorators import detail_route, list_route
+from rest_framework.views import APIView
 from rest_framework_json_api.parsers import JSONParser as JSONAPIParser
 from rest_framework_json_api.renderers import JSONRenderer as JSONAPIRenderer
-from rest_framework_json_api import pagination
 
+from . import approvals, balances, calendars, events, exports, roster
+from . import history as work_period_history
+from .clock import apply_events
+from .conditional import ConditionalGetMixin
 from .filters import *
+from .imports import CONTENT_TYPES, import_work_periods, read_rows
+from .includes import include_paths, optimize
+from .metrics import MetricsMixin, registry
 from .models import *
+from .overlaps import find_overlap
+from .pagination import KeysetPagination, SearchPagination
+from .parsers import CSVStreamParser, NDJSONStreamParser
+from .renderers import EventStreamRenderer, PrometheusRenderer
+from .replicas import ReplicaReadMixin
+from .reports import DAY, PERIODS, WEEK, hours_report, period_start
+from .rollups import day_bounds
+from .search import search_employees
 from authentication.permissions import *
+from authentication.roles import get_role
 from .serializers import *
 
 
-class DefaultViewSet(viewsets.ModelViewSet):
-    parser_classes = (JSONAPIParser, parsers.FormParser, 
-                      parsers.MultiPartParser)
-    renderer_classes = (JSONAPIRenderer, renderers.BrowsableAPIRenderer)
-    
+MAX_SYNC_EVENTS = 1000
+MAX_POLL_SECONDS = 30
+SSE_HEARTBEAT_SECONDS = 15
+
+
+class RoleMixin(object):
+
     def user_is_manager(self):
-        user = getattr(self.request, 'user', None)
-        privileges = getattr(user, 'privileges', None)
-        hr_role = privileges.hr_role
-        if privileges and (privileges.is_global_admin or hr_role in ['m', 'a']):
-            return True
-        return False
+        role = get_role(self.request)
+        return role is not None and role.is_manager
         
     def user_is_terminal(self):
-        user = getattr(self.request, 'user', None)
-        privileges = getattr(user, 'privileges', None)
-        if privileges and privileges.hr_role == 't':
-            return True
-        return False
+        role = get_role(self.request)
+        return role is not None and role.is_terminal
         
     def user_is_manager_or_terminal(self):
         return self.user_is_manager() or self.user_is_terminal()
 
 
+class DefaultViewSet(MetricsMixin, RoleMixin, viewsets.ModelViewSet):
+    parser_classes = (JSONAPIParser, parsers.FormParser, 
+                      parsers.MultiPartParser)
+    renderer_classes = (JSONAPIRenderer, renderers.BrowsableAPIRenderer)
+    # Actions whose objects are only read, and can be loaded with the
+    # requested sparse fieldset alone.
+    sparse_actions = ('list', 'retrieve')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.user_is_terminal() and include_paths(self.request):
+            raise exceptions.PermissionDenied(
+                'Timeclocks can not include related resources.')
+        return optimize(queryset, self.request, self.resource_name,
+                        sparse=self.action in self.sparse_actions)
+
+
 
-class EmployeeViewSet(DefaultViewSet):
+class EmployeeViewSet(ReplicaReadMixin, ConditionalGetMixin,
+                      DefaultViewSet):
     resource_name = 'employees'
+    replica_actions = ('list', 'search')
     serializer_class = EmployeeSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filter_class = EmployeeFilter
+    pagination_class = KeysetPagination
     permission_classes = (permissions.IsAuthenticated, IsManagerOrNotCreate,
                           IsNotDelete)
                           
@@ -75,15 +113,42 @@ class EmployeeViewSet(DefaultViewSet):
                         raise exceptions.PermissionDenied
         updated_by = {'type': 'users', 'id': request.user.id}
         request.data['updated_by'] = updated_by
-        print(request.data)
         return super().update(request, *args, **kwargs)
 
-class WorkPeriodViewSet(DefaultViewSet):
+    @list_route()
+    def search(self, request):
+        """
+        Employees whose name, payroll id, phone or username match `q`, best
+        matches first, a page at a time.
+        """
+        queryset = optimize(self.get_queryset(), request, self.resource_name)
+        is_active = request.query_params.get('is_active', None)
+        if is_active is not None:
+            queryset = queryset.filter(
+                is_active=is_active.lower() in ('true', '1'))
+        employees = search_employees(queryset,
+                                     request.query_params.get('q', ''))
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(employees, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @detail_route()
+    def balances(self, request, pk=None):
+        """
+        Time off balances of the employee, one per balance type.
+        """
+        employee = self.get_object()
+        return response.Response(balances.balances_of(employee))
+
+class WorkPeriodViewSet(ReplicaReadMixin, DefaultViewSet):
     resource_name = 'work-periods'
+    replica_actions = ('list', 'history')
     serializer_class = WorkPeriodSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filter_class = WorkPeriodFilter
-    pagination_class = pagination.PageNumberPagination
+    pagination_class = KeysetPagination
+    keyset_ordering = ('start_time', 'id')
     permission_classes = (permissions.IsAuthenticated, IsManagerOrReadOnly,
                           IsNotDelete)
                               
@@ -93,45 +158,49 @@ class WorkPeriodViewSet(DefaultViewSet):
         user_id = self.request.user.id
         return WorkPeriod.objects.filter(employee__user__id=user_id)
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list':
+            queryset = self.with_archive(queryset)
+        return queryset
+
+    def with_archive(self, queryset):
+        """
+        The filtered work periods, combined with the archived ones filtered
+        alike when `min_start_date` reaches back into the archive. Lists
+        without a start date only read the hot table.
+        """
+        params = self.request.query_params
+        form = self.filter_class(params, queryset=queryset).form
+        start = None
+        if form.is_valid():
+            start = form.cleaned_data.get('min_start_date')
+        if start is None or not work_period_history.reaches_archive(start):
+            return queryset
+        archived = ArchivedWorkPeriod.objects.filter(is_deleted=False)
+        if not self.user_is_manager_or_terminal():
+            archived = archived.filter(
+                employee__user__id=self.request.user.id)
+        archived = self.filter_class(params, queryset=archived).qs
+        return work_period_history.CombinedWorkPeriods(queryset, archived)
+
     def create(self, request, *args, **kwargs):
-        # should this be moved to a separate method?
         start_time = request.data.get('start_time', None)
-        start_time = dateparse.parse_datetime(start_time)
-        
-        try:
-            previous_work_period = WorkPeriod.objects.filter(
-                start_time__lt=start_time,
-                employee__id=request.data['employee']['id']
-            ).order_by('-start_time')[0]
-            if previous_work_period.end_time:
-                if previous_work_period.end_time > start_time:
-                    msg = 'This work period overlaps with the previous one.'
-                    return response.Response({'status': msg},
-                                             status=status.HTTP_400_BAD_REQUEST)
-        except IndexError:
-            pass
-        
+        start_time = dateparse.parse_datetime(str(start_time))
         end_time = request.data.get('end_time', None)
         if end_time is not None:
-            end_time = dateparse.parse_datetime(end_time)
-            if end_time > start_time:
-                try:
-                    next_work_period = WorkPeriod.objects.filter(
-                        start_time__gt=end_time,
-                        employee__id=request.data['employee']['id']
-                    ).order_by('start_time')[0]
-                    
-                    if next_work_period.start_time < end_time:
-                        msg = 'This work period overlaps with the next one.'
-                        return response.Response({'status': msg},
-                                                 status=status.HTTP_400_BAD_REQUEST)  
-                except IndexError:
-                    pass
-            else:
+            end_time = dateparse.parse_datetime(str(end_time))
+            if end_time <= start_time:
                 msg = 'End Time can not be before Start Time'
                 return response.Response({'status': msg},
                                          status=status.HTTP_400_BAD_REQUEST)
 
+        employee_id = request.data['employee']['id']
+        if find_overlap(employee_id, start_time, end_time) is not None:
+            msg = 'This work period overlaps with an existing one.'
+            return response.Response({'status': msg},
+                                     status=status.HTTP_400_BAD_REQUEST)
+
         return super().create(request, *args, **kwargs)
 
     def update(self, request, *args, **kwargs):
@@ -144,17 +213,28 @@ class WorkPeriodViewSet(DefaultViewSet):
             msg = "Cannot change 'start-time' for this work period."
         if end_time is not None:
             end_time_obj = dateparse.parse_datetime(end_time)
-            print(end_time_obj)
             if instance.end_time and (end_time_obj != instance.end_time):
                 msg = 'Employee is already clocked out for this work period.'
             elif not (instance.start_time < end_time_obj <= timezone.now()):
                 msg = 'Clock out can not be out of range'
+            elif find_overlap(instance.employee_id, instance.start_time,
+                              end_time_obj, exclude_id=instance.id):
+                msg = 'This work period overlaps with an existing one.'
         if len(msg) > 0:
             return response.Response({'status': msg},
                                      status=status.HTTP_400_BAD_REQUEST)  
                               
         return super().update(request, *args, **kwargs)
-    
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            instance = serializer.save()
+            ClockStatus.objects.refresh(instance.employee_id)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            instance = serializer.save()
+            ClockStatus.objects.refresh(instance.employee_id)
     
     @list_route(methods=('post',), 
                 permission_classes=(permissions.IsAuthenticated, IsTerminal))
@@ -162,7 +242,12 @@ class WorkPeriodViewSet(DefaultViewSet):
         now = timezone.now()
         start_time = now.replace(second=0, microsecond=0)
         request.data.update(start_time=start_time, end_time=None)
-        return self.create(request)
+        employee_id = request.data['employee']['id']
+        with transaction.atomic():
+            # Serialize clock operations for the employee.
+            if Employee.objects.filter(id=employee_id).exists():
+                ClockStatus.objects.lock(employee_id)
+            return self.create(request)
         
     @detail_route(methods=('post',),
                   permission_classes=(permissions.IsAuthenticated, IsTerminal))
@@ -170,24 +255,87 @@ class WorkPeriodViewSet(DefaultViewSet):
         now = timezone.now()
         end_time = now.replace(second=0, microsecond=0)
         instance = self.get_object()
-        employee = instance.employee
-        # Prevent duplicate clock-outs.
-        work_periods = self.get_queryset().filter(employee=employee)
-        latest_work_period = work_periods.order_by('-start_time')[0]
-        if latest_work_period.end_time:
-            return response.Response({'status': 'Employee already clocked out'},
-                                     status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            # Prevent duplicate clock-outs. The lock is held until the
+            # update commits, so two terminals can not both pass the check.
+            clock_status = ClockStatus.objects.lock(instance.employee_id)
+            if clock_status.work_period_id is None:
+                msg = 'Employee already clocked out'
+                return response.Response({'status': msg},
+                                         status=status.HTTP_400_BAD_REQUEST)
+
+            request.data['end_time'] = str(timezone.localtime(end_time))
+            return self.partial_update(request)
 
-        request.data['end_time'] = str(timezone.localtime(end_time))
-        return self.partial_update(request)
+    @list_route(methods=('post',), parser_classes=(parsers.JSONParser,),
+                permission_classes=(permissions.IsAuthenticated, IsTerminal))
+    def sync(self, request):
+        """
+        Replay queued clock events, e.g. from a timeclock that was offline.
+        """
+        clock_events = request.data.get('events', None)
+        if not isinstance(clock_events, list):
+            msg = "Expected an 'events' list."
+            return response.Response({'status': msg},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        if len(clock_events) > MAX_SYNC_EVENTS:
+            msg = 'At most {} events per request.'.format(MAX_SYNC_EVENTS)
+            return response.Response({'status': msg},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        return response.Response({'events': apply_events(clock_events)})
     
+    @list_route(methods=('post',), url_path='import',
+                parser_classes=(CSVStreamParser, NDJSONStreamParser))
+    def import_periods(self, request):
+        media_type = request.content_type.split(';')[0].strip()
+        format = CONTENT_TYPES.get(media_type, None)
+        if format is None:
+            msg = 'Upload work periods as text/csv or application/x-ndjson.'
+            return response.Response({'status': msg},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = import_work_periods(read_rows(request.data, format))
+        except (ValueError, csv.Error) as e:
+            return response.Response({'status': str(e)},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        return response.Response(result.as_dict())
+
+    @list_route()
+    def history(self, request):
+        """
+        Work periods of one employee from `start` through `end`, including
+        archived ones when the range reaches back into the archive.
+        """
+        try:
+            employee_id = int(request.query_params['employee'])
+            first = dateparse.parse_date(request.query_params['start'])
+            last = dateparse.parse_date(request.query_params['end'])
+        except (KeyError, ValueError):
+            first = last = None
+        if first is None or last is None or last < first:
+            msg = "Expected 'employee', 'start' and 'end' dates."
+            return response.Response({'status': msg},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        if not self.user_is_manager() and not Employee.objects.filter(
+                id=employee_id, user=request.user).exists():
+            raise exceptions.PermissionDenied
+        start, end = day_bounds(first, last)
+        work_periods = list(work_period_history.work_periods(
+            start, end, employee_id=employee_id).order_by('start_time'))
+        # The archive is combined with a UNION, which select_related can
+        # not be applied to.
+        prefetch_related_objects(work_periods, 'employee')
+        serializer = self.get_serializer(work_periods, many=True)
+        return response.Response(serializer.data)
+
     @list_route()
     def mine(self, request):
-        work_periods = WorkPeriod.objects.filter(employee_id=request.user.id)
+        work_periods = optimize(WorkPeriod.objects.filter(
+            employee__user__id=request.user.id), request, self.resource_name)
         serializer = self.get_serializer(work_periods, many=True)
         return response.Response(serializer.data)
               
-    @list_route(methods=('get',))
+    @list_route(methods=('get',), keyset_ordering=('employee_id',))
     def latest(self, request):
         employee_id = request.query_params.get('employee', None)
         if employee_id is not None:
@@ -207,25 +355,31 @@ class WorkPeriodViewSet(DefaultViewSet):
                 return response.Response({'status': message},
                                          status=status.HTTP_404_NOT_FOUND)
         else:
-            employees = Employee.objects.all()
-            work_periods = []
-            for employee in employees:
-                queryset = self.get_queryset().filter(employee=employee)
-                try:
-                    latest_work_period = queryset.order_by('-start_time')[0]
-                    work_periods.append(latest_work_period)
-                except IndexError:
-                    pass
+            work_periods = optimize(
+                self.get_queryset().latest_per_employee(), request,
+                self.resource_name)
+            is_active = request.query_params.get('is_active', None)
+            if is_active is not None:
+                is_active = is_active.lower() in ('true', '1')
+                work_periods = work_periods.filter(
+                    employee__is_active=is_active)
+            work_periods = work_periods.order_by('employee_id')
+            page = self.paginate_queryset(work_periods)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
             serializer = self.get_serializer(work_periods, many=True)
             return response.Response(serializer.data)
 
 
-class DayOffViewSet(DefaultViewSet):
+class DayOffViewSet(ReplicaReadMixin, ConditionalGetMixin, DefaultViewSet):
     resource_name = 'days-off'
+    replica_actions = ('list',)
     serializer_class = DayOffSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filter_class = DayOffFilter
-    pagination_class = pagination.PageNumberPagination
+    pagination_class = KeysetPagination
+    keyset_ordering = ('date', 'id')
     permission_classes = (permissions.IsAuthenticated, IsManagerOrReadOnly,
                           IsNotDelete)
                               
@@ -251,7 +405,6 @@ class DayOffViewSet(DefaultViewSet):
     def add_day_off(self, request):
         data = request.data
         days_off = []
-        print(data)
         for dt in request.data['dates']:
             new_time_off = {
                 'date': dateparse.parse_datetime(dt).date(),
@@ -269,7 +422,6 @@ class DayOffViewSet(DefaultViewSet):
                     'id': data['days_off_request']['id']
                 }
             days_off.append(new_time_off)
-        print(days_off)
         serializer = self.get_serializer(data=days_off, many=True)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
@@ -288,12 +440,15 @@ class DayOffViewSet(DefaultViewSet):
         return response.Response(status=status.HTTP_204_NO_CONTENT)
         
 
-class DaysOffRequestViewSet(DefaultViewSet):
+class DaysOffRequestViewSet(ReplicaReadMixin, ConditionalGetMixin,
+                            DefaultViewSet):
     resource_name = 'days-off-requests'
+    replica_actions = ('list',)
     serializer_class = DaysOffRequestSerializer
     filter_backends = (filters.DjangoFilterBackend,)
     filter_class = DaysOffRequestFilter
-    pagination_class = pagination.PageNumberPagination
+    pagination_class = KeysetPagination
+    keyset_ordering = ('start_date', 'id')
     permission_classes = (permissions.IsAuthenticated, IsNotDelete, IsOwnerOrIsManager)
     
     def get_queryset(self):
@@ -315,9 +470,245 @@ class DaysOffRequestViewSet(DefaultViewSet):
             raise exceptions.PermissionDenied 
             
         return super().update(request, *args, **kwargs)                           
+
+    def set_status(self, request, new_status):
+        ids = request.data.get('ids', None)
+        try:
+            ids = [int(request_id) for request_id in ids]
+        except (TypeError, ValueError):
+            msg = "Expected 'ids' to be a list of days off request ids."
+            return response.Response({'status': msg},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        hours = request.data.get('hours', None)
+        if hours is not None:
+            try:
+                hours = int(hours)
+            except (TypeError, ValueError):
+                msg = "'hours' must be a number."
+                return response.Response({'status': msg},
+                                         status=status.HTTP_400_BAD_REQUEST)
+        results = approvals.set_status(ids, new_status, request.user, hours)
+        return response.Response({'requests': results})
+
+    @list_route(methods=('post',), parser_classes=(parsers.JSONParser,),
+                permission_classes=(permissions.IsAuthenticated,
+                                    IsManagerOrReadOnly))
+    def approve(self, request):
+        return self.set_status(request, approvals.APPROVED)
+
+    @list_route(methods=('post',), parser_classes=(parsers.JSONParser,),
+                permission_classes=(permissions.IsAuthenticated,
+                                    IsManagerOrReadOnly))
+    def deny(self, request):
+        return self.set_status(request, approvals.DENIED)
     
         
-class SettingsViewSet(DefaultViewSet):
+class ClockStatusViewSet(DefaultViewSet):
+    resource_name = 'clock-status'
+    serializer_class = ClockStatusSerializer
+    filter_backends = (filters.DjangoFilterBackend,)
+    filter_class = ClockStatusFilter
+    pagination_class = KeysetPagination
+    permission_classes = (permissions.IsAuthenticated, ReadOnly)
+
+    def get_queryset(self):
+        if self.user_is_manager_or_terminal():
+            return ClockStatus.objects.all()
+        user_id = self.request.user.id
+        return ClockStatus.objects.filter(employee__user__id=user_id)
+
+
+class HoursReportViewSet(ReplicaReadMixin, MetricsMixin, RoleMixin,
+                         viewsets.ViewSet):
+    resource_name = 'hours-reports'
+    replica_actions = ('list', 'summary')
+    renderer_classes = (JSONAPIRenderer, renderers.BrowsableAPIRenderer)
+    permission_classes = (permissions.IsAuthenticated, ReadOnly)
+
+    def get_queryset(self):
+        if self.user_is_manager():
+            return HoursRollup.objects.all()
+        user_id = self.request.user.id
+        return HoursRollup.objects.filter(employee__user__id=user_id)
+
+    def list(self, request):
+        period = request.query_params.get('period', DAY)
+        if period not in PERIODS:
+            msg = "'period' must be one of " + ', '.join(PERIODS)
+            return response.Response({'status': msg},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        rollups = HoursRollupFilter(request.query_params,
+                                    queryset=self.get_queryset()).qs
+        return response.Response(hours_report(rollups, period))
+
+    @list_route()
+    def summary(self, request):
+        """
+        Weekly totals for the number of weeks in the user's settings.
+        """
+        user_settings = UserSettings.objects.filter(user=request.user).first()
+        weeks = getattr(user_settings, 'summary_weeks', None) or 2
+        this_week = period_start(timezone.localdate(), WEEK)
+        rollups = HoursRollupFilter(request.query_params,
+                                    queryset=self.get_queryset()).qs
+        rollups = rollups.filter(
+            date__gte=this_week - timedelta(weeks=weeks - 1))
+        return response.Response(hours_report(rollups, WEEK))
+
+
+class RosterViewSet(MetricsMixin, RoleMixin, viewsets.ViewSet):
+    """
+    The employees a terminal shows, as a versioned snapshot, or with
+    `?since=<version>` as the changes after that version.
+    """
+    resource_name = 'roster'
+    renderer_classes = (JSONAPIRenderer, renderers.BrowsableAPIRenderer)
+    permission_classes = (permissions.IsAuthenticated, ReadOnly)
+
+    def list(self, request):
+        if not self.user_is_manager_or_terminal():
+            raise exceptions.PermissionDenied
+        since = request.query_params.get('since', None)
+        if since is None:
+            return response.Response(roster.snapshot())
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        if since < 0:
+            msg = "'since' must be a roster version"
+            return response.Response({'status': msg},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        return response.Response(roster.delta(since))
+
+
+class PayrollExportViewSet(ReplicaReadMixin, MetricsMixin, RoleMixin,
+                           viewsets.ViewSet):
+    """
+    Work periods and days off of one pay period as a CSV or XLSX download,
+    streamed as it is read.
+    """
+    resource_name = 'payroll-exports'
+    replica_actions = ('list',)
+    renderer_classes = (JSONAPIRenderer, renderers.BrowsableAPIRenderer)
+    permission_classes = (permissions.IsAuthenticated, IsManager)
+
+    def list(self, request):
+        file_format = request.query_params.get('file', exports.CSV)
+        if file_format not in exports.FORMATS:
+            msg = "'file' must be one of " + ', '.join(exports.FORMATS)
+            return response.Response({'status': msg},
+                                     status=status.HTTP_400_BAD_REQUEST)
+        day = timezone.localdate()
+        if 'pay_period' in request.query_params:
+            day = dateparse.parse_date(request.query_params['pay_period'])
+            if day is None:
+                msg = "'pay_period' must be a date"
+                return response.Response({'status': msg},
+                                         status=status.HTTP_400_BAD_REQUEST)
+        first, last = exports.pay_period(day)
+        stream = StreamingHttpResponse(
+            exports.export(first, last, file_format),
+            content_type=exports.CONTENT_TYPES[file_format])
+        stream['Content-Disposition'] = 'attachment; filename="{}"'.format(
+            exports.filename(first, last, file_format))
+        return stream
+
+
+class EventViewSet(MetricsMixin, RoleMixin, viewsets.ViewSet):
+    """
+    Days off request and clock events, as a long poll (`list`) or as
+    Server-Sent Events (`stream`).
+    """
+    resource_name = 'events'
+    renderer_classes = (JSONAPIRenderer, renderers.BrowsableAPIRenderer)
+    permission_classes = (permissions.IsAuthenticated, ReadOnly)
+
+    def get_after(self, request):
+        after = request.query_params.get('after', None)
+        if after is None:
+            after = request.META.get('HTTP_LAST_EVENT_ID', None)
+        if after is None:
+            return events.get_backend().latest_id()
+        try:
+            return max(int(after), 0)
+        except ValueError:
+            raise exceptions.ValidationError("'after' must be an event id")
+
+    def list(self, request):
+        try:
+            timeout = min(float(request.query_params.get('timeout', 25)),
+                          MAX_POLL_SECONDS)
+        except ValueError:
+            raise exceptions.ValidationError("'timeout' must be a number")
+        found, last_id = events.events_after(
+            self.get_after(request), timeout, get_role(request),
+            request.user.id)
+        return response.Response({'events': found, 'last_id': last_id})
+
+    @list_route(renderer_classes=(EventStreamRenderer, JSONAPIRenderer))
+    def stream(self, request):
+        after = self.get_after(request)
+        role = get_role(request)
+        user_id = request.user.id
+
+        def stream_events(after):
+            while True:
+                found, after = events.events_after(
+                    after, SSE_HEARTBEAT_SECONDS, role, user_id)
+                if not found:
+                    yield ': heartbeat\n\n'
+                for event in found:
+                    yield 'id: {}\nevent: {}\ndata: {}\n\n'.format(
+                        event['id'], event['type'], json.dumps(event))
+
+        stream = StreamingHttpResponse(stream_events(after),
+                                       content_type='text/event-stream')
+        stream['Cache-Control'] = 'no-cache'
+        return stream
+
+
+class WorkCalendarViewSet(DefaultViewSet):
+    resource_name = 'calendars'
+    serializer_class = WorkCalendarSerializer
+    permission_classes = (permissions.IsAuthenticated, IsManagerOrReadOnly)
+    queryset = WorkCalendar.objects.all()
+
+
+class HolidayViewSet(DefaultViewSet):
+    resource_name = 'holidays'
+    serializer_class = HolidaySerializer
+    permission_classes = (permissions.IsAuthenticated, IsManagerOrReadOnly)
+    queryset = Holiday.objects.all()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        year = self.request.query_params.get('year', None)
+        if year is not None and year.isdigit():
+            queryset = queryset.filter(date__year=int(year))
+        return queryset
+
+    @detail_route(methods=('post',), parser_classes=(parsers.JSONParser,))
+    def assign(self, request, pk=None):
+        """
+        Give every active employee the holiday applies to a holiday day off.
+        """
+        holiday = self.get_object()
+        hours = request.data.get('hours', None)
+        if hours is not None:
+            try:
+                hours = int(hours)
+            except (TypeError, ValueError):
+                return response.Response(
+                    {'status': "'hours' must be a number"},
+                    status=status.HTTP_400_BAD_REQUEST)
+        days_off = calendars.assign_holiday(holiday, request.user, hours)
+        return response.Response(
+            {'holiday': holiday.id, 'days_off': len(days_off)},
+            status=status.HTTP_201_CREATED)
+
+
+class SettingsViewSet(ConditionalGetMixin, DefaultViewSet):
     resource_name = 'user-settings'
     serializer_class = SettingsSerializer
     permission_classes = (permissions.IsAuthenticated, IsManagerOrReadOnly,
@@ -325,3 +716,13 @@ class SettingsViewSet(DefaultViewSet):
     queryset = UserSettings.objects.all()
        
 
+
+class MetricsView(APIView):
+    """
+    Request metrics of this process for Prometheus.
+    """
+    renderer_classes = (PrometheusRenderer,)
+    permission_classes = (permissions.IsAuthenticated, IsAdmin)
+
+    def get(self, request):
+        return response.Response(registry.render())
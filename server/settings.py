@@ -45,6 +45,8 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'hr.middleware.MetricsMiddleware',
+    'hr.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,6 +58,13 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.security.SecurityMiddleware',
 )
 
+# Session users are loaded with their privileges. The stock backend stays
+# listed for the sessions that were logged in through it.
+AUTHENTICATION_BACKENDS = (
+    'authentication.backends.PrivilegesModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+)
+
 ROOT_URLCONF = 'server.urls'
 
 TEMPLATES = [
@@ -79,15 +88,57 @@ WSGI_APPLICATION = 'server.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/1.8/ref/settings/#databases
+#
+# The primary is configured by DB_ENGINE, DB_NAME, DB_USER, DB_PASSWORD,
+# DB_HOST and DB_PORT, and an optional read replica by the same variables
+# prefixed with REPLICA_. Without DB_NAME, DATABASES from secrets.py is
+# used, or else a local SQLite database.
+
+def database_from_env(prefix, engine='django.db.backends.postgresql'):
+    return {
+        'ENGINE': os.environ.get(prefix + 'ENGINE', engine),
+        'NAME': os.environ[prefix + 'NAME'],
+        'USER': os.environ.get(prefix + 'USER', ''),
+        'PASSWORD': os.environ.get(prefix + 'PASSWORD', ''),
+        'HOST': os.environ.get(prefix + 'HOST', ''),
+        'PORT': os.environ.get(prefix + 'PORT', ''),
+    }
 
-"""
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+if 'DB_NAME' in os.environ:
+    DATABASES = {'default': database_from_env('DB_')}
+elif 'DATABASES' not in globals():
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        }
     }
-}
-"""
+
+if 'REPLICA_DB_NAME' in os.environ:
+    DATABASES['replica'] = database_from_env(
+        'REPLICA_DB_', DATABASES['default']['ENGINE'])
+    # Tests read the replica's data from the primary.
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+# Connections are kept open for DB_CONN_MAX_AGE seconds instead of being
+# opened per request.
+for database in DATABASES.values():
+    database.setdefault('CONN_MAX_AGE',
+                        int(os.environ.get('DB_CONN_MAX_AGE', 60)))
+
+DATABASE_ROUTERS = ['hr.replicas.ReplicaRouter']
+
+# Safe requests to the list, report and export endpoints read from the
+# HR_REPLICA_DATABASE alias when it is configured. Users who write are
+# kept on the primary for HR_REPLICA_PIN_SECONDS to read their writes,
+# through a signed cookie.
+HR_REPLICA_DATABASE = 'replica'
+HR_REPLICA_PIN_SECONDS = 10
+
+# Persistent connections that stopped working are closed at the start of
+# a request, checking each at most every HR_DB_HEALTH_CHECK_SECONDS.
+HR_DB_HEALTH_CHECKS = True
+HR_DB_HEALTH_CHECK_SECONDS = 30
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.8/topics/i18n/
@@ -114,7 +165,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
-        'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
+        'authentication.authentication.CachedOAuth2Authentication',
     ),
     
     'DEFAULT_PERMISSION_CLASSES': (
@@ -132,7 +183,7 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.BrowsableAPIRenderer',
     ),
     
-    #'DEFAULT_PAGINATION_CLASS': 'rest_framework_json_api.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'hr.pagination.KeysetPagination',
     #'PAGE_SIZE': 10
     'DEFAULT_METADATA_CLASS': 'rest_framework_json_api.metadata.JSONAPIMetadata',
 }
@@ -143,6 +194,48 @@ JSON_API_PLURALIZE_TYPES = True
 
 CORS_ORIGIN_ALLOW_ALL = True
 
+# Pay periods are HR_PAY_PERIOD_DAYS long, counted from HR_PAY_PERIOD_START.
+HR_PAY_PERIOD_START = '2016-01-04'
+HR_PAY_PERIOD_DAYS = 14
+
+# Days off generated from approved requests: hours per day, and the
+# weekdays (Monday is 0) that are skipped.
+HR_WORKDAY_HOURS = 8
+HR_WEEKEND_DAYS = (5, 6)
+
+# Each process checks for calendar and holiday changes made by other
+# processes at most every HR_CALENDAR_INDEX_SECONDS. 0 checks on every
+# lookup.
+HR_CALENDAR_INDEX_SECONDS = 30
+
+# Paid days off of these types are drawn from the employee's balance.
+HR_BALANCE_TYPES = ('vn', 'pl')
+
+# Closed work periods that started more than HR_ARCHIVE_HORIZON_DAYS ago
+# are moved to the archive table by `archive_work_periods`.
+HR_ARCHIVE_HORIZON_DAYS = 400
+# Each process reads the newest archived start time at most every
+# HR_ARCHIVE_BOUNDARY_SECONDS, so it may miss rows archived since for that
+# long. 0 reads it on every request.
+HR_ARCHIVE_BOUNDARY_SECONDS = 5
+
+# Requests slower than HR_SLOW_REQUEST_MS are logged to `hr.metrics` with
+# up to HR_SLOW_REQUEST_SQL_LIMIT of their SQL queries.
+HR_SLOW_REQUEST_MS = 1000
+HR_SLOW_REQUEST_SQL_LIMIT = 50
+# Long polls are slow on purpose.
+HR_SLOW_REQUEST_IGNORE = ('hr:Events-list', 'hr:Events-stream')
+# The queries of this fraction of requests are counted, and logged if the
+# request is slow. Capturing them slows down every query of the request.
+HR_METRICS_SQL_SAMPLE_RATE = 0.1
+
+# Validated OAuth2 tokens are cached for at most HR_TOKEN_CACHE_SECONDS,
+# and never past their expiry, in the HR_TOKEN_CACHE cache alias. The
+# default cache is per process, so a revoked token keeps working on other
+# workers for up to that long; raise it only with a shared cache.
+HR_TOKEN_CACHE = 'default'
+HR_TOKEN_CACHE_SECONDS = 5
+
 OAUTH2_PROVIDER = {
     'ACCESS_TOKEN_EXPIRE_SECONDS': 86400
 }
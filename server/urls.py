@@ -4,6 +4,8 @@ from django.conf.urls import url, include
 from django.contrib import admin
 from django.views.generic.base import RedirectView
 
+from hr.views import MetricsView
+
 urlpatterns = (
     url(r'^admin/', include(admin.site.urls)),
     url(r'^api-auth/', include('rest_framework.urls', 
@@ -12,6 +14,7 @@ urlpatterns = (
     url(r'^$', RedirectView.as_view(url='/hr/', permanent=False), 
         name='home'),
     url(r'^hr/', include('hr.urls', namespace='hr')),
+    url(r'^metrics$', MetricsView.as_view(), name='metrics'),
     url(r'^authentication/', include('authentication.urls',
                                      namespace='authentication')) 
 )